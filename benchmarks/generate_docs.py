@@ -0,0 +1,121 @@
+# Script to generate a synthetic docs repo in the style of docs.microsoft.com, for benchmarking the
+# inventory scripts without cloning the real repos. Generated articles have (optionally) a metadata
+# header, an H1 with intro text, subheadings, code fences with language tags, links, and inline code.
+# Search terms are sprinkled through the text at a configurable density, so the inventory produces a
+# realistic mix of classification tags.
+#
+# Generation is deterministic for a given seed, so benchmark runs are comparable across machines.
+
+import getopt
+import os
+import random
+import sys
+
+DEFAULT_TERMS = ["Python", "Flask", "Django", "Jupyter", "Spark", "data science", "Java", "Maven", "JavaScript", "npm"]
+
+FILLER = ("the a service resource create configure deploy application cluster account storage portal command "
+    "settings data model function project template network virtual machine instance region subscription group "
+    "access key value container image database query table event message sample quickstart tutorial").split()
+
+LANGUAGES = ["python", "bash", "azurecli", "json", "javascript", "java", "csharp", "powershell", ""]
+
+DEFAULTS = { "files": 1000, "min_size": 2000, "max_size": 12000, "front_matter": 0.95, "code_fences": 3,
+    "intro_words": 80, "term_density": 0.01, "depth": 3, "seed": 1 }
+
+
+def make_words(rng, count, terms, density):
+    return " ".join(rng.choice(terms) if rng.random() < density else rng.choice(FILLER) for _ in range(count))
+
+
+def make_article(rng, index, size, settings, terms):
+    density = settings["term_density"]
+    lines = []
+
+    if rng.random() < settings["front_matter"]:
+        lines += ["---",
+            "title: {}".format(make_words(rng, 6, terms, density * 5).capitalize()),
+            "description: {}".format(make_words(rng, 20, terms, density * 2)),
+            "author: writer{}".format(index % 50),
+            "ms.author: writer{}".format(index % 50),
+            "manager: manager{}".format(index % 7),
+            "ms.date: {:02d}/{:02d}/2019".format(rng.randint(1, 12), rng.randint(1, 28)),
+            "ms.service: service{}".format(index % 20),
+            "ms.topic: {}".format(rng.choice(["conceptual", "quickstart", "tutorial", "reference"])),
+            "---", ""]
+
+    lines += ["# {}".format(make_words(rng, 5, terms, density * 5).capitalize()), ""]
+    lines += [make_words(rng, settings["intro_words"], terms, density), ""]
+
+    if rng.random() < 0.5:
+        lines += ["> [!div class=\"nextstepaction\"]", "> [{}](./article{}.md)".format(make_words(rng, 3, terms, density), index + 1), ""]
+
+    fences = settings["code_fences"]
+    section = 0
+
+    while sum(len(line) + 1 for line in lines) < size:
+        section += 1
+        lines += ["## {}".format(make_words(rng, 4, terms, density * 2).capitalize()), ""]
+        lines += [make_words(rng, 60, terms, density), ""]
+        lines += ["For more information, see [{}](https://docs.microsoft.com/{}), and run `{}`.".format(
+            make_words(rng, 3, terms, density * 2), make_words(rng, 2, terms, density).replace(" ", "-"),
+            make_words(rng, 2, terms, density * 2)), ""]
+
+        if fences > 0 and rng.random() < 0.7:
+            fences -= 1
+            lines += ["```" + rng.choice(LANGUAGES)]
+            lines += ["    " + make_words(rng, 8, terms, density * 2) for _ in range(rng.randint(2, 10))]
+            lines += ["```", ""]
+
+        if rng.random() < 0.2:
+            lines += ["![{}](./media/image{}.png)".format(make_words(rng, 3, terms, density), section), ""]
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_docs(root, settings=None, terms=None):
+    """Generates a synthetic repo under root, returning the number of files written. settings can override
+    any of the values in DEFAULTS."""
+    settings = dict(DEFAULTS, **(settings or {}))
+    terms = terms or DEFAULT_TERMS
+    rng = random.Random(settings["seed"])
+
+    # Articles go into a tree of service folders under "articles", with includes and media folders
+    # alongside them, as in the real docsets.
+    folders = [os.path.join("articles", "service{}".format(i)) for i in range(max(1, settings["files"] // 100))]
+    folders = [os.path.join(folder, *["sub{}".format(d) for d in range(rng.randint(0, settings["depth"] - 1))])
+        for folder in folders]
+    folders.append(os.path.join("articles", "includes"))
+
+    for folder in folders:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        os.makedirs(os.path.join(root, folder, "media"), exist_ok=True)
+
+    for index in range(settings["files"]):
+        size = rng.randint(settings["min_size"], settings["max_size"])
+        path = os.path.join(root, rng.choice(folders), "article{}.md".format(index))
+
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(make_article(rng, index, size, settings, terms))
+
+    return settings["files"]
+
+
+if __name__ == "__main__":
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', [key.replace("_", "-") + "=" for key in DEFAULTS])
+    except getopt.GetoptError:
+        args = []
+
+    if len(args) != 1:
+        print("Usage: python generate_docs.py [--files N] [--min-size BYTES] [--max-size BYTES] [--front-matter RATIO]")
+        print("           [--code-fences N] [--intro-words N] [--term-density RATIO] [--depth N] [--seed N] <output_folder>")
+        sys.exit(2)
+
+    settings = {}
+
+    for opt, arg in opts:
+        key = opt[2:].replace("-", "_")
+        settings[key] = type(DEFAULTS[key])(arg)
+
+    count = generate_docs(args[0], settings)
+    print("generate_docs, INFO, Generated files, {}, {}".format(count, args[0]))
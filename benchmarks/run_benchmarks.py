@@ -0,0 +1,209 @@
+# Benchmark harness for the inventory scripts. Generates a synthetic docs repo with generate_docs.py (or uses
+# an existing folder), then times:
+#
+#    delineate_segments: segmenting every file, with the content already in memory
+#    classify_occurrence: classifying every occurrence of the terms, with segments already computed
+#    take_inventory: the full run, including post-processing, in a temporary results folder
+#    extract_metadata, consolidate, score: the post-processing stages, from the run report of take_inventory
+#
+# Each benchmark runs --repeat times and the fastest time is kept, which is the least noisy measure.
+# --save writes the results to a JSON baseline; --check compares the results to a saved baseline and exits with
+# status 1 if any stage is slower than the baseline by more than --threshold (a fraction; 0.25 means 25%).
+# Differences under --min-delta seconds are ignored as noise.
+#
+# Usage: python benchmarks/run_benchmarks.py [--files N] [--repeat N] [--save <baseline.json>] [--check <baseline.json>]
+
+import contextlib
+import getopt
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+
+# The scripts live in the parent folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_docs import generate_docs, DEFAULT_TERMS
+from utilities import classify_occurrence, delineate_segments
+
+POST_PROCESSING_STAGES = ["extract_metadata", "consolidate", "score"]
+
+
+def make_config(repo):
+    return { "content": [ { "repo": "Synthetic/docs", "path": repo, "url": "https://docs.microsoft.com/synthetic",
+            "exclude_folders": ["includes", "media"] } ],
+        "inventory": [ { "name": "Python", "terms": DEFAULT_TERMS[:3] }, { "name": "DataScience", "terms": DEFAULT_TERMS[3:6] },
+            { "name": "Java", "terms": ["Java[^Ss]", "Maven"] }, { "name": "JavaScript", "terms": ["JavaScript", "npm"] } ] }
+
+
+def load_files(repo):
+    files = []
+
+    for root, dirs, names in os.walk(repo):
+        for name in names:
+            if name.endswith(".md"):
+                path = os.path.join(root, name)
+
+                with open(path, encoding='utf-8') as f:
+                    files.append((path, name, f.read()))
+
+    return files
+
+
+def time_best(function, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def bench_delineate_segments(files):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for path, _, content in files:
+            delineate_segments(content, path)
+
+
+def collect_occurrences(files, terms):
+    """Precomputes the arguments of classify_occurrence for every occurrence, so the benchmark times only the classification."""
+    occurrences = []
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for path, name, content in files:
+            code_lines, intro_lines, metadata_lines = delineate_segments(content, path)
+
+            for term in terms:
+                for match in term.finditer(content):
+                    line_start = content.rfind("\n", 0, match.start()) + 1
+                    line_end = content.find("\n", match.end())
+                    line = content[line_start:len(content) if line_end == -1 else line_end + 1]
+                    line_num = content.count("\n", 0, match.start()) + 1
+                    occurrences.append((line, match.end() - line_start, term.pattern, line_num, name,
+                        code_lines, intro_lines, metadata_lines))
+
+    return occurrences
+
+
+def bench_classify_occurrence(occurrences):
+    for occurrence in occurrences:
+        classify_occurrence(*occurrence)
+
+
+def bench_take_inventory(config, results_folder):
+    """Runs take_inventory in results_folder and returns its run report."""
+    from take_inventory import take_inventory
+
+    cwd = os.getcwd()
+    os.chdir(results_folder)
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            take_inventory(config, results_folder, run_name="benchmark")
+
+        with open("benchmark-report.json", encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.chdir(cwd)
+
+
+def run_benchmarks(repo, repeat):
+    config = make_config(repo)
+    files = load_files(repo)
+    terms = [re.compile(term, re.IGNORECASE | re.MULTILINE) for search in config["inventory"] for term in search["terms"]]
+    occurrences = collect_occurrences(files, terms)
+
+    stages = {}
+    stages["delineate_segments"] = time_best(lambda: bench_delineate_segments(files), repeat)
+    stages["classify_occurrence"] = time_best(lambda: bench_classify_occurrence(occurrences), repeat)
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as results_folder:
+            start = time.perf_counter()
+            report = bench_take_inventory(config, results_folder)
+            elapsed = time.perf_counter() - start
+
+        stages["take_inventory"] = min(stages.get("take_inventory", elapsed), elapsed)
+
+        for stage in POST_PROCESSING_STAGES:
+            seconds = report["stages"].get(stage, {}).get("wall_seconds", 0.0)
+            stages[stage] = min(stages.get(stage, seconds), seconds)
+
+    return { "files": len(files), "bytes": sum(len(content) for _, _, content in files), "occurrences": len(occurrences),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "stages": { stage: round(seconds, 4) for stage, seconds in stages.items() } }
+
+
+def check_regressions(results, baseline, threshold, min_delta):
+    """Compares the stage times in results to baseline, returning a list of messages for stages that regressed."""
+    regressions = []
+
+    if results["files"] != baseline["files"]:
+        print("run_benchmarks, WARNING, Baseline was measured with a different number of files, {}, {}".format(baseline["files"], results["files"]))
+
+    for stage, seconds in results["stages"].items():
+        base = baseline["stages"].get(stage)
+
+        if base is None:
+            continue
+
+        if seconds > base * (1 + threshold) and seconds - base > min_delta:
+            regressions.append("{}: {:.4f}s vs. baseline {:.4f}s (+{:.0%})".format(stage, seconds, base, seconds / base - 1))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    options = { "files": 1000, "repeat": 3, "repo": None, "save": None, "check": None, "threshold": 0.25, "min-delta": 0.01 }
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["files=", "repeat=", "repo=", "save=", "check=", "threshold=", "min-delta="])
+    except getopt.GetoptError:
+        opts = [('-h', '')]
+
+    for opt, arg in opts:
+        if opt in ('-h', '-H', '-?'):
+            print("Usage: python benchmarks/run_benchmarks.py [--files N] [--repeat N] [--repo <folder>]")
+            print("           [--save <baseline.json>] [--check <baseline.json>] [--threshold FRACTION] [--min-delta SECONDS]")
+            print("--repo uses an existing folder instead of generating a synthetic repo.")
+            sys.exit(2)
+
+        key = opt[2:]
+        options[key] = type(options[key])(arg) if options[key] is not None else arg
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        repo = options["repo"]
+
+        if repo is None:
+            repo = os.path.join(temp_folder, "docs")
+            generate_docs(repo, { "files": options["files"] })
+
+        results = run_benchmarks(repo, options["repeat"])
+
+    print(json.dumps(results, indent=4))
+
+    if options["save"] is not None:
+        with open(options["save"], 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+        print("run_benchmarks, INFO, Saved baseline, , {}".format(options["save"]))
+
+    if options["check"] is not None:
+        with open(options["check"], encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = check_regressions(results, baseline, options["threshold"], options["min-delta"])
+
+        for regression in regressions:
+            print("run_benchmarks, ERROR, Stage slower than baseline, , {}".format(regression))
+
+        if len(regressions) > 0:
+            sys.exit(1)
+
+        print("run_benchmarks, INFO, No stage is slower than the baseline by more than {:.0%}, , ".format(options["threshold"]))
@@ -18,121 +18,128 @@ import sys
 import json
 from utilities import parse_config_arguments, make_identifier, TAGS, COLUMNS
 
-def consolidate(config, input_file, output_file):
-    print("consolidate, INFO, Starting consolidation, {}".format(input_file))
+def get_terms(config, inventory):
+    """Returns the list of terms for the named inventory in config, or None if there's no such inventory."""
+    for content_set in config["inventory"]:
+        if content_set["name"].lower() == inventory.lower():
+            return content_set["terms"]
 
-    prefix = input_file.split('_')[0].lower()
-    terms = None
+    return None
 
-    for content_set in config["inventory"]:
-        if content_set["name"].lower() == prefix:
-            terms = content_set["terms"]
-            break
 
-    if terms is None:
-        print("consolidate, ERROR, Could not find terms for {}, {}".format(prefix, input_file))
-        sys.exit(1)
+def consolidated_headers(headers, terms):
+    """Given the headers of the input file, returns the headers of the consolidated output."""
+    headers = list(headers)
+    tags = list(TAGS.values())
+    index_term = headers.index(COLUMNS["term"])
+
+    # We'll replace the "Term" column with individual terms; Tags is also expanded to the distinct
+    # classification tags. We also remove Line and Extract because they're no longer meaningful.
+    headers.remove(COLUMNS["term"])
+    headers.remove(COLUMNS["tag"])
+    headers.remove(COLUMNS["line"])
+    headers.remove(COLUMNS["extract"])
+
+    # Insert columns for each of the terms, plus a "Term_Total" column. Also insert columns for each of 
+    # the tags.
+    #
+    # NOTE: all of these columns should be named with valid Python identifiers, which the make_identifier
+    # function guarantees.
+
+    for i in range(0, len(terms)):
+        headers.insert(index_term + i, make_identifier(terms[i]))
+
+    headers.insert(index_term + i + 1, COLUMNS["term_total"])
+    index_tags_new = index_term + i + 2   # Index for inserting tabs after term counts
     
+    for i in range(0, len(tags)):        
+        headers.insert(index_tags_new + i, make_identifier(tags[i]))            
+
+    return headers
+
+
+def consolidate_file_rows(rows, headers, terms):
+    """Collapses the input rows for one file (with the given input headers) into a single consolidated row."""
     tags = list(TAGS.values())
 
-    with open(input_file, encoding='utf-8') as f_in:
-        import csv    
-        reader = csv.reader(f_in)    
-        headers = next(reader)
-        
-        # We'll replace the "Term" column with individual terms; Tags is also expanded to the distinct
-        # classification tags. We also remove Line and Extract because they're no longer meaningful.
-        index_filename = headers.index(COLUMNS["file"])
-        index_term = headers.index(COLUMNS["term"])
-        index_tag = headers.index(COLUMNS["tag"])
-        index_line = headers.index(COLUMNS["line"])
-        index_extract = headers.index(COLUMNS["extract"])
-
-        headers.remove(COLUMNS["term"])
-        headers.remove(COLUMNS["tag"])
-        headers.remove(COLUMNS["line"])
-        headers.remove(COLUMNS["extract"])
-
-        # Insert columns for each of the terms, plus a "Term_Total" column. Also insert columns for each of 
-        # the tags.
-        #
-        # NOTE: all of these columns should be named with valid Python identifiers, which the make_identifier
-        # function guarantees.
-
-        for i in range(0, len(terms)):
-            headers.insert(index_term + i, make_identifier(terms[i]))
-
-        headers.insert(index_term + i + 1, COLUMNS["term_total"])
-        index_tags_new = index_term + i + 2   # Index for inserting tabs after term counts
-        
-        for i in range(0, len(tags)):        
-            headers.insert(index_tags_new + i, make_identifier(tags[i]))            
-        
-        index_filename_count = len(tags) - 1
+    index_filename = headers.index(COLUMNS["file"])
+    index_term = headers.index(COLUMNS["term"])
+    index_tag = headers.index(COLUMNS["tag"])
+    index_line = headers.index(COLUMNS["line"])
+    index_extract = headers.index(COLUMNS["extract"])
+    index_tags_new = index_term + len(terms) + 1
+    index_filename_count = len(tags) - 1
 
-        with open(output_file, 'w', encoding='utf-8', newline='') as f_out:        
-            writer = csv.writer(f_out)
-            writer.writerow(headers)
+    term_counts = [0] * len(terms)
+    tag_counts = [0] * len(tags)
+
+    for row in rows:
+        term_counts[terms.index(row[index_term])] += 1
+        tag_counts[tags.index(row[index_tag])] += 1
+
+    # Write the term count columns, starting from the last row for the file. But first, remove the Extract, Line,
+    # Tag, and Term columns, which are no longer relevant. We do this in reverse order because we're using indices.
+    # Note that this does assume the ordering generated by take_inventory.py and extract_metadata.py.
+    current_row = list(rows[-1])
+    current_row.pop(index_extract)
+    current_row.pop(index_line)
+    current_row.pop(index_tag)
+    current_row.pop(index_term)
+
+    total = 0
 
-            term_counts = [0] * len(terms)
-            tag_counts = [0] * len(tags)
+    for i in range(0, len(terms)):
+        current_row.insert(index_term + i, term_counts[i])                
+        total += term_counts[i]
 
-            try:
-                current_row = next(reader)
-            except:
-                current_row = None
+    # Add one more row with the total count of terms, which accommodates sorting
+    current_row.insert(index_term + len(terms), total)
 
-            while current_row is not None:
-                if current_row == None:
-                    break
+    # Add the tag count columns after patching up the in_filename count,
+    # which we have to do separately.
+    # Add the filename occurrence count                
+    filename = current_row[index_filename].lower()
+    filename_total = sum(filename.count(term.lower()) for term in terms)
+    tag_counts[index_filename_count] = filename_total
 
-                next_row = next(reader, None)  # Assigns None if we're at the end
+    for i in range(0, len(tags)):
+        current_row.insert(index_tags_new + i, tag_counts[i])                
 
-                term = current_row[index_term]
-                term_counts[terms.index(term)] += 1
+    return current_row
 
-                tag = current_row[index_tag]
-                tag_counts[tags.index(tag)] += 1
 
-                # If the filename in the next row is the same, continue with the next line
-                if next_row != None and current_row[1] == next_row[1]:
-                    current_row = next_row
-                    continue
+def consolidate(config, input_file, output_file):
+    print("consolidate, INFO, Starting consolidation, {}".format(input_file))
 
-                # Otherwise, write the term count columns. But first, remove the Extract, Line, Tag, and Term columns,
-                # which are no longer relevant. We do this in reverse order because we're using indices. Note that
-                # this does assume the ordering generated by take_inventory.py and extract_metadata.py.
-                current_row.pop(index_extract)
-                current_row.pop(index_line)
-                current_row.pop(index_tag)
-                current_row.pop(index_term)
+    prefix = input_file.split('_')[0].lower()
+    terms = get_terms(config, prefix)
 
-                total = 0
+    if terms is None:
+        print("consolidate, ERROR, Could not find terms for {}, {}".format(prefix, input_file))
+        sys.exit(1)
 
-                for i in range(0, len(terms)):
-                    current_row.insert(index_term + i, term_counts[i])                
-                    total += term_counts[i]
+    with open(input_file, encoding='utf-8') as f_in:
+        import csv    
+        reader = csv.reader(f_in)    
+        headers = next(reader)
 
-                # Add one more row with the total count of terms, which accommodates sorting
-                current_row.insert(index_term + i + 1, total)
+        with open(output_file, 'w', encoding='utf-8', newline='') as f_out:        
+            writer = csv.writer(f_out)
+            writer.writerow(consolidated_headers(headers, terms))
 
-                # Add the tag count columns after patching up the in_filename count,
-                # which we have to do separately.
-                # Add the filename occurrence count                
-                filename = current_row[index_filename].lower()
-                filename_total = sum(filename.count(term.lower()) for term in terms)
-                tag_counts[index_filename_count] = filename_total
+            # Collect the rows for each file; when the filename in the next row differs, write the
+            # consolidated row for the file.
+            file_rows = []
 
-                for i in range(0, len(tags)):
-                    current_row.insert(index_tags_new + i, tag_counts[i])                
+            for row in reader:
+                if len(file_rows) > 0 and file_rows[-1][1] != row[1]:
+                    writer.writerow(consolidate_file_rows(file_rows, headers, terms))
+                    file_rows = []
 
-                # Write the row
-                writer.writerow(current_row)
+                file_rows.append(row)
 
-                # Reset state for the next round, including the counts
-                current_row = next_row
-                term_counts = [0] * len(terms)
-                tag_counts = [0] * len(tags)
+            if len(file_rows) > 0:
+                writer.writerow(consolidate_file_rows(file_rows, headers, terms))
 
     print("consolidate, INFO, Consolidation complete, ,")
 
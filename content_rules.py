@@ -0,0 +1,71 @@
+# Content health checks for take_inventory.py (--issues). Each check is a rule that's declared once here and runs
+# inside the scan of each file, on the content the scan already decoded and the segments from
+# utilities.delineate_segments, so adding a rule doesn't add another read of the docsets.
+#
+# A rule is a function registered with the @rule decorator that takes the content, its lines (without line endings),
+# and the segments (code_blocks, intro, metadata), and generates (line_num, detail) for each issue it finds. The
+# heading checks need the state of the segment analysis, so delineate_segments reports them itself when given an
+# issues list; they're listed in SEGMENT_RULES.
+#
+# With --issues, take_inventory.py collects the issues of every file in run_<date>-<sequential_int>-issues.csv
+# (with the columns in ISSUE_HEADERS) instead of printing them as warnings among the other output.
+
+import csv
+
+from utilities import delineate_segments
+
+ISSUE_HEADERS = [ "file", "line", "rule", "detail" ]
+
+# Rules reported by delineate_segments
+SEGMENT_RULES = [ "subheading_before_h1", "second_h1", "h3_after_h1" ]
+
+RULES = []
+
+
+def rule(name):
+    """Registers the decorated function as the content rule with the given name."""
+    def register(check):
+        RULES.append((name, check))
+        return check
+
+    return register
+
+
+@rule("not_utf8")
+def check_byte_order_mark(content, lines, segments):
+    # A UTF-8 byte order mark shows up as "ï»¿" when the file is read with a legacy code page, or as U+FEFF
+    # when it's decoded as UTF-8
+    if len(lines) > 0 and (lines[0].startswith("ï»¿") or lines[0].startswith("\ufeff")):
+        yield 1, "File is not utf-8 encoded"
+
+
+@rule("no_metadata")
+def check_metadata(content, lines, segments):
+    # delineate_segments finds metadata only if it starts on the first line
+    if len(segments[2]) == 0:
+        yield 1, "File contains no metadata"
+
+
+def check_content(content, path, segments, issues):
+    """Runs the registered rules on the content of a file with the given segments, appending a (path, line_num, rule,
+    detail) tuple to issues for each issue found."""
+    lines = content.splitlines()
+
+    for name, check in RULES:
+        issues.extend((path, line_num, name, detail) for line_num, detail in check(content, lines, segments))
+
+
+def find_issues(content, path):
+    """Returns the segments of content and the list of all its issues, from both delineate_segments and the rules."""
+    issues = []
+    segments = delineate_segments(content, path, issues)
+    check_content(content, path, segments, issues)
+    return segments, issues
+
+
+def write_issues(filename, issues):
+    """Writes issues sorted by file and line number."""
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ISSUE_HEADERS)
+        writer.writerows(sorted(issues, key=lambda issue: (issue[0], issue[1], issue[2])))
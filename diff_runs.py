@@ -0,0 +1,173 @@
+# Script to report what changed between two inventory runs: articles that were added or removed, and the
+# change in the score and each term and tag count for articles in both. The inputs are two -consolidated.csv
+# or two -scored.csv files, or two runs in a results store (see results_store.py).
+#
+# Both inputs are sorted by filename (as take_inventory.py produces them), so the script merges them in a single
+# streaming pass and holds only one row from each input in memory, which handles outputs of any size.
+#
+# The output has a "change" column (added, removed, or changed), the docset, file, and url, and a delta column
+# for each count (new value minus old value). Files whose counts are identical in both runs are omitted.
+#
+# Usage: python diff_runs.py <old_csv_file> <new_csv_file> [<output_csv_file>]
+#        python diff_runs.py --store <database_file> --inventory <name> <old_run_id> <new_run_id> [<output_csv_file>]
+#
+# Output goes to the console if no output file is given.
+
+import csv
+import getopt
+import sys
+from utilities import COLUMNS
+
+# Columns that don't hold counts, which are carried (or dropped) rather than compared
+TEXT_COLUMNS = [COLUMNS[key] for key in ["docset", "file", "url", "msauthor", "author", "manager", "msdate", "msservice",
+    "mstopic", "h1", "title", "description"]]
+
+
+def csv_count_columns(filename):
+    with open(filename, encoding='utf-8') as f:
+        headers = next(csv.reader(f))
+
+    return [column for column in headers if column not in TEXT_COLUMNS]
+
+
+def read_csv_rows(filename):
+    """Generates (file, docset, url, {column: count}) for each row of a consolidated or scored file."""
+    with open(filename, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        index_file = headers.index(COLUMNS["file"])
+        index_docset = headers.index(COLUMNS["docset"])
+        index_url = headers.index(COLUMNS["url"])
+        indexes = [(column, i) for i, column in enumerate(headers) if column not in TEXT_COLUMNS]
+
+        for row in reader:
+            yield row[index_file], row[index_docset], row[index_url], { column: int(row[i] or 0) for column, i in indexes }
+
+
+def store_count_columns(connection, inventory, run_ids):
+    names = connection.execute("SELECT DISTINCT name FROM consolidated WHERE inventory = ? AND run_id IN (?, ?)",
+        (inventory, run_ids[0], run_ids[1])).fetchall()
+    return [COLUMNS["score"]] + sorted(name for name, in names)
+
+
+def read_store_rows(connection, inventory, run_id):
+    """Generates (file, docset, url, {column: count}) for each file in a stored run, in filename order."""
+    cursor = connection.execute("""
+        SELECT files.path, files.docset, files.url, consolidated.name, consolidated.count
+            FROM consolidated JOIN files ON files.id = consolidated.file_id
+            WHERE consolidated.run_id = ? AND consolidated.inventory = ?
+        UNION ALL
+        SELECT files.path, files.docset, files.url, ?, scores.score
+            FROM scores JOIN files ON files.id = scores.file_id
+            WHERE scores.run_id = ? AND scores.inventory = ?
+        ORDER BY 1""", (run_id, inventory, COLUMNS["score"], run_id, inventory))
+
+    current = None
+
+    for path, docset, url, name, count in cursor:
+        if current is not None and current[0] != path:
+            yield current
+            current = None
+
+        if current is None:
+            current = (path, docset, url, {})
+
+        current[3][name] = count
+
+    if current is not None:
+        yield current
+
+
+def check_order(rows, label):
+    """Passes rows through, stopping with an error if they aren't sorted by filename, which the merge relies on."""
+    previous = None
+
+    for row in rows:
+        if previous is not None and row[0] < previous:
+            print("diff_runs, ERROR, Input is not sorted by filename, {}, {}".format(label, row[0]))
+            sys.exit(1)
+
+        previous = row[0]
+        yield row
+
+
+def diff_rows(old_rows, new_rows, columns):
+    """Merges two sorted streams of (file, docset, url, counts) and generates the output rows for files that were added,
+    removed, or changed."""
+    old = next(old_rows, None)
+    new = next(new_rows, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            change, docset, path, url, deltas = "removed", old[1], old[0], old[2], [-old[3].get(c, 0) for c in columns]
+            old = next(old_rows, None)
+        elif old is None or new[0] < old[0]:
+            change, docset, path, url, deltas = "added", new[1], new[0], new[2], [new[3].get(c, 0) for c in columns]
+            new = next(new_rows, None)
+        else:
+            change, docset, path, url = "changed", new[1], new[0], new[2]
+            deltas = [new[3].get(c, 0) - old[3].get(c, 0) for c in columns]
+            old = next(old_rows, None)
+            new = next(new_rows, None)
+
+            if not any(deltas):
+                continue
+
+        yield [change, docset, path, url] + deltas
+
+
+def diff_runs(old_rows, new_rows, columns, output):
+    print("diff_runs, INFO, Starting comparison, , ", file=sys.stderr)
+
+    writer = csv.writer(output)
+    writer.writerow(["change", COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"]] + [column + "_delta" for column in columns])
+
+    counts = { "added": 0, "removed": 0, "changed": 0 }
+
+    for row in diff_rows(check_order(old_rows, "old"), check_order(new_rows, "new"), columns):
+        counts[row[0]] += 1
+        writer.writerow(row)
+
+    print("diff_runs, INFO, Comparison complete, {} added, {} removed, {} changed".format(counts["added"], counts["removed"],
+        counts["changed"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["store=", "inventory="])
+    except getopt.GetoptError:
+        opts, args = [('-h', '')], []
+
+    options = dict(opts)
+
+    try:
+        run_ids = (int(args[0]), int(args[1])) if '--store' in options and len(args) >= 2 else None
+    except ValueError:
+        options['-h'] = ''
+
+    if '-h' in options or '-H' in options or '-?' in options or len(args) not in (2, 3) \
+            or (('--store' in options) != ('--inventory' in options)):
+        print("Usage: python diff_runs.py <old_csv_file> <new_csv_file> [<output_csv_file>]")
+        print("       python diff_runs.py --store <database_file> --inventory <name> <old_run_id> <new_run_id> [<output_csv_file>]")
+        print("The CSV files are both -consolidated.csv or both -scored.csv outputs from take_inventory.py.")
+        sys.exit(2)
+
+    if '--store' in options:
+        from results_store import open_store
+
+        connection = open_store(options['--store'])
+        inventory = options['--inventory'].lower()
+        columns = store_count_columns(connection, inventory, run_ids)
+        old_rows = read_store_rows(connection, inventory, run_ids[0])
+        new_rows = read_store_rows(connection, inventory, run_ids[1])
+    else:
+        old_columns = csv_count_columns(args[0])
+        columns = old_columns + [column for column in csv_count_columns(args[1]) if column not in old_columns]
+        old_rows = read_csv_rows(args[0])
+        new_rows = read_csv_rows(args[1])
+
+    if len(args) == 3:
+        with open(args[2], 'w', encoding='utf-8', newline='') as output:
+            diff_runs(old_rows, new_rows, columns, output)
+    else:
+        diff_runs(old_rows, new_rows, columns, sys.stdout)
@@ -0,0 +1,169 @@
+# Shared directory enumeration for the docsets listed in a config file, used by take_inventory.py,
+# get_file_data.py, and tally_age.py.
+#
+# Enumeration uses os.scandir, whose entries carry the file type (and, on Windows, the stat results)
+# from the directory listing itself, so we avoid a separate stat or pathlib object per file. Excluded
+# folders are pruned before we descend into them. An exclusion is either a bare folder name, which is
+# excluded at any depth (such as "includes"), or a glob pattern that's matched against the folder's
+# path relative to the docset root, using / separators (such as "articles/*/media").
+
+import fnmatch
+import os
+import re
+
+_GLOB_CHARS = re.compile(r"[*?\[/\\]")
+
+
+def compile_exclusions(exclude_folders):
+    """Splits a list of exclusions into a set of bare folder names and a compiled regex for the glob patterns
+    (or None if there are no patterns)."""
+    names = set()
+    patterns = []
+
+    for exclusion in exclude_folders or []:
+        if _GLOB_CHARS.search(exclusion):
+            patterns.append(fnmatch.translate(exclusion.replace('\\', '/').strip('/')))
+        else:
+            names.add(exclusion)
+
+    pattern = re.compile("|".join(patterns)) if len(patterns) > 0 else None
+    return names, pattern
+
+
+def exclusion_filter(exclude_folders):
+    """Returns a function that takes a file path relative to the docset root (with / separators) and returns True
+    if the file is in a folder excluded by the given list, for filtering entries walked with other exclusions."""
+    names, pattern = compile_exclusions(exclude_folders)
+
+    def is_excluded(relative_path):
+        parts = relative_path.split("/")[:-1]
+
+        for i in range(len(parts)):
+            if parts[i] in names or (pattern is not None and pattern.match("/".join(parts[:i + 1]))):
+                return True
+
+        return False
+
+    return is_excluded
+
+
+def walk_docset(folder, exclude_folders, extension=".md"):
+    """Generates os.DirEntry objects for files with the given extension under folder, skipping excluded folders.
+    Call entry.stat() to get the (cached) stat results for an entry. Files come in the order os.walk gives them: the
+    files of a folder, then each of its subfolders in turn, in directory listing order."""
+    names, pattern = compile_exclusions(exclude_folders)
+    pending = [(folder, "")]
+
+    while len(pending) > 0:
+        path, relative = pending.pop()
+        subfolders = []
+
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in names:
+                            continue
+
+                        relative_child = entry.name if relative == "" else relative + "/" + entry.name
+
+                        if pattern is not None and pattern.match(relative_child):
+                            continue
+
+                        subfolders.append((entry.path, relative_child))
+                    elif entry.name.endswith(extension) and entry.is_file():
+                        yield entry
+        except OSError as e:
+            print("enumerate_files, WARNING, Could not read folder, {}, {}".format(e.strerror, path))
+
+        # Pushed in reverse, so the first subfolder (and everything under it) is walked next
+        pending.extend(reversed(subfolders))
+
+
+def content_sets(config, script):
+    """Generates (docset, folder, base_url, exclude_folders, inventories) tuples for the valid entries in the config's
+    content collection, with environment variables such as ${INVENTORY_REPO_ROOT} expanded in the path. inventories
+    is a dictionary of the names of the inventories that apply to the docset, each with the exclusions for that
+    inventory (see utilities.merge_configs); by default, every inventory in the config applies with the docset's
+    own exclusions. Skipped entries are reported using the given script name."""
+    for content_set in config["content"]:
+        docset = content_set.get("repo")
+        folder = content_set.get("path")
+        base_url = content_set.get("url")
+        exclude_folders = content_set.get("exclude_folders", [])
+        inventories = content_set.get("inventories")
+
+        if folder is None or folder == "":
+            print("{}, WARNING, No path for docset, Skipping, {}".format(script, docset))
+            continue
+
+        if docset is None or base_url is None:
+            print("{}, ERROR, Malformed config entry for docset, Check your config file, {}".format(script, docset))
+            continue
+
+        if inventories is None:
+            inventories = { search["name"].lower(): exclude_folders for search in config.get("inventory", []) }
+
+        yield docset, os.path.expandvars(folder), base_url, exclude_folders, inventories
+
+
+# Marks the end of a docset's entries in the queue that _walk_into fills
+_END = object()
+
+
+def _walk_into(entries, folder, exclude_folders, extension, stop):
+    """Puts the entries from walk_docset into the queue entries, followed by _END, until stop is set."""
+    try:
+        for entry in walk_docset(folder, exclude_folders, extension):
+            if stop.is_set():
+                break
+
+            entries.put(entry)
+    finally:
+        entries.put(_END)
+
+
+def _queued_entries(entries, future):
+    """Generates the entries that _walk_into puts into the queue entries, then raises any exception from the walk."""
+    while True:
+        entry = entries.get()
+
+        if entry is _END:
+            break
+
+        yield entry
+
+    future.result()
+
+
+def enumerate_docsets(docsets, extension=".md"):
+    """Given tuples from content_sets, generates the same tuples with an iterator over the docset's file entries
+    appended. The entries are enumerated on a background thread as the caller consumes them, and the thread goes on
+    to the next docset as soon as it finishes one, so on cold file systems the enumeration of every docset, the
+    first included, overlaps the scanning."""
+    # Imported here because concurrent.futures is slow to import and walk_docset doesn't need it
+    from concurrent.futures import ThreadPoolExecutor
+    from queue import SimpleQueue
+    from threading import Event
+
+    docsets = iter(docsets)
+    stop = Event()
+
+    def submit(docset):
+        entries = SimpleQueue()
+        future = executor.submit(_walk_into, entries, docset[1], docset[3], extension, stop)
+        return _queued_entries(entries, future)
+
+    # The single worker walks the docsets in order; the next one is submitted before the current one is yielded
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            docset = next(docsets, None)
+            entries = submit(docset) if docset is not None else None
+
+            while docset is not None:
+                next_docset = next(docsets, None)
+                next_entries = submit(next_docset) if next_docset is not None else None
+                yield docset + (entries,)
+                docset, entries = next_docset, next_entries
+        finally:
+            stop.set()
@@ -0,0 +1,283 @@
+# Quick estimate of what an inventory (or a new term) will produce, from a random sample of the files instead of
+# a full scan. The script lists the files of the docsets in the config, scans a stratified random sample of them
+# with the same matching and classification as take_inventory.py, and extrapolates the counts with confidence
+# intervals:
+#
+#    occurrences: the number of occurrences of each term, and of all terms together
+#    articles: the number of files with at least one occurrence of each term, and of any term
+#    tag:<tag>: the number of occurrences with each classification tag
+#    scored_articles: the number of files that score.py would give a nonzero score (from the counts that
+#        consolidate.py would produce)
+#
+# Strata are the folders of each docset down to STRATUM_DEPTH levels (such as articles/<service>), so a service
+# with reference pages and a service with tutorials are both represented. The script first scans a pilot sample of
+# PILOT_FILES files, then uses the variance it finds to work out how many files it needs for the confidence interval
+# of the total number of occurrences and of articles to be within --error of the estimate, and scans that many
+# (allocated to the strata in proportion to their size).
+# The intervals use the normal approximation, which is rough for rare terms found in only a few sampled files.
+#
+# Usage: python estimate.py --config <config_file> [--term <term> ...] [--error <fraction>] [--confidence <level>]
+#            [--seed <n>] [--output <csv_file>]
+#
+# Without --term, the script estimates the inventories in the config; with --term (which can be repeated), it
+# estimates a single inventory of the given terms instead, which is the way to try a term before adding it.
+# --error is the target relative half-width of the intervals (default 0.1, that is, plus or minus 10%), and
+# --confidence is their confidence level (default 0.95). --output also writes the estimates to a CSV file.
+
+import contextlib
+import csv
+import getopt
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+from consolidate import consolidate_file_rows, consolidated_headers
+from enumerate_files import content_sets, enumerate_docsets
+from instrumentation import RunStats
+from score import calculate_score
+from take_inventory import compile_terms, read_file, scan_content
+from utilities import make_url, COLUMNS
+
+PILOT_FILES = 200
+STRATUM_DEPTH = 2
+RESULT_HEADERS = [ COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"], COLUMNS["term"], COLUMNS["tag"], COLUMNS["line"],
+    COLUMNS["extract"] ]
+ESTIMATE_HEADERS = [ "inventory", "term", "measure", "estimate", "lower", "upper" ]
+
+
+def list_strata(config):
+    """Returns a dictionary of (docset, folder down to STRATUM_DEPTH levels) to a list of (full_path, file, docset,
+    url, inventories) tuples for the files of the docsets in config."""
+    strata = {}
+
+    for docset, folder, base_url, _, inventories, entries in enumerate_docsets(content_sets(config, "estimate")):
+        for entry in entries:
+            relative_path = os.path.relpath(entry.path, folder).replace('\\', '/')
+            stratum = "/".join(relative_path.split("/")[:-1][:STRATUM_DEPTH])
+            strata.setdefault((docset, stratum), []).append((entry.path, entry.name, docset,
+                make_url(base_url, folder, entry.path), list(inventories.keys())))
+
+    return strata
+
+
+def allocate(strata, total):
+    """Returns the number of files to sample from each stratum for a sample of about total files, in proportion to
+    the size of each stratum, with at least two files from each stratum that has them (so its variance is known)."""
+    population = sum(len(files) for files in strata.values())
+    return { key: min(len(files), max(2, math.ceil(total * len(files) / population))) for key, files in strata.items() }
+
+
+def measure_file(full_path, file, docset, url, inventories, terms, literals, search_terms):
+    """Scans one file, returning a dictionary of (inventory, term, measure) to the file's value for that measure."""
+    try:
+        content, _ = read_file(full_path)
+    except (OSError, UnicodeDecodeError):
+        return {}
+
+    results = {}
+
+    # The segment warnings are the business of take_inventory, so we don't print them here
+    with contextlib.redirect_stdout(io.StringIO()):
+        scan_content(content, full_path, file, docset, url, inventories, terms, literals, results, RunStats())
+
+    values = {}
+
+    for name, rows in results.items():
+        if len(rows) == 0:
+            continue
+
+        values[(name, "", "occurrences")] = len(rows)
+        values[(name, "", "articles")] = 1
+
+        for row in rows:
+            values[(name, row[3], "occurrences")] = values.get((name, row[3], "occurrences"), 0) + 1
+            values[(name, row[3], "articles")] = 1
+            values[(name, "", "tag:" + row[4])] = values.get((name, "", "tag:" + row[4]), 0) + 1
+
+        consolidated = consolidate_file_rows(rows, RESULT_HEADERS, search_terms[name])
+
+        if calculate_score(consolidated_headers(RESULT_HEADERS, search_terms[name]), consolidated) != 0:
+            values[(name, "", "scored_articles")] = 1
+
+    return values
+
+
+def estimate_totals(strata, samples, measures):
+    """Returns a dictionary of measure to (estimate, variance) of the population total, from the sampled values of
+    each stratum (a list of dictionaries from measure_file, parallel to the stratum's sampled files)."""
+    totals = {}
+
+    for measure in measures:
+        estimate = 0.0
+        variance = 0.0
+
+        for key, values in samples.items():
+            population = len(strata[key])
+            n = len(values)
+            ys = [file_values.get(measure, 0) for file_values in values]
+            estimate += population * sum(ys) / n
+
+            if 1 < n < population:
+                variance += population * population * (1 - n / population) * statistics.variance(ys) / n
+
+        totals[measure] = (estimate, variance)
+
+    return totals
+
+
+def required_files(strata, samples, measures, error, z):
+    """Returns the number of files needed (with proportional allocation) for each of the given measures' intervals
+    to be within error of its estimate, based on the variance within each stratum of the sample so far."""
+    population = sum(len(files) for files in strata.values())
+    needed = 0
+
+    for measure in measures:
+        within = 0.0   # Sum over the strata of N_h * S_h^2
+        total = 0.0
+
+        for key, values in samples.items():
+            ys = [file_values.get(measure, 0) for file_values in values]
+            total += len(strata[key]) * sum(ys) / len(ys)
+
+            if len(ys) > 1:
+                within += len(strata[key]) * statistics.variance(ys)
+
+        if total == 0:
+            continue
+
+        n = z * z * population * within / (error * total) ** 2
+        needed = max(needed, math.ceil(n / (1 + n / population)))  # Finite population correction
+
+    return min(needed, population)
+
+
+def estimate(config, error=0.1, confidence=0.95, seed=None):
+    """Estimates the inventories of config from a sample, returning a list of rows in the order of ESTIMATE_HEADERS."""
+    start = time.perf_counter()
+    terms, literals = compile_terms(config)
+    search_terms = { search["name"].lower(): search["terms"] for search in config["inventory"] }
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+    strata = list_strata(config)
+    population = sum(len(files) for files in strata.values())
+
+    if population == 0:
+        print("estimate, WARNING, No files to sample, ,")
+        return []
+
+    # Shuffle each stratum once, so growing the sample takes the next files of each stratum
+    generator = random.Random(seed)
+
+    for files in strata.values():
+        generator.shuffle(files)
+
+    samples = { key: [] for key in strata.keys() }
+
+    def extend(counts):
+        for key, count in counts.items():
+            for item in strata[key][len(samples[key]):count]:
+                samples[key].append(measure_file(*item, terms, literals, search_terms))
+
+    extend(allocate(strata, PILOT_FILES))
+    pilot = sum(len(values) for values in samples.values())
+    targets = [(name, "", measure) for name in terms.keys() for measure in ["occurrences", "articles"]]
+    needed = required_files(strata, samples, targets, error, z)
+
+    if needed > pilot:
+        extend(allocate(strata, needed))
+
+    sampled = sum(len(values) for values in samples.values())
+    print("estimate, INFO, Sampled files, {} of {} in {} strata ({} in the pilot), {:.1f} seconds".format(sampled,
+        population, len(strata), pilot, time.perf_counter() - start))
+
+    # Every term gets an estimate, even if it isn't in any of the sampled files
+    measures = { (name, term, measure) for name in terms.keys() for term in [""] + search_terms[name]
+        for measure in ["occurrences", "articles"] }
+    measures.update((name, "", "scored_articles") for name in terms.keys())
+
+    for values in samples.values():
+        for file_values in values:
+            measures.update(file_values.keys())
+
+    rows = []
+
+    for (name, term, measure), (total, variance) in sorted(estimate_totals(strata, samples, measures).items()):
+        half_width = z * math.sqrt(variance)
+        rows.append([name, term, measure, round(total), max(0, round(total - half_width)), round(total + half_width)])
+
+    return rows
+
+
+if __name__ == "__main__":
+    config_file = None
+    search_terms = []
+    error = 0.1
+    confidence = 0.95
+    seed = None
+    output_file = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["config=", "term=", "error=", "confidence=", "seed=", "output="])
+    except getopt.GetoptError:
+        opts = [('-h', '')]
+
+    for opt, arg in opts:
+        if opt in ('-h', '-H', '-?'):
+            config_file = None
+            break
+
+        if opt == '--config':
+            config_file = arg
+
+        if opt == '--term':
+            search_terms.append(arg)
+
+        try:
+            if opt == '--error':
+                error = float(arg)
+
+            if opt == '--confidence':
+                confidence = float(arg)
+
+            if opt == '--seed':
+                seed = int(arg)
+        except ValueError:
+            config_file = None
+            break
+
+        if opt == '--output':
+            output_file = arg
+
+    if config_file is None:
+        print("Usage: python estimate.py --config <config_file> [--term <term> ...] [--error <fraction>] [--confidence <level>]")
+        print("           [--seed <n>] [--output <csv_file>]")
+        print("--term estimates an inventory of the given terms instead of the config's inventories; repeat for more terms.")
+        print("--error is the target relative half-width of the confidence intervals (default 0.1), and --confidence")
+        print("    is their confidence level (default 0.95).")
+        sys.exit(2)
+
+    with open(config_file, 'r') as config_load:
+        config = json.load(config_load)
+
+    if len(search_terms) > 0:
+        config = dict(config, inventory=[{ "name": "estimate", "terms": search_terms }])
+
+        for content_set in config["content"]:
+            content_set.pop("inventories", None)
+
+    print("Script,Type,Message,Detail,Item")
+    rows = estimate(config, error, confidence, seed)
+
+    for name, term, measure, total, lower, upper in rows:
+        print("estimate, RESULT, {} {} ({} to {}), {}, {}".format(measure, total, lower, upper, term, name))
+
+    if output_file is not None:
+        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(ESTIMATE_HEADERS)
+            writer.writerows(rows)
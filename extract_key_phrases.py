@@ -4,15 +4,15 @@
 #
 # Yo provide the endpoint and API key for your specific subscription through command line args.
 
-import http.client, urllib.request, urllib.parse, urllib.error, base64
-import requests
+import urllib.parse
 import json
-import numpy as np
 import sys
 from utilities import parse_endpoint_key_arguments, delineate_segments
 import time
 
 def get_key_phrases(endpoint, headers, params, body_text):
+    import http.client
+
     try:
         conn = http.client.HTTPSConnection(endpoint)
         conn.request("POST", "/text/analytics/v2.0/keyPhrases?%s" % params, body_text, headers)
@@ -43,6 +43,9 @@ def split_at_last_paragraph(text, max_length):
 
 
 def extract_key_phrases(endpoint, key, input_file, output_file):
+    # Imported here so that the script starts (and shows its usage) without paying for requests
+    import requests
+
     print("extract-key-phrases: Starting key phrase extraction")
 
     # Constants -- this limit is imposed by the API
@@ -125,7 +128,7 @@ def extract_key_phrases(endpoint, key, input_file, output_file):
                     # Throttle ourselves to avoid Cognitive Services rate limits
                     time.sleep(1)
 
-    all_phrases = sorted(np.unique(all_phrases))
+    all_phrases = sorted(set(all_phrases))
     
     with open('phraselist.txt', 'w') as phrase_file:
         phrase_file.writelines([str(phrase) + "\n" for phrase in all_phrases])
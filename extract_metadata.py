@@ -2,8 +2,13 @@
 # the specific files therein to extract author, date, H1, and other metadata,
 # producing a second, more extensive .csv file (named with a "-metadata" suffix).
 #
-# take_inventory.py invokes this script automatically at the end of its processing
+# take_inventory.py invokes this script automatically at the end of its processing, once per inventory. It passes
+# a MetadataCache that all the inventories of the run share, so each file's metadata is read only once per run
+# however many inventories find terms in it. With --metadata-cache <file>, the cache is also saved between runs
+# with the size and modification time of each file, and a file is read again only if either has changed.
 
+import json
+import os
 import sys
 from utilities import COLUMNS
 
@@ -13,7 +18,119 @@ def empty_metadata_values():
     return { 'title' : '', 'description': '', 'msdate' : '', 'author' : '', 'msauthor' : '', 'manager' : '',
         'msservice' : '', 'mstopic' : '' }
 
-def extract_metadata(input_file, output_file):
+# The strings we look for to find metadata; VS Code has different metadata tags, so each value in this dictionary
+# accommodates multiple possibilities. The keys here are used only internally and need not match csv column names.
+METADATA_TEXT = { 'title' : ['title:', 'PageTitle:'], 'description' : ['description:', 'MetaDescription:'],
+    'msdate' : ['ms.date:', 'DateApproved:'], 'author' : ['author:'], 'msauthor' : ['ms.author:'],
+    'manager' : ['manager:'], 'msservice' : ['ms.service:'], 'mstopic' : ['ms.topic']}
+
+# Output file order is docset, file, URL, term, tag, msauthor, author, msdate, mssservice, mstopic, line,
+# extract, H1, title, and description
+METADATA_HEADERS = [ COLUMNS['docset'], COLUMNS['file'], COLUMNS['url'], COLUMNS['msauthor'], COLUMNS['author'], 
+    COLUMNS['manager'], COLUMNS['msdate'], COLUMNS['msservice'], COLUMNS['mstopic'], COLUMNS['term'],
+    COLUMNS['tag'], COLUMNS['line'], COLUMNS['extract'], COLUMNS['h1'], COLUMNS['title'], COLUMNS['description'] ]
+
+
+def read_file_metadata(filename):
+    """Opens a source file and returns a tuple of its metadata values (a dictionary like empty_metadata_values)
+    and its H1."""
+
+    # Reset metadata values in case one or more of them aren't present
+    metadata_values = empty_metadata_values()
+    h1 = ''
+
+    with open(filename, encoding='utf-8') as docfile:
+        # To keep this simple, we read lines from the file and look for
+        # the metadata matches, and stopping when we reach the first line that starts
+        # with '#' which is assumed to be the H1.
+
+        # Guard against encoding issues in files, and print filename to allow for correction.
+        try:
+            metadata_header_count = 0
+
+            for line in docfile:                        
+                # Check for H1 and exit the loop if we find it. A special case is that some files have # comments in 
+                # the metadata, so we make sure we've seen two '---' lines first. We use find instead of
+                # startswith because some files have non-utf-8 encoding at the beginning; -1 means "not found".
+                if line.find('---') != -1:
+                    metadata_header_count += 1
+                    continue
+                
+                if line.startswith("#") and metadata_header_count >= 2:
+                    h1 = line.lstrip("# ")  # Remove all leading #'s and whitespace 
+                    break
+
+                for key, values in METADATA_TEXT.items():
+                    if any(line.startswith(value) for value in values):
+                        metadata_values[key] = line.split(":", 1)[1].strip()  # Remove metadata tag
+        except:
+            print("extract_metadata, ERROR, Skipping file with encoding error, Open file and check for errors, {}".format(filename))
+
+    return metadata_values, h1
+
+
+class MetadataCache:
+    def __init__(self, filename=None):
+        """Creates an empty cache, or loads the cache saved in filename if the file exists."""
+        self.filename = filename
+        self.entries = {}   # Path: (stamp, metadata_values, h1), where stamp is [st_mtime_ns, st_size]
+        self.checked = set()  # Paths whose entries are known to be current in this run
+        self.reads = 0
+        self.hits = 0
+
+        if filename is not None and os.path.exists(filename):
+            with open(filename, encoding='utf-8') as f:
+                self.entries = { path: (entry["stamp"], entry["metadata"], entry["h1"])
+                    for path, entry in json.load(f).items() }
+
+    def get(self, filename):
+        """Returns the tuple of metadata values and H1 for a file as read_file_metadata does, reading the file only
+        if it isn't in the cache or has changed since it was cached."""
+        if filename in self.checked:
+            self.hits += 1
+            return self.entries[filename][1:]
+
+        try:
+            stat = os.stat(filename)
+            stamp = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            stamp = None
+
+        entry = self.entries.get(filename)
+
+        if entry is not None and stamp is not None and entry[0] == stamp:
+            self.hits += 1
+        else:
+            self.reads += 1
+            entry = self.entries[filename] = (stamp, *read_file_metadata(filename))
+
+        self.checked.add(filename)
+        return entry[1:]
+
+    def save(self):
+        """Saves the entries of the files seen in this run, if the cache has a filename."""
+        if self.filename is None:
+            return
+
+        with open(self.filename, 'w', encoding='utf-8') as f:
+            json.dump({ path: { "stamp": self.entries[path][0], "metadata": self.entries[path][1], "h1": self.entries[path][2] }
+                for path in sorted(self.checked) }, f)
+
+    def report(self):
+        return { "files": len(self.checked), "reads": self.reads, "hits": self.hits }
+
+
+def metadata_row(docset, filename, url, term, tag, line_number, extract, metadata_values, h1):
+    """Returns an output row in the order of METADATA_HEADERS."""
+    return [docset, filename, url, metadata_values['msauthor'],
+        metadata_values['author'], metadata_values['manager'],
+        metadata_values['msdate'], metadata_values['msservice'], metadata_values['mstopic'],
+        term, tag, line_number, extract, h1, metadata_values['title'], metadata_values['description']]
+
+
+def extract_metadata(input_file, output_file, cache=None):
+    """Writes output_file with the rows of input_file and the metadata of each row's file. cache is an optional
+    MetadataCache to share across calls."""
     print("extract_metadata, INFO, Starting metadata extraction, , {}".format(input_file))
 
     with open(input_file, encoding='utf-8') as f_in:
@@ -22,13 +139,8 @@ def extract_metadata(input_file, output_file):
         reader = csv.reader(f_in)    
         
         with open(output_file, 'w', encoding='utf-8', newline='') as f_out:
-            # Output file order is docset, file, URL, term, tag, msauthor, author, msdate, mssservice, mstopic, line,
-            # extract, H1, title, and description
-            
             writer = csv.writer(f_out)
-            writer.writerow([ COLUMNS['docset'], COLUMNS['file'], COLUMNS['url'], COLUMNS['msauthor'], COLUMNS['author'], 
-                COLUMNS['manager'], COLUMNS['msdate'], COLUMNS['msservice'], COLUMNS['mstopic'], COLUMNS['term'],
-                COLUMNS['tag'], COLUMNS['line'], COLUMNS['extract'], COLUMNS['h1'], COLUMNS['title'], COLUMNS['description'] ])
+            writer.writerow(METADATA_HEADERS)
 
             # As we iterate on the rows in the input file, if the filename is the same as the
             # previous iteration, we use the same metadata values from that iteration to avoid
@@ -37,19 +149,11 @@ def extract_metadata(input_file, output_file):
             
             h1 = ''
 
-            # The strings we look for to find metadata; VS Code has different metadata tags, so each value in this dictionary
-            # accommodates multiple possibilities. The keys here are used only internally and need not match csv column names.
-            metadata_text = { 'title' : ['title:', 'PageTitle:'], 'description' : ['description:', 'MetaDescription:'],
-                'msdate' : ['ms.date:', 'DateApproved:'], 'author' : ['author:'], 'msauthor' : ['ms.author:'],
-                'manager' : ['manager:'], 'msservice' : ['ms.service:'], 'mstopic' : ['ms.topic']}
-            
             # The metadata values we find, which we carry from row to row
             metadata_values = empty_metadata_values()
             
             headers = next(reader)
 
-            count = 0
-
             for row in reader:
                 # Most of these variables are just for clarity in the program here
                 docset = row[headers.index(COLUMNS["docset"])]
@@ -64,44 +168,11 @@ def extract_metadata(input_file, output_file):
                     # Don't do anything, because the values of the metadata variables are still valid
                     pass
                 else:
-                    # Reset metadata values in case one or more of them aren't present; we don't want previous
-                    # values to accidentally carry over.
-                    metadata_values = empty_metadata_values()
-                    h1 = ''
-
-                    with open(filename, encoding='utf-8') as docfile:
-                        # To keep this simple, we read lines from the file and look for
-                        # the metadata matches, and stopping when we reach the first line that starts
-                        # with '#' which is assumed to be the H1.
-
-                        # Guard against encoding issues in files, and print filename to allow for correction.
-                        try:
-                            metadata_header_count = 0
-
-                            for line in docfile:                        
-                                # Check for H1 and exit the loop if we find it. A special case is that some files have # comments in 
-                                # the metadata, so we make sure we've seen two '---' lines first. We use find instead of
-                                # startswith because some files have non-utf-8 encoding at the beginning; -1 means "not found".
-                                if line.find('---') != -1:
-                                    metadata_header_count += 1
-                                    continue
-                                
-                                if line.startswith("#") and metadata_header_count >= 2:
-                                    h1 = line.lstrip("# ")  # Remove all leading #'s and whitespace 
-                                    break
-
-                                for key, values in metadata_text.items():
-                                    if any(line.startswith(value) for value in values):
-                                        metadata_values[key] = line.split(":", 1)[1].strip()  # Remove metadata tag
-                        except:
-                            print("extract_metadata, ERROR, Skipping file with encoding error, Open file and check for errors, {}".format(filename))
+                    metadata_values, h1 = cache.get(filename) if cache is not None else read_file_metadata(filename)
 
                     # At this point, all the metadata_values are set
 
-                writer.writerow([docset, filename, url, metadata_values['msauthor'],
-                                metadata_values['author'], metadata_values['manager'],
-                                metadata_values['msdate'], metadata_values['msservice'], metadata_values['mstopic'],
-                                term, tag, line_number, extract, h1, metadata_values['title'], metadata_values['description']])
+                writer.writerow(metadata_row(docset, filename, url, term, tag, line_number, extract, metadata_values, h1))
 
                 prev_file = filename
 
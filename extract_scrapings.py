@@ -1,8 +1,15 @@
 # Custom filtration--read a .CSV file line by line and do something else to it.
-
+#
+# By default, the metrics are computed from the markdown source (see page_metrics.py), which takes seconds
+# rather than hours. Pages are fetched only for files whose source can't be read, or for all files with --fetch.
+# --verify computes the metrics both ways, writes the values from the source, and reports each difference.
+# Fetching requires the requests and beautifulsoup4 packages. Without them, --fetch and --verify stop with an error,
+# and the default mode writes -1s for the files it can't read.
+
+import getopt
+import importlib.util
 import sys
-import requests
-from bs4 import BeautifulSoup
+from page_metrics import file_page_metrics, SCRAPING_HEADERS
 from utilities import COLUMNS
 
 USER_AGENT = {'User-Agent':'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36'}
@@ -79,7 +86,78 @@ def count_code_blocks(soup, languages):
 
     return count
 
-def extract_scrapings(input_file, output_file):    
+def can_fetch():
+    """Returns True if the packages needed to fetch pages are installed."""
+    return all(importlib.util.find_spec(name) is not None for name in ["requests", "bs4"])
+
+
+def fetch_page_metrics(url):
+    """Fetches a published page and returns the list of metrics in page_metrics.SCRAPING_HEADERS, or None if the
+    request fails or the packages needed to fetch pages aren't installed."""
+    try:
+        import requests
+        from bs4 import BeautifulSoup
+    except ImportError:
+        print("extract_scrapings, WARNING, Fetching pages requires the requests and beautifulsoup4 packages, Writing -1s, {}".format(url))
+        return None
+
+    # Go get the page content
+    try:
+        response = requests.get(url, headers=USER_AGENT)
+        response.raise_for_status()
+    except:
+        print("extract_scrapings, WARNING, Request failed, {}".format(url))
+        return None
+
+    page_text = response.text
+
+    # We need the BeautifulSoup object for multiple parsings, so create it once
+    soup = BeautifulSoup(page_text, 'html.parser')
+
+    time = parse_time_to_read(soup)
+    link_count = count_intro_links(soup)
+
+    # Note: an inconsistency in article is use of "python" or "Python" for code block
+    # languages, which comes through in the HTML as lang-python and lang-Python, both of
+    # which we must count
+    code_count_python = count_code_blocks(soup, ["python"])
+    code_count_js = count_code_blocks(soup, ["javascript", "js", "typescript", "node", "node.js"])
+    code_count_java = count_code_blocks(soup, ["java"])
+    code_count_cli = count_code_blocks(soup, ["cli", "ps", "bash", "shell"])
+    code_count_unfenced = count_code_blocks(soup, None)
+
+    return [time, link_count, code_count_python, code_count_js, code_count_java, code_count_cli, code_count_unfenced]
+
+
+def get_page_metrics(path, url, mode="source"):
+    """Returns the page metrics of a file (None if they can't be computed or fetched) and the number of metrics for
+    which the source and the page differ, which is nonzero only in "verify" mode."""
+    metrics = file_page_metrics(path) if mode != "fetch" else None
+    differences = 0
+
+    if metrics is None or mode == "verify":
+        fetched = fetch_page_metrics(url)
+
+        if metrics is None:
+            metrics = fetched
+        elif fetched is not None:
+            for header, value, fetched_value in zip(SCRAPING_HEADERS, metrics, fetched):
+                if value != fetched_value:
+                    differences += 1
+                    print("extract_scrapings, WARNING, Source and page differ, {} {} (page {}), {}".format(
+                        header, value, fetched_value, url))
+
+    return metrics, differences
+
+
+def extract_scrapings(input_file, output_file, mode="source", cache=None):
+    """Appends the page metrics to each row of input_file. mode is "source" (fetching only the pages whose source
+    can't be read), "fetch", or "verify". cache is an optional dictionary of file path to metrics to share across
+    calls, so that files in more than one input are computed or fetched only once."""
+    if mode != "source" and not can_fetch():
+        print("extract_scrapings, ERROR, Fetching pages requires the requests and beautifulsoup4 packages, , {}".format(input_file))
+        sys.exit(1)
+
     print("extract_scrapings, INFO, Starting extraction, {}".format(input_file))
 
     with open(input_file, encoding='utf-8') as f_in:
@@ -89,82 +167,69 @@ def extract_scrapings(input_file, output_file):
         headers = next(reader)
 
         index_url = headers.index(COLUMNS["url"])
+        index_file = headers.index(COLUMNS["file"])
 
         with open(output_file, 'w', encoding='utf-8', newline='') as f_out:        
             writer = csv.writer(f_out)
 
             # Append the columns we'll be adding
-            headers.append("minutes_to_read")
-            headers.append("links_in_intro")
-            headers.append("code_blocks_python")
-            headers.append("code_blocks_js")
-            headers.append("code_blocks_java")
-            headers.append("code_blocks_cli")
-            headers.append("code_blocks_unfenced")
-
-            writer.writerow(headers)
+            writer.writerow(headers + SCRAPING_HEADERS)
 
             file_count = 0
+            differences = 0
+            path = None
 
             for row in reader:
                 url = row[index_url]
-                file_count += 1
-
-                if file_count % 100 == 0:
-                    print("extract_scrapings, INFO, Files processed, {}".format(file_count))
 
-                # Go get the page content
-                try:
-                    response = requests.get(url, headers=USER_AGENT)
-                    response.raise_for_status()
-                except:
-                    print("extract_scrapings, WARNING, Request failed, {}".format(url))
-
-                    # Write the row with -1's so we can a failed request in the output                    
-                    for i in range(0,7):
-                        row.append(-1)
-                        
-                    writer.writerow(row)
+                # Inputs from extract_metadata.py have a row per term instance, so get each file's metrics once
+                if row[index_file] == path:
+                    writer.writerow(row + (metrics or [-1] * len(SCRAPING_HEADERS)))
                     continue
 
-                page_text = response.text
+                path = row[index_file]
+                file_count += 1
 
-                # We need the BeautifulSoup object for multiple parsings, so create it once
-                soup = BeautifulSoup(page_text, 'html.parser')
+                if file_count % 100 == 0:
+                    print("extract_scrapings, INFO, Files processed, {}".format(file_count))
 
-                time = parse_time_to_read(soup)
-                link_count = count_intro_links(soup)
+                if cache is not None and path in cache:
+                    metrics = cache[path]
+                else:
+                    metrics, file_differences = get_page_metrics(path, url, mode)
+                    differences += file_differences
 
-                # Note: an inconsistency in article is use of "python" or "Python" for code block
-                # languages, which comes through in the HTML as lang-python and lang-Python, both of
-                # which we must count
-                code_count_python = count_code_blocks(soup, ["python"])
-                code_count_js = count_code_blocks(soup, ["javascript", "js", "typescript", "node", "node.js"])
-                code_count_java = count_code_blocks(soup, ["java"])
-                code_count_cli = count_code_blocks(soup, ["cli", "ps", "bash", "shell"])
-                code_count_unfenced = count_code_blocks(soup, None)
+                    if cache is not None:
+                        cache[path] = metrics
 
-                row.append(time)
-                row.append(link_count)
-                row.append(code_count_python)
-                row.append(code_count_js)
-                row.append(code_count_java)
-                row.append(code_count_cli)
-                row.append(code_count_unfenced)
+                # Write the row with -1's so we can a failed request in the output
+                writer.writerow(row + (metrics or [-1] * len(SCRAPING_HEADERS)))
 
-                writer.writerow(row)
+    if mode == "verify":
+        print("extract_scrapings, INFO, Verification complete, {} differences, {}".format(differences, input_file))
 
     print("extract_scrapings, INFO, INFO, Competed extraction,, {}".format(output_file))
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        print("Usage: python extract_scrapings.py <input_file>, {}".format(input_file))
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["fetch", "verify"])
+    except getopt.GetoptError:
+        opts, args = [('-h', '')], []
+
+    options = dict(opts)
+
+    if len(args) != 1 or '-h' in options or '-H' in options or '-?' in options or ('--fetch' in options and '--verify' in options):
+        print("Usage: python extract_scrapings.py [--fetch | --verify] <input_csv_file.csv>")
         print("<input_csv_file.csv> is the output from extract_metadata.py or consolidate.py")
+        print("--fetch scrapes the metrics from the published pages instead of computing them from the source;")
+        print("--verify does both and reports the differences.")
+        sys.exit(2)
 
-    input_file = sys.argv[1]  # File is first argument; [0] is the .py file
+    mode = "fetch" if '--fetch' in options else "verify" if '--verify' in options else "source"
+    input_file = args[0]
 
     # Making the output filename assumes the input filename has only one .
     elements = input_file.split('.')
     output_file = elements[0] + '-scrapings.' + elements[1]
 
-    extract_scrapings(input_file, output_file)
+    extract_scrapings(input_file, output_file, mode)
@@ -1,81 +1,62 @@
 import csv
 import os
-import subprocess
 import sys
 import pathlib
-import re
 import json
 
-from consolidate import consolidate
-from extract_metadata import extract_metadata
+from enumerate_files import content_sets, enumerate_docsets
+from extract_metadata import extract_metadata, MetadataCache
 from extract_scrapings import extract_scrapings
 
-from slugify import slugify
-from utilities import get_next_filename, parse_config_arguments, classify_occurrence, delineate_segments, COLUMNS
+from utilities import get_next_filename, make_url, parse_config_arguments, delineate_segments, COLUMNS
 
-def get_file_data(config, results_folder):
-    print("Script,Type,Message,Item")
-
-    results = {}
-
-    for content_set in config["content"]:
-        docset = content_set.get("repo")
-        folder = os.path.expandvars(content_set.get("path"))  # Expands ${INVENTORY_REPO_ROOT}
-        base_url = content_set.get("url")
-        exclude_folders = content_set.get("exclude_folders")
-
-        if folder is None:
-            print("get-file-data, WARNING, No path for docset - skipping, {}".format(docset))
-            continue
-
-        if docset is None or base_url is None:
-            print("get-file-data: Malformed config entry for docset {}; check your config file".format(docset))
-            continue
+def catalog_files(config):
+    """Returns the sorted rows, one per file in the docsets of config, that every inventory's outputs start from."""
+    catalog = []
 
+    for docset, folder, base_url, _, _, entries in enumerate_docsets(content_sets(config, "get-file-data")):
         print('get-file-data, INFO, Processing docset {}, {}'.format(docset, folder))
 
-        for root, dirs, files in os.walk(folder):
-            for exclusion in exclude_folders:
-                if exclusion in dirs:
-                    dirs.remove(exclusion)
-
-            for file in files:
-                if pathlib.Path(file).suffix != '.md':
-                    continue
-
-                full_path = os.path.join(root, file)
-
-                """
-                try:
-                    content = pathlib.Path(full_path).read_text(errors="ignore")
-                except UnicodeDecodeError:
-                    print("get-file-data, WARNING, Skipping file that contains non-UTF-8 characters and should be converted, {}".format(full_path))
-                    continue
+        for entry in entries:
+            full_path = entry.path
 
-                code_lines, intro_lines, metadata_lines = delineate_segments(content, full_path)
+            """
+            try:
+                content = pathlib.Path(full_path).read_text(errors="ignore")
+            except UnicodeDecodeError:
+                print("get-file-data, WARNING, Skipping file that contains non-UTF-8 characters and should be converted, {}".format(full_path))
+                continue
 
-                # Content check: if metadata_text is empty, then the article lacks metadata
-                if len(metadata_lines) == 0:
-                    print("get-file-data, WARNING, File contains no metadata, {}".format(full_path))
-                """
+            code_lines, intro_lines, metadata_lines = delineate_segments(content, full_path)
 
-                for search in config["inventory"]:
-                    name = search["name"].lower()
+            # Content check: if metadata_text is empty, then the article lacks metadata
+            if len(metadata_lines) == 0:
+                print("get-file-data, WARNING, File contains no metadata, {}".format(full_path))
+            """
 
-                    if name not in results:
-                        results[name] = []
-
-                    url = base_url + full_path[full_path.find('\\', len(folder) + 1) : -3].replace('\\','/')
-                    results[name].append([docset, full_path, url, "", "", "", "" ])                    
+            url = make_url(base_url, folder, full_path)
+            catalog.append([docset, full_path, url, "", "", "", "" ])
 
     # Sort the results (by filename, then line number), and save to a .csv file.
     # A sorted list is needed for consolidate.py and removes the need to open
     # the .csv file in Excel for a manual sort.
     print("get-file-data, INFO, Sorting results by filename,")
-    
-    for inventory, rows in results.items():
-        rows.sort(key=lambda row: (row[1]))
+    catalog.sort(key=lambda row: (row[1]))
+    return catalog
+
+
+def get_file_data(config, results_folder):
+    print("Script,Type,Message,Item")
+
+    # Every inventory lists the same files, so the catalog of files is built once, and the metadata and the page
+    # metrics (which can mean fetching each page) are read once per file and shared by the inventories' outputs.
+    rows = catalog_files(config)
+    metadata_cache = MetadataCache()
+    scrapings_cache = {}
+
+    inventories = dict.fromkeys(search["name"].lower() for search in config["inventory"]) if len(rows) > 0 else {}
 
+    for inventory in inventories:
         # Open CSV output file, which we do before running the searches because
         # we consolidate everything into a single file
 
@@ -92,10 +73,10 @@ def get_file_data(config, results_folder):
         print("get-file-data, INFO, Invoking secondary processing to extract metadata, ")
 
         meta_output = "{}-metadata.csv".format(result_filename)        
-        extract_metadata(result_filename+".csv", meta_output)
+        extract_metadata(result_filename+".csv", meta_output, metadata_cache)
 
         scrapings_output = "{}-scrapings.csv".format(result_filename)
-        extract_scrapings(meta_output, scrapings_output)
+        extract_scrapings(meta_output, scrapings_output, cache=scrapings_cache)
 
 if __name__ == "__main__":
     # Get input file arguments, defaulting to folders.txt and terms.txt
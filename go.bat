@@ -13,6 +13,4 @@ git pull origin master
 cd ..\azure-docs-pr
 git pull origin master
 popd
-python take_inventory.py --config config_python.json > InventoryData\log_python.csv
-python take_inventory.py --config config_js.json > InventoryData\log_js.csv
-python take_inventory.py --config config_java.json > InventoryData\log_java.csv
+python take_inventory.py --config config_python.json --config config_js.json --config config_java.json > InventoryData\log.csv
@@ -0,0 +1,212 @@
+# Include-aware scanning for take_inventory.py (--includes). Docsets exclude their "includes" folders from the
+# walk, so terms that appear only in [!INCLUDE [...](path)] fragments would otherwise be missed. With --includes,
+# the script finds the include directives in each article and attributes the occurrences in the included files
+# (and the files they include in turn) to the article.
+#
+# Each include file is read, segmented, and scanned only once, no matter how many articles include it, and its
+# expanded results (with those of its nested includes) are kept in memory. An occurrence from an include file
+# is reported at the line of the article's include directive, with its classification from the include file and
+# its provenance at the start of the extract, such as "[python-prereqs.md:12] Install Python 3.8" or, for a nested
+# include, "[python-prereqs.md:4 > python-install.md:2] Install Python 3.8".
+#
+# A reference is resolved against the folder of the file that contains it, or, if it starts with / (such as
+# /includes/python-prereqs.md), against the folder of the docset that contains the file.
+#
+# Include files that include each other are reported once, and the cycle is cut where it closes. The expanded results
+# of a file are kept only if no cycle was cut below it: where a cycle is cut depends on which of its files was
+# expanded first, so the files in and above a cycle are expanded again each time an article includes them.
+#
+# The scanner keeps a graph of which files include which, so when an include file changes (see refresh), only
+# the expanded results that depend on it are dropped. watch_inventory.py uses this to rescan the articles that
+# include a changed file. An include file that was missing when it was referenced isn't tracked, so creating it
+# takes effect only when an article that references it changes.
+
+import contextlib
+import io
+import os
+import pathlib
+import re
+
+from instrumentation import RunStats
+from take_inventory import scan_content
+from utilities import delineate_segments
+
+INCLUDE_PATTERN = re.compile(r"\[!INCLUDE\s*\[[^\]]*\]\(\s*([^)\s]+)[^)]*\)\s*\]", re.IGNORECASE)
+
+
+class IncludeScanner:
+    def __init__(self, terms, literals, window=None, roots=()):
+        self.terms = terms
+        self.literals = literals
+        self.window = window  # Limits the extracts, as take_inventory.py --extract-window does
+        self.inventories = list(terms.keys())
+        self.files = {}       # Include path: { "stamp", "rows", "includes" } from scanning the file itself
+        self.expanded = {}    # Include path: { inventory: [(term, tag, provenance, extract)] } including nested includes
+        self.dependents = {}  # Include path: set of the paths of the files (articles or includes) that include it
+        self.missing = set()
+        self.cycles = set()
+        self.roots = [os.path.abspath(root) for root in roots]  # Docset folders, for references that start with /
+        self.matches = 0
+        self.stats = RunStats()  # Kept separate so the include scans don't count as files of the run
+
+    def root_of(self, full_path):
+        """Returns the folder of the innermost docset that contains full_path, or the file's own folder if none does."""
+        path = os.path.abspath(full_path)
+        roots = [root for root in self.roots if path.startswith(os.path.join(root, ""))]
+        return max(roots, key=len) if len(roots) > 0 else os.path.dirname(path)
+
+    def references(self, content, full_path):
+        """Generates (line_num, include_path, reference) for each include directive in content."""
+        for match in INCLUDE_PATTERN.finditer(content):
+            reference = match.group(1)
+            line_num = content.count("\n", 0, match.start()) + 1
+
+            if reference.startswith("/"):
+                include_path = os.path.join(self.root_of(full_path), reference.lstrip("/"))
+            else:
+                include_path = os.path.join(os.path.dirname(full_path), reference)
+
+            yield line_num, os.path.normpath(include_path), reference
+
+    def load(self, path):
+        """Returns the record of an include file, scanning the file if it hasn't been scanned, or None if it can't be read."""
+        record = self.files.get(path)
+
+        if record is not None:
+            return record
+
+        try:
+            stat = os.stat(path)
+            content = pathlib.Path(path).read_text(errors="replace")
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        # Include files rarely have metadata or an h1, so we don't print the segment warnings for them
+        with contextlib.redirect_stdout(io.StringIO()):
+            segments = delineate_segments(content, path)
+
+        results = {}
+        scan_content(content, path, os.path.basename(path), "", "", self.inventories, self.terms, self.literals, results,
+            self.stats, segments, window=self.window)
+
+        record = { "stamp": (stat.st_mtime_ns, stat.st_size), "includes": list(self.references(content, path)),
+            "rows": { name: [(row[3], row[4], row[5], row[6]) for row in rows] for name, rows in results.items() } }
+        self.files[path] = record
+        return record
+
+    def expand(self, path):
+        """Returns the occurrences in an include file and its nested includes as a dictionary of inventory name to
+        (term, tag, provenance, extract) tuples, or None if the file can't be read."""
+        return self.expand_within(path, frozenset())[0]
+
+    def expand_within(self, path, active):
+        """Expands an include file (see expand) that's included by the files in active, which are being expanded.
+        Returns the expansion and whether it's complete, that is, whether no cycle was cut in it; only complete
+        expansions are kept for later."""
+        if path in self.expanded:
+            return self.expanded[path], True
+
+        if path in active:
+            if path not in self.cycles:
+                self.cycles.add(path)
+                print("take_inventory, WARNING, Include files include each other, Skipping, {}".format(path))
+
+            return {}, False
+
+        record = self.load(path)
+
+        if record is None:
+            return None, True
+
+        filename = os.path.basename(path)
+        expanded = { name: [(term, tag, "{}:{}".format(filename, line_num), extract) for term, tag, line_num, extract in rows]
+            for name, rows in record["rows"].items() }
+
+        complete = True
+
+        for line_num, include_path, reference in record["includes"]:
+            self.dependents.setdefault(include_path, set()).add(path)
+            nested, nested_complete = self.expand_within(include_path, active | { path })
+            complete = complete and nested_complete
+
+            if nested is None:
+                self.report_missing(reference, path)
+                continue
+
+            for name, rows in nested.items():
+                expanded.setdefault(name, []).extend((term, tag, "{}:{} > {}".format(filename, line_num, provenance), extract)
+                    for term, tag, provenance, extract in rows)
+
+        if complete:
+            self.expanded[path] = expanded
+
+        return expanded, complete
+
+    def report_missing(self, reference, path):
+        if (reference, path) not in self.missing:
+            self.missing.add((reference, path))
+            print("take_inventory, WARNING, Include file not found, {}, {}".format(reference, path))
+
+    def add_results(self, content, full_path, docset, url, inventories, results):
+        """Adds the occurrences in the files included by an article to results, attributed to the article at the line
+        of each include directive."""
+        for line_num, include_path, reference in self.references(content, full_path):
+            self.dependents.setdefault(include_path, set()).add(full_path)
+            expanded = self.expand(include_path)
+
+            if expanded is None:
+                self.report_missing(reference, full_path)
+                continue
+
+            for name in inventories:
+                rows = expanded.get(name, [])
+                results.setdefault(name, []).extend([docset, full_path, url, term, tag, line_num,
+                    "[{}] {}".format(provenance, extract)] for term, tag, provenance, extract in rows)
+                self.matches += len(rows)
+
+    def changed(self):
+        """Returns the paths of the include files that changed (or were deleted) since they were scanned."""
+        changed = []
+
+        for path, record in self.files.items():
+            try:
+                stat = os.stat(path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamp = None
+
+            if stamp != record["stamp"]:
+                changed.append(path)
+
+        return changed
+
+    def refresh(self):
+        """Drops the results of include files that changed since they were scanned, along with the expanded results
+        of every file that includes them, directly or indirectly. Returns the set of paths of the affected files,
+        which includes the articles that need to be scanned again."""
+        affected = set()
+
+        for path in self.changed():
+            del self.files[path]
+            affected |= self.invalidate(path)
+
+        return affected
+
+    def invalidate(self, path):
+        seen = set()
+        pending = [path]
+
+        while len(pending) > 0:
+            current = pending.pop()
+
+            if current in seen:
+                continue
+
+            seen.add(current)
+            self.expanded.pop(current, None)
+            pending.extend(self.dependents.get(current, ()))
+
+        return seen
+
+    def report(self):
+        return { "files": len(self.files), "matches": self.matches, "missing": len(self.missing) }
@@ -0,0 +1,164 @@
+# Per-stage timing and throughput instrumentation for take_inventory.py. A RunStats object accumulates
+# wall-clock and CPU time for each named stage of a run (walking, reading, segmenting, matching, classifying,
+# sorting, and the post-processing scripts), counters such as files, bytes, and matches, and the slowest
+# files. At the end of the run, take_inventory.py writes the results as a JSON report next to the CSV files
+# (run_<date>-<sequential_int>-report.json).
+#
+# Stages can nest (for example, classify_occurrence time is also part of the scan stage), so stage times
+# aren't expected to add up to the total.
+#
+# The report also lists the most expensive search terms, with the time spent matching and classifying each
+# term and its matches in each docset, so a badly written term shows up by name.
+
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class FileStats:
+    """Accumulates stage times, counters, and term costs without locking. take_inventory.py records the stages that
+    run once per match of a file in a FileStats object, and adds it to the run's RunStats with one merge call, so the
+    lock is taken once per file instead of once per match."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.terms = {}     # (inventory, term, docset): [seconds, matches, files]
+
+    @contextmanager
+    def stage(self, name):
+        """Times a block as the named stage, recording both wall-clock and CPU time."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_time(self, name, wall, cpu=None):
+        """Adds time to the named stage. Fine-grained stages that run once per match record only wall-clock
+        time, because reading the process CPU time for each call would cost more than the work measured."""
+        stage = self.stages.setdefault(name, { "wall_seconds": 0.0, "cpu_seconds": None, "calls": 0 })
+        stage["wall_seconds"] += wall
+        stage["calls"] += 1
+
+        if cpu is not None:
+            stage["cpu_seconds"] = (stage["cpu_seconds"] or 0.0) + cpu
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_term(self, inventory, term, docset, seconds, matches):
+        """Records the time spent matching (and classifying the matches of) one term in one file."""
+        cost = self.terms.setdefault((inventory, term, docset), [0.0, 0, 0])
+        cost[0] += seconds
+        cost[1] += matches
+        cost[2] += 1
+
+
+class RunStats(FileStats):
+    def __init__(self, top_files=20, top_terms=10):
+        super().__init__()
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.details = {}
+        self.top_files = top_files
+        self.top_terms = top_terms
+        self.slowest = []   # Min-heap of (seconds, path), so the fastest of the slowest files is at [0]
+        self.lock = threading.Lock()
+
+    def add_time(self, name, wall, cpu=None):
+        with self.lock:
+            super().add_time(name, wall, cpu)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            super().count(name, amount)
+
+    def add_term(self, inventory, term, docset, seconds, matches):
+        with self.lock:
+            super().add_term(inventory, term, docset, seconds, matches)
+
+    def merge(self, stages, counters, terms=None):
+        """Adds the stage times, counters, and term costs recorded by another RunStats object, such as one in a
+        worker process, or by a FileStats object."""
+        with self.lock:
+            for key, other in (terms or {}).items():
+                cost = self.terms.setdefault(key, [0.0, 0, 0])
+
+                for i in range(3):
+                    cost[i] += other[i]
+
+            for name, other in stages.items():
+                stage = self.stages.setdefault(name, { "wall_seconds": 0.0, "cpu_seconds": None, "calls": 0 })
+                stage["wall_seconds"] += other["wall_seconds"]
+                stage["calls"] += other["calls"]
+
+                if other["cpu_seconds"] is not None:
+                    stage["cpu_seconds"] = (stage["cpu_seconds"] or 0.0) + other["cpu_seconds"]
+
+            for name, amount in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_file(self, path, seconds):
+        """Records the scan time of one file, keeping only the slowest files."""
+        with self.lock:
+            if len(self.slowest) < self.top_files:
+                heapq.heappush(self.slowest, (seconds, path))
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, path))
+
+    def report(self):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+
+        # Throughput is measured against the time spent in the scan stage
+        scan_seconds = self.stages.get("scan", {}).get("wall_seconds", 0.0)
+        throughput = {}
+
+        for counter in ["files", "bytes", "matches"]:
+            if scan_seconds > 0:
+                throughput[counter + "_per_second"] = round(self.counters.get(counter, 0) / scan_seconds, 2)
+
+        stages = {}
+
+        for name, stage in self.stages.items():
+            stages[name] = { "wall_seconds": round(stage["wall_seconds"], 4), "calls": stage["calls"] }
+
+            if stage["cpu_seconds"] is not None:
+                stages[name]["cpu_seconds"] = round(stage["cpu_seconds"], 4)
+
+        slowest = [{ "file": path, "seconds": round(seconds, 4) } for seconds, path in sorted(self.slowest, reverse=True)]
+
+        report = { "started": self.started, "wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4),
+            "stages": stages, "counters": dict(self.counters), "throughput": throughput, "slowest_files": slowest,
+            "expensive_terms": self.expensive_terms() }
+        report.update(self.details)
+        return report
+
+    def expensive_terms(self):
+        """Returns the terms with the most total time, each with its totals and a breakdown by docset."""
+        totals = {}
+
+        for (inventory, term, docset), (seconds, matches, files) in self.terms.items():
+            total = totals.setdefault((inventory, term), { "inventory": inventory, "term": term, "seconds": 0.0,
+                "matches": 0, "files": 0, "docsets": {} })
+            total["seconds"] += seconds
+            total["matches"] += matches
+            total["files"] += files
+            total["docsets"][docset] = { "seconds": round(seconds, 4), "matches": matches, "files": files }
+
+        terms = heapq.nlargest(self.top_terms, totals.values(), key=lambda total: total["seconds"])
+
+        for total in terms:
+            total["seconds"] = round(total["seconds"], 4)
+
+        return terms
+
+    def write_report(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=4)
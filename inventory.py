@@ -0,0 +1,106 @@
+# Single entry point for the inventory scripts, with a subcommand for each:
+#
+#    python inventory.py <subcommand> [<arguments>]
+#
+# The arguments are those of the script that the subcommand runs (see SUBCOMMANDS), so, for example,
+# "python inventory.py score <consolidated_csv_file>" is the same as "python score.py <consolidated_csv_file>".
+# Only the script for the given subcommand is imported, so quick operations such as re-scoring a file or the
+# age summary don't pay for importing the scanning code or optional packages such as requests.
+#
+# "python inventory.py startup <subcommand>" reports the time that the subcommand's script takes to import, from
+# python -X importtime, with the modules that take the longest.
+
+import os
+import runpy
+import sys
+
+# Subcommand: (script module, description)
+SUBCOMMANDS = {
+    "scan": ("take_inventory", "Take an inventory of the terms in a config's docsets"),
+    "metadata": ("extract_metadata", "Add the metadata of each file to an inventory's results"),
+    "consolidate": ("consolidate", "Consolidate results into one row per file"),
+    "score": ("score", "Score consolidated results"),
+    "rollup": ("rollup", "Roll up consolidated results by folder"),
+    "scrape": ("extract_scrapings", "Add page metrics to results, from the source or the published pages"),
+    "metrics": ("page_metrics", "Add page metrics to results from the source"),
+    "keyphrases": ("extract_key_phrases", "Extract key phrases from intro text with the Text Analytics API"),
+    "age": ("tally_age", "Summarize the ages of the files in a folder"),
+    "files": ("get_file_data", "List every file of a config's docsets with its metadata and page metrics"),
+    "estimate": ("estimate", "Estimate an inventory from a sample of the files"),
+    "shard": ("shard_inventory", "Make shard manifests, or merge or run sharded inventories"),
+    "diff": ("diff_runs", "Compare two inventory outputs"),
+    "store": ("results_store", "Query the results store"),
+    "query": ("query_server", "Serve ad-hoc term queries"),
+}
+
+IMPORTTIME_TOP = 10
+
+
+def usage():
+    print("Usage: python inventory.py <subcommand> [<arguments>]")
+    print("       python inventory.py startup <subcommand>")
+    print("Run a subcommand without arguments (or with -h) for its usage.")
+    print()
+
+    for name, (module, description) in SUBCOMMANDS.items():
+        print("    {:<12} {} ({}.py)".format(name, description, module))
+
+
+def report_startup(module):
+    """Imports a module in a new interpreter with -X importtime and prints the total import time and the modules
+    that took the longest, including the modules they imported."""
+    import subprocess
+
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], capture_output=True,
+        text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    if process.returncode != 0:
+        print("inventory, ERROR, Could not import module, {}, {}".format(process.stderr.strip().splitlines()[-1], module))
+        sys.exit(1)
+
+    # Lines are "import time: <self us> | <cumulative us> | <module name>", with the name indented by two spaces per
+    # level of nesting. A module's line follows the lines of the modules it imports, so the modules imported by the
+    # given module are the ones listed between its line and the previous top-level line (from the interpreter's startup).
+    total = 0
+    timings = []
+    pending = []
+
+    for line in process.stderr.splitlines():
+        fields = line.split("|")
+
+        if not line.startswith("import time:") or not fields[1].strip().isdigit():
+            continue
+
+        name = fields[2].rstrip()
+
+        if name.startswith("  "):
+            pending.append((int(fields[1]), name.strip()))
+        elif name.strip() == module:
+            total = int(fields[1])
+            timings = pending
+        else:
+            pending = []
+
+    print("inventory, INFO, Import time, {:.1f} ms, {}".format(total / 1000, module))
+
+    for cumulative, name in sorted(timings, reverse=True)[:IMPORTTIME_TOP]:
+        print("inventory, INFO, Import time (cumulative), {:.1f} ms, {}".format(cumulative / 1000, name))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in SUBCOMMANDS and sys.argv[1] != "startup":
+        usage()
+        sys.exit(2)
+
+    if sys.argv[1] == "startup":
+        if len(sys.argv) != 3 or sys.argv[2] not in SUBCOMMANDS:
+            usage()
+            sys.exit(2)
+
+        report_startup(SUBCOMMANDS[sys.argv[2]][0])
+        sys.exit(0)
+
+    # Run the script as if it were run directly, so it parses its own arguments
+    module = SUBCOMMANDS[sys.argv[1]][0]
+    sys.argv = [module + ".py"] + sys.argv[2:]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
@@ -1,15 +1,14 @@
-def detect_issues(content, path):
-    line_num = 0
+# The content checks that used to be here (the byte order mark and metadata that doesn't start on the first line)
+# are rules in content_rules.py, which run inside the scan of take_inventory.py with --issues. detect_issues checks
+# the content of a single file with all the rules.
+
+from content_rules import find_issues
 
-    for line in iter(content.splitlines(1)):  # The 1 arg means include \n
-        line_num += 1
+def detect_issues(content, path):
+    """Prints and returns the (path, line_num, rule, detail) tuples for the issues found in content."""
+    _, issues = find_issues(content, path)
 
-        if line_num == 1:
-            # First line of file
-            if line.startswith("ï»¿---"):
-                print("take_inventory: WARNING: File is not utf-8 encoded. {}".format(path))
-            else:
-                if not line.startswith("---"):
-                    print("take_inventory: WARNING: Metadata does not start on first line. {}".format(path))
+    for _, line_num, rule, detail in issues:
+        print("take_inventory, WARNING, {}, {} line {}, {}".format(detail, rule, line_num, path))
 
-                    
\ No newline at end of file
+    return issues
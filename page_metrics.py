@@ -0,0 +1,195 @@
+# Script to compute page metrics for the files in an inventory output from the markdown source, producing the same
+# columns as extract_scrapings.py without fetching the published pages:
+#
+#    minutes_to_read: the number of words outside the metadata and code blocks, divided by WORDS_PER_MINUTE and
+#        rounded up (an approximation of the reading time shown on the published page)
+#    links_in_intro: the number of links in the intro text (between the H1 and the first subheading), not counting
+#        images, include directives, or the links in an op_single_selector block
+#    code_blocks_python, code_blocks_js, code_blocks_java, code_blocks_cli: the number of fenced code blocks with
+#        each group of language tags in CODE_BLOCK_LANGUAGES (case-insensitive), as the lang-<tag> classes count them
+#        on the published page
+#    code_blocks_unfenced: the number of code blocks without a language tag, including blocks that are only indented
+#
+# The code blocks and the intro text come from utilities.delineate_segments, as in take_inventory.py.
+# With --page-metrics, take_inventory.py computes the metrics of each file with matches during the scan, from the
+# content and segments it already has, and then writes them for the -consolidated.csv file of each inventory with
+# page_metrics, so each file is read and segmented once for all the inventories.
+#
+# Usage: python page_metrics.py <input_csv_file.csv>
+#
+# The input file is the output from extract_metadata.py or consolidate.py; the output has the same name with
+# -scrapings appended, and the metrics appended to each row. Files that can't be read get -1 in every column.
+
+import contextlib
+import csv
+import io
+import math
+import re
+import sys
+from utilities import delineate_segments, COLUMNS
+
+SCRAPING_HEADERS = [ "minutes_to_read", "links_in_intro", "code_blocks_python", "code_blocks_js", "code_blocks_java",
+    "code_blocks_cli", "code_blocks_unfenced" ]
+
+CODE_BLOCK_LANGUAGES = [ ["python"], ["javascript", "js", "typescript", "node", "node.js"], ["java"],
+    ["cli", "ps", "bash", "shell"] ]
+
+WORDS_PER_MINUTE = 200
+
+LINK_PATTERN = re.compile(r"(?<!!)\[[^\]]*\]\([^)]*\)|(?<!!)\[[^\]]+\]\[[^\]]*\]|<a\s[^>]*href=", re.IGNORECASE)
+INCLUDE_PATTERN = re.compile(r"\[!INCLUDE\s*\[[^\]]*\]\([^)]*\)\s*\]", re.IGNORECASE)
+FENCE_PATTERN = re.compile(r"\s*>?\s*`{3}")
+SELECTOR_PATTERN = re.compile(r"\s*>\s*\[!div\s+class=\"op_single_selector\"\]", re.IGNORECASE)
+
+
+def in_ranges(line_num, ranges):
+    return any(lower <= line_num <= upper for (lower, upper, *_) in ranges)
+
+
+def count_words(lines, code_lines, metadata_lines):
+    """Counts the words in lines (numbered from 1) outside of metadata and code blocks, including their delimiters."""
+    count = 0
+
+    for line_num, line in enumerate(lines, 1):
+        if in_ranges(line_num, code_lines) or FENCE_PATTERN.match(line):
+            continue
+
+        if len(metadata_lines) > 0 and line_num <= metadata_lines[0][1] + 1:
+            continue
+
+        count += len(line.split())
+
+    return count
+
+
+def count_intro_links(lines, code_lines, intro_lines):
+    count = 0
+    in_selector = False
+
+    for line_num, line in enumerate(lines, 1):
+        if not in_ranges(line_num, intro_lines) or in_ranges(line_num, code_lines):
+            continue
+
+        # A selector is a callout starting with [!div class="op_single_selector"] followed by a list of links
+        if SELECTOR_PATTERN.match(line):
+            in_selector = True
+            continue
+
+        if in_selector and line.lstrip().startswith(">"):
+            continue
+
+        in_selector = False
+        count += len(LINK_PATTERN.findall(INCLUDE_PATTERN.sub("", line)))
+
+    return count
+
+
+def count_code_blocks(code_lines, languages):
+    languages = [language.lower() for language in languages]
+    return sum(1 for (_, _, language) in code_lines if language is not None and language.lower() in languages)
+
+
+def count_indented_blocks(lines, code_lines, metadata_lines):
+    """Counts the code blocks marked only by indentation: runs of lines indented by four spaces or a tab that follow a
+    blank line, outside fenced code blocks and metadata, and not continuing a list item."""
+    count = 0
+    previous_blank = False
+    previous_indented = False
+    in_list = False
+
+    for line_num, line in enumerate(lines, 1):
+        skip = in_ranges(line_num, code_lines) or (len(metadata_lines) > 0 and line_num <= metadata_lines[0][1] + 1)
+        blank = line.strip() == ""
+        indented = not blank and not skip and (line.startswith("    ") or line.startswith("\t"))
+
+        if not blank and not indented:
+            in_list = re.match(r"\s*([-*+]|\d+\.)\s", line) is not None or (in_list and line.startswith(" "))
+
+        if indented and previous_blank and not previous_indented and not in_list:
+            count += 1
+
+        previous_indented = indented or (previous_indented and blank)
+        previous_blank = blank
+
+    return count
+
+
+def compute_page_metrics(content, path, segments=None):
+    """Returns the list of metrics in SCRAPING_HEADERS for the content of a file. segments can give the result of
+    delineate_segments if the caller already has it."""
+    if segments is None:
+        # The segment warnings are the business of take_inventory, so we don't print them here
+        with contextlib.redirect_stdout(io.StringIO()):
+            segments = delineate_segments(content, path)
+
+    code_lines, intro_lines, metadata_lines = segments
+    lines = content.splitlines()
+
+    words = count_words(lines, code_lines, metadata_lines)
+    metrics = [ max(1, math.ceil(words / WORDS_PER_MINUTE)), count_intro_links(lines, code_lines, intro_lines) ]
+    metrics += [ count_code_blocks(code_lines, languages) for languages in CODE_BLOCK_LANGUAGES ]
+    metrics.append(sum(1 for (_, _, language) in code_lines if language is None)
+        + count_indented_blocks(lines, code_lines, metadata_lines))
+
+    return metrics
+
+
+def file_page_metrics(path):
+    """Returns the metrics for a file, or None if the file can't be read."""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    except OSError:
+        return None
+
+    return compute_page_metrics(content, path)
+
+
+def page_metrics(input_file, output_file, metrics_by_path=None):
+    """Appends the page metrics to each row of input_file. metrics_by_path is an optional dictionary of file path to
+    metrics already computed, such as take_inventory.py collects during the scan; the files that aren't in it are
+    read."""
+    print("page_metrics, INFO, Starting page metrics, {}".format(input_file))
+
+    with open(input_file, encoding='utf-8') as f_in:
+        reader = csv.reader(f_in)
+        headers = next(reader)
+        index_file = headers.index(COLUMNS["file"])
+
+        with open(output_file, 'w', encoding='utf-8', newline='') as f_out:
+            writer = csv.writer(f_out)
+            writer.writerow(headers + SCRAPING_HEADERS)
+
+            # Inputs from extract_metadata.py have a row per term instance, so compute each file's metrics once
+            path = None
+            metrics = None
+
+            for row in reader:
+                if row[index_file] != path:
+                    path = row[index_file]
+
+                    if metrics_by_path is not None and path in metrics_by_path:
+                        metrics = metrics_by_path[path]
+                    else:
+                        metrics = file_page_metrics(path)
+
+                    if metrics is None:
+                        print("page_metrics, WARNING, Could not read file, , {}".format(path))
+
+                writer.writerow(row + (metrics or [-1] * len(SCRAPING_HEADERS)))
+
+    print("page_metrics, INFO, Completed page metrics, , {}".format(output_file))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        print("Usage: python page_metrics.py <input_csv_file.csv>")
+        print("<input_csv_file.csv> is the output from extract_metadata.py or consolidate.py")
+        sys.exit(2)
+
+    # Making the output filename assumes the input filename has only one .
+    input_file = sys.argv[1]
+    elements = input_file.split('.')
+    output_file = elements[0] + '-scrapings.' + elements[1]
+
+    page_metrics(input_file, output_file)
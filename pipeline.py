@@ -0,0 +1,141 @@
+# Read-ahead pipeline for take_inventory.py (--readers and --processes), which overlaps file reads with the
+# CPU-bound matching and classification so the CPU doesn't sit idle while a network share or cold cache
+# serves the next file.
+#
+# The pipeline has three stages:
+#    enumerator: a thread that walks the docsets (the caller's generator of files) into a bounded queue
+#    readers: a pool of threads that take files from that queue, read them, and put the content into a second
+#        bounded queue
+#    consumer: the caller, which takes the content from the second queue (and can hand it on to worker
+#        processes; see take_inventory.scan_in_processes)
+#
+# Both queues are bounded, so when the consumer falls behind the readers block rather than reading the whole
+# docset into memory (back-pressure). Files come out of the pipeline in no particular order, which doesn't
+# affect the outputs because take_inventory.py sorts the results.
+#
+# The pipeline samples the depth of the content queue each time the consumer takes a file and records the
+# statistics in the run report under "pipeline": a queue that's usually empty means the reads are the
+# bottleneck (add readers), and one that's usually full means the matching is (add processes).
+
+import pathlib
+import queue
+import threading
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+class _Pipeline:
+    def __init__(self, readers, queue_size, read):
+        self.paths = queue.Queue(maxsize=queue_size)
+        self.contents = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.readers = readers
+        self.read_file = read
+        self.errors = []
+        self.reader_waits = 0
+        self.lock = threading.Lock()
+
+    def put(self, target, item, count_waits=False):
+        """Puts an item on a queue, blocking while it's full, unless the pipeline is stopped. Returns False
+        if it was stopped."""
+        if count_waits and target.full():
+            with self.lock:
+                self.reader_waits += 1
+
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def enumerate(self, items):
+        try:
+            for item in items:
+                if not self.put(self.paths, item):
+                    return
+        except BaseException as e:
+            self.errors.append(e)
+        finally:
+            for _ in range(self.readers):
+                self.put(self.paths, _DONE)
+
+    def read(self):
+        try:
+            while not self.stop.is_set():
+                try:
+                    item = self.paths.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+
+                if item is _DONE:
+                    break
+
+                try:
+                    content = self.read_file(item[0])
+                except UnicodeDecodeError:
+                    content = None
+
+                if not self.put(self.contents, (item, content), count_waits=True):
+                    return
+        except BaseException as e:
+            self.errors.append(e)
+        finally:
+            self.put(self.contents, _DONE)
+
+
+def read_text(path):
+    return pathlib.Path(path).read_text(errors="replace")
+
+
+def read_ahead(items, stats, readers=4, queue_size=64, read=read_text):
+    """Given a generator of tuples whose first element is a file path, generates (item, content) tuples with the
+    content of each file read on one of a pool of reader threads, using the given read function. content is None
+    for a file that can't be decoded. The generator items runs on its own thread; at most queue_size files wait in
+    each queue."""
+    pipeline = _Pipeline(readers, queue_size, read)
+    threads = [threading.Thread(target=pipeline.enumerate, args=(items,), daemon=True)]
+    threads += [threading.Thread(target=pipeline.read, daemon=True) for _ in range(readers)]
+
+    for thread in threads:
+        thread.start()
+
+    running = readers
+    depth_total = 0
+    depth_max = 0
+    consumer_waits = 0
+    taken = 0
+
+    try:
+        while running > 0:
+            depth = pipeline.contents.qsize()
+
+            if depth == 0:
+                consumer_waits += 1
+
+            with stats.stage("read_wait"):
+                value = pipeline.contents.get()
+
+            if value is _DONE:
+                running -= 1
+                continue
+
+            taken += 1
+            depth_total += depth
+            depth_max = max(depth_max, depth)
+            yield value
+    finally:
+        pipeline.stop.set()
+
+        for thread in threads:
+            thread.join()
+
+        stats.details["pipeline"] = { "readers": readers, "queue_size": queue_size, "files": taken,
+            "mean_queue_depth": round(depth_total / taken, 2) if taken > 0 else 0, "max_queue_depth": depth_max,
+            "consumer_waits": consumer_waits, "reader_waits": pipeline.reader_waits }
+
+    if len(pipeline.errors) > 0:
+        raise pipeline.errors[0]
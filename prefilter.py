@@ -0,0 +1,153 @@
+# Literal pre-filter for search terms. Before running a term's regular expression over a file, we check
+# that the file contains at least one of the literal strings that every match of the term must include.
+# Most files contain none of an inventory's terms, so this check (a C-level substring search) lets
+# take_inventory.py skip the regex scan, and the segment and classification work that follows it,
+# for the large majority of files.
+#
+# The literals are derived automatically from each compiled term by walking its parsed form. Because
+# the terms are compiled with re.IGNORECASE, both the literals and the file content are case-folded
+# with fold_case, which mirrors the case-insensitive matching rules of the re module for ASCII letters.
+#
+# Most terms are plain text, such as "Python" or "command prompt", whose matches are exactly the
+# occurrences of the folded term in the folded content. For those terms, literal_text returns the folded
+# term and take_inventory.py finds the occurrences with str.find instead of running the regex engine.
+# Because folding keeps the content the same length, the positions found in the folded content are the
+# positions of the matches in the original content.
+
+import functools
+
+try:
+    import re._parser as sre_parse         # Python 3.11+
+    import re._constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter, which str.lower() alone
+# doesn't map. Translating these before lowering also keeps the folded text the same length as the
+# original (str.lower() turns U+0130 into two characters), so positions in folded text map back exactly.
+_FOLD_TABLE = str.maketrans({ 'İ': 'i', 'ı': 'i', 'ſ': 's', 'K': 'k' })
+
+_REPEATS = [sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT]
+
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    _REPEATS.append(sre_constants.POSSESSIVE_REPEAT)
+
+
+def fold_case(text):
+    """Case-folds text the same way for both literals and content, so that a literal found by a
+    case-insensitive regex match is always found by a plain substring search in the folded text."""
+    if text.isascii():
+        return text.lower()
+
+    return text.translate(_FOLD_TABLE).lower()
+
+
+def _better(current, candidate):
+    # Prefer the candidate whose shortest alternative is longest (the most selective filter),
+    # then the one with fewer alternatives.
+    if candidate is None:
+        return current
+
+    if current is None:
+        return candidate
+
+    key_current = (min(len(s) for s in current), -len(current))
+    key_candidate = (min(len(s) for s in candidate), -len(candidate))
+    return candidate if key_candidate > key_current else current
+
+
+def _required_literals(subpattern):
+    """Returns a set of folded strings, at least one of which appears in every match of the parsed
+    subpattern, or None if no such set can be determined."""
+    best = None
+    run = []
+
+    for op, av in subpattern:
+        # Consecutive ASCII literals form a required string
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+
+        if len(run) > 0:
+            best = _better(best, { fold_case("".join(run)) })
+            run = []
+
+        candidate = None
+
+        if op is sre_constants.SUBPATTERN:
+            candidate = _required_literals(av[-1])
+        elif op in _REPEATS:
+            low, _, item = av
+
+            if low >= 1:
+                candidate = _required_literals(item)
+        elif op is sre_constants.BRANCH:
+            branches = [_required_literals(branch) for branch in av[1]]
+
+            if all(branch is not None for branch in branches):
+                candidate = set().union(*branches)
+        elif op is sre_constants.IN:
+            # A character set such as [Pp] requires one of its characters
+            if all(item_op is sre_constants.LITERAL and item_av < 128 for item_op, item_av in av):
+                candidate = { fold_case(chr(item_av)) for _, item_av in av }
+
+        best = _better(best, candidate)
+
+    if len(run) > 0:
+        best = _better(best, { fold_case("".join(run)) })
+
+    return best
+
+
+def required_literals(term):
+    """Returns a list of case-folded literals for a compiled term, at least one of which is present in
+    any text the term matches. Returns None if the term can't be reduced to literals, in which case the
+    term must always be scanned."""
+    try:
+        parsed = sre_parse.parse(term.pattern, term.flags)
+    except Exception:
+        return None
+
+    literals = _required_literals(parsed)
+
+    if literals is None or any(len(s) == 0 for s in literals):
+        return None
+
+    return sorted(literals)
+
+
+@functools.lru_cache(maxsize=None)
+def literal_text(term):
+    """Returns the case-folded text of a compiled case-insensitive term that consists only of ASCII literals, or
+    None if the term needs the regex engine."""
+    if not term.flags & sre_constants.SRE_FLAG_IGNORECASE:
+        return None
+
+    try:
+        parsed = sre_parse.parse(term.pattern, term.flags)
+    except Exception:
+        return None
+
+    if len(parsed) == 0 or any(op is not sre_constants.LITERAL or av >= 128 for op, av in parsed):
+        return None
+
+    return fold_case("".join(chr(av) for _, av in parsed))
+
+
+def find_literal(folded_content, text):
+    """Generates the (start, end) spans of the non-overlapping occurrences of text in folded_content, which are the
+    spans that finditer returns for the term that literal_text reduced to text."""
+    start = folded_content.find(text)
+
+    while start != -1:
+        yield start, start + len(text)
+        start = folded_content.find(text, start + len(text))
+
+
+def may_match(literals, folded_content):
+    """Returns False only if the term whose literals are given cannot match the folded content."""
+    if literals is None:
+        return True
+
+    return any(literal in folded_content for literal in literals)
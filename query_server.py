@@ -0,0 +1,263 @@
+# Local HTTP service that answers ad-hoc "where is this term used" questions against docsets kept in memory, so
+# each question takes seconds instead of a full repo scan with a hand-edited config.
+#
+# On startup the script reads every file of the docsets in the config's content collection (the inventory
+# collection isn't needed) and keeps its content, compressed with zlib, and its segment ranges (from
+# delineate_segments) in memory; compressed, the content takes about a quarter of the memory. Each query decompresses
+# each file and checks its case-folded text for the literals that the terms require (see prefilter.py), as
+# take_inventory.py does, so only the files that can match are scanned, and plain-text terms are found with str.find.
+# The occurrences are classified with classify_occurrence, exactly as take_inventory.py does, and the results are
+# sorted by file and line. Results are cached by terms, with the least recently used results evicted
+# when the cache is full; docset and tag filters are applied to cached results.
+#
+# Usage: python query_server.py --config <config_file> [--port <port>] [--cache-size <queries>]
+#
+# Then open, for example:
+#    http://localhost:8000/query?term=Flask
+#    http://localhost:8000/query?term=Python&term=Django&tag=text&tag=text_intro&format=csv
+#    http://localhost:8000/query?term=node.js&literal=1&docset=MicrosoftDocs/azure-docs-pr
+#
+# Query parameters:
+#    term: a Python regular expression, matched case-insensitively; repeat to search for several terms
+#    literal: 1 to treat the terms as plain text rather than regular expressions
+#    tag: include only occurrences with this classification tag; repeat for several tags
+#    docset: include only files from this docset; repeat for several docsets
+#    format: json (the default) or csv
+#
+# http://localhost:8000/stats returns the number of files loaded, the size of their compressed content, and the cache
+# statistics.
+
+import csv
+import getopt
+import io
+import json
+import pathlib
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from enumerate_files import content_sets, enumerate_docsets
+from instrumentation import RunStats
+from prefilter import fold_case, may_match, required_literals
+from take_inventory import scan_content
+from utilities import delineate_segments, make_url, COLUMNS
+
+RESULT_HEADERS = [ COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"], COLUMNS["term"], COLUMNS["tag"], COLUMNS["line"],
+    COLUMNS["extract"] ]
+
+
+# Compression level for the stored content, which favors the startup time over the last few percent of memory
+COMPRESSION_LEVEL = 1
+
+
+def load_files(config):
+    """Reads the docsets into a list of (docset, path, filename, url, compressed_content, segments) tuples."""
+    files = []
+
+    for docset, folder, base_url, _, _, entries in enumerate_docsets(content_sets(config, "query_server")):
+        print('query_server, INFO, Loading docset, {}, {}'.format(docset, folder))
+        docset = sys.intern(docset)
+
+        for entry in entries:
+            try:
+                content = pathlib.Path(entry.path).read_text(errors="replace")
+            except UnicodeDecodeError:
+                continue
+
+            # With an issues list, delineate_segments doesn't print its warnings, which are the business of take_inventory
+            segments = delineate_segments(content, entry.path, [])
+
+            files.append((docset, entry.path, entry.name, make_url(base_url, folder, entry.path),
+                zlib.compress(content.encode("utf-8"), COMPRESSION_LEVEL), segments))
+
+    return files
+
+
+class ResultCache:
+    """Least recently used cache of query results, shared by the request threads."""
+
+    def __init__(self, size):
+        self.size = size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.results:
+                self.hits += 1
+                self.results.move_to_end(key)
+                return self.results[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, rows):
+        with self.lock:
+            self.results[key] = rows
+            self.results.move_to_end(key)
+
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+
+
+def run_query(files, patterns):
+    """Returns the result rows for the given term patterns over the loaded files, sorted by file and line."""
+    terms = { "query": [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in patterns] }
+    literals = { "query": [required_literals(term) for term in terms["query"]] }
+    results = {}
+    stats = RunStats()
+
+    for docset, path, filename, url, compressed, segments in files:
+        content = zlib.decompress(compressed).decode("utf-8")
+        folded = fold_case(content)
+
+        if any(may_match(term_literals, folded) for term_literals in literals["query"]):
+            scan_content(content, path, filename, docset, url, ["query"], terms, literals, results, stats, segments,
+                folded=folded)
+
+    rows = results.get("query", [])
+    rows.sort(key=lambda row: (row[1], row[5]))
+    return rows
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # Set on the class by serve()
+    files = None
+    cache = None
+
+    def do_GET(self):
+        request = urlparse(self.path)
+        params = parse_qs(request.query)
+
+        if request.path == "/stats":
+            self.send_json({ "files": len(self.files),
+                "compressed_bytes": sum(len(compressed) for _, _, _, _, compressed, _ in self.files),
+                "cached_queries": len(self.cache.results), "cache_size": self.cache.size,
+                "cache_hits": self.cache.hits, "cache_misses": self.cache.misses })
+            return
+
+        if request.path != "/query" or "term" not in params:
+            self.send_error(400, "Use /query?term=<regex> (see query_server.py for the parameters) or /stats")
+            return
+
+        patterns = params["term"]
+
+        if params.get("literal", ["0"])[0] == "1":
+            patterns = [re.escape(pattern) for pattern in patterns]
+
+        try:
+            for pattern in patterns:
+                re.compile(pattern)
+        except re.error as e:
+            self.send_error(400, "Invalid regular expression: {}".format(e))
+            return
+
+        key = tuple(patterns)
+        rows = self.cache.get(key)
+
+        if rows is None:
+            start = time.perf_counter()
+            rows = run_query(self.files, patterns)
+            self.cache.put(key, rows)
+            self.log_message("query %s: %d rows in %.2f seconds", "|".join(patterns), len(rows), time.perf_counter() - start)
+
+        tags = set(params.get("tag", []))
+        docsets = set(params.get("docset", []))
+        rows = (row for row in rows if (len(tags) == 0 or row[4] in tags) and (len(docsets) == 0 or row[0] in docsets))
+
+        if params.get("format", ["json"])[0] == "csv":
+            self.send_csv(rows)
+        else:
+            self.send_json_rows(rows)
+
+    def send_json(self, value):
+        body = json.dumps(value).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json_rows(self, rows):
+        # Stream the rows as a JSON array of objects; the connection closes at the end of the response.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"[")
+
+        for i, row in enumerate(rows):
+            self.wfile.write((b"," if i > 0 else b"") + json.dumps(dict(zip(RESULT_HEADERS, row))).encode("utf-8"))
+
+        self.wfile.write(b"]")
+
+    def send_csv(self, rows):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.end_headers()
+
+        output = io.TextIOWrapper(self.wfile, encoding="utf-8", newline="", write_through=True)
+        writer = csv.writer(output)
+        writer.writerow(RESULT_HEADERS)
+        writer.writerows(rows)
+        output.detach()
+
+
+def serve(config, port, cache_size):
+    files = load_files(config)
+    print("query_server, INFO, Loaded files, {}, ".format(len(files)))
+
+    QueryHandler.files = files
+    QueryHandler.cache = ResultCache(cache_size)
+
+    server = ThreadingHTTPServer(("localhost", port), QueryHandler)
+    print("query_server, INFO, Listening, http://localhost:{}/query?term=<regex>, ".format(port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    config_file = None
+    port = 8000
+    cache_size = 100
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["config=", "port=", "cache-size="])
+    except getopt.GetoptError:
+        opts = [('-h', '')]
+
+    for opt, arg in opts:
+        if opt in ('-h', '-H', '-?'):
+            config_file = None
+            break
+
+        if opt == '--config':
+            config_file = arg
+
+        try:
+            if opt == '--port':
+                port = int(arg)
+
+            if opt == '--cache-size':
+                cache_size = int(arg)
+        except ValueError:
+            config_file = None
+            break
+
+    if config_file is None:
+        print("Usage: python query_server.py --config <config_file> [--port <port>] [--cache-size <queries>]")
+        sys.exit(2)
+
+    with open(config_file, 'r') as config_load:
+        config = json.load(config_load)
+
+    serve(config, port, cache_size)
@@ -0,0 +1,154 @@
+# Optional SQLite store for inventory results, which keeps the history of runs in one database instead of
+# a sequence of dated CSV files. take_inventory.py writes to the store when given --store <database_file>,
+# in addition to the usual CSV files.
+#
+# Tables:
+#    runs: one row per take_inventory run, with the run name, config files, and the JSON run report
+#    files: one row per source file, shared across runs
+#    matches: one row per search term instance (the contents of the first CSV file)
+#    consolidated: one row per file, inventory, and nonzero count column (term, term_total, or tag) of
+#        the -consolidated.csv file, so counts can be queried per column without a wide schema
+#    scores: one row per file with a nonzero score (the -scored.csv file)
+#
+# Rows are inserted in bulk with executemany inside one transaction per inventory.
+#
+# Usage: python results_store.py <database_file> runs
+#        python results_store.py <database_file> trend <inventory> [<column> [<max_runs>]]
+#
+# The trend command prints the total of a consolidated column (term_total by default) per docset for the
+# most recent runs, for example how many Python mentions there are per docset over the last 90 runs.
+
+import csv
+import json
+import sqlite3
+import sys
+from utilities import make_identifier, TAGS, COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, name TEXT, started TEXT DEFAULT CURRENT_TIMESTAMP,
+    configs TEXT, report TEXT);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, docset TEXT, url TEXT);
+CREATE TABLE IF NOT EXISTS matches (run_id INTEGER NOT NULL, inventory TEXT NOT NULL, file_id INTEGER NOT NULL,
+    term TEXT, tag TEXT, line INTEGER, extract TEXT);
+CREATE INDEX IF NOT EXISTS matches_inventory_file ON matches (inventory, file_id);
+CREATE INDEX IF NOT EXISTS matches_term_tag ON matches (term, tag);
+CREATE TABLE IF NOT EXISTS consolidated (run_id INTEGER NOT NULL, inventory TEXT NOT NULL, file_id INTEGER NOT NULL,
+    name TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS consolidated_inventory_file ON consolidated (inventory, file_id);
+CREATE INDEX IF NOT EXISTS consolidated_inventory_name_run ON consolidated (inventory, name, run_id);
+CREATE INDEX IF NOT EXISTS consolidated_inventory_run ON consolidated (inventory, run_id);
+CREATE TABLE IF NOT EXISTS scores (run_id INTEGER NOT NULL, inventory TEXT NOT NULL, file_id INTEGER NOT NULL,
+    score INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS scores_inventory_run ON scores (inventory, run_id);
+"""
+
+
+FILE_ID_CHUNK = 500
+
+
+def open_store(filename):
+    connection = sqlite3.connect(filename)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def start_run(connection, name, config_files):
+    with connection:
+        cursor = connection.execute("INSERT INTO runs (name, configs) VALUES (?, ?)", (name, json.dumps(config_files)))
+
+    return cursor.lastrowid
+
+
+def finish_run(connection, run_id, report):
+    with connection:
+        connection.execute("UPDATE runs SET report = ? WHERE id = ?", (json.dumps(report), run_id))
+
+
+def get_file_ids(connection, files):
+    """Returns a dictionary of path to file id for the given (path, docset, url) tuples, adding new files and updating
+    the docset and url of existing ones."""
+    connection.executemany("""INSERT INTO files (path, docset, url) VALUES (?, ?, ?)
+        ON CONFLICT (path) DO UPDATE SET docset = excluded.docset, url = excluded.url""", files)
+    paths = sorted({ path for path, _, _ in files })
+    ids = {}
+
+    # Look the ids up in chunks, which stay under SQLite's limit on the number of parameters of a statement
+    for i in range(0, len(paths), FILE_ID_CHUNK):
+        chunk = paths[i:i + FILE_ID_CHUNK]
+        ids.update(connection.execute("SELECT path, id FROM files WHERE path IN ({})".format(", ".join("?" * len(chunk))),
+            chunk))
+
+    return ids
+
+
+def store_matches(connection, run_id, inventory, rows):
+    """Stores the rows of the first CSV file (docset, file, url, term, tag, line, extract)."""
+    with connection:
+        ids = get_file_ids(connection, list({ (row[1], row[0], row[2]) for row in rows }))
+        connection.executemany("INSERT INTO matches (run_id, inventory, file_id, term, tag, line, extract) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((run_id, inventory, ids[row[1]], row[3], row[4], row[5], row[6]) for row in rows))
+
+
+def read_count_rows(filename, columns):
+    """Generates (docset, file, url, {column: count}) from a -consolidated.csv or -scored.csv file, including only the
+    given count columns with nonzero values."""
+    with open(filename, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        index_docset = headers.index(COLUMNS["docset"])
+        index_file = headers.index(COLUMNS["file"])
+        index_url = headers.index(COLUMNS["url"])
+        indexes = [(column, headers.index(column)) for column in columns if column in headers]
+
+        for row in reader:
+            counts = { column: int(row[index]) for column, index in indexes if row[index] not in ("", "0") }
+            yield row[index_docset], row[index_file], row[index_url], counts
+
+
+def store_consolidated(connection, run_id, inventory, terms, consolidated_file, scored_file):
+    """Stores the nonzero count columns of a -consolidated.csv file and the scores from the matching -scored.csv file."""
+    columns = [make_identifier(term) for term in terms] + [COLUMNS["term_total"]] + [make_identifier(tag) for tag in TAGS.values()]
+    consolidated = list(read_count_rows(consolidated_file, columns))
+    scored = list(read_count_rows(scored_file, [COLUMNS["score"]]))
+
+    with connection:
+        ids = get_file_ids(connection, list({ (path, docset, url) for docset, path, url, _ in consolidated + scored }))
+        connection.executemany("INSERT INTO consolidated (run_id, inventory, file_id, name, count) VALUES (?, ?, ?, ?, ?)",
+            ((run_id, inventory, ids[path], column, count) for _, path, _, counts in consolidated for column, count in counts.items()))
+        connection.executemany("INSERT INTO scores (run_id, inventory, file_id, score) VALUES (?, ?, ?, ?)",
+            ((run_id, inventory, ids[path], counts[COLUMNS["score"]]) for _, path, _, counts in scored if COLUMNS["score"] in counts))
+
+
+def trend(connection, inventory, column=COLUMNS["term_total"], max_runs=90):
+    """Returns (run id, run name, docset, total) rows with the total of a consolidated column per docset over the most
+    recent runs that stored the inventory."""
+    return connection.execute("""
+        SELECT runs.id, runs.name, files.docset, SUM(consolidated.count)
+        FROM consolidated JOIN files ON files.id = consolidated.file_id JOIN runs ON runs.id = consolidated.run_id
+        WHERE consolidated.inventory = ? AND consolidated.name = ?
+            AND consolidated.run_id IN (SELECT DISTINCT run_id FROM consolidated WHERE inventory = ? ORDER BY run_id DESC LIMIT ?)
+        GROUP BY runs.id, files.docset ORDER BY runs.id, files.docset""", (inventory.lower(), column, inventory.lower(), max_runs)).fetchall()
+
+
+if __name__ == "__main__":
+    try:
+        max_runs = int(sys.argv[5]) if len(sys.argv) > 5 else 90
+    except ValueError:
+        max_runs = None
+
+    if len(sys.argv) < 3 or sys.argv[2] not in ("runs", "trend") or (sys.argv[2] == "trend" and len(sys.argv) < 4) \
+            or max_runs is None:
+        print("Usage: python results_store.py <database_file> runs")
+        print("       python results_store.py <database_file> trend <inventory> [<column> [<max_runs>]]")
+        sys.exit(2)
+
+    connection = open_store(sys.argv[1])
+    writer = csv.writer(sys.stdout)
+
+    if sys.argv[2] == "runs":
+        writer.writerow(["run", "name", "started", "configs"])
+        writer.writerows(connection.execute("SELECT id, name, started, configs FROM runs ORDER BY id"))
+    else:
+        column = sys.argv[4] if len(sys.argv) > 4 else COLUMNS["term_total"]
+        writer.writerow(["run", "name", COLUMNS["docset"], column])
+        writer.writerows(trend(connection, sys.argv[3], column, max_runs))
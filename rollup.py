@@ -0,0 +1,189 @@
+# Script to roll up the output of consolidate.py (a -consolidated.csv file) by folder, so the totals of an area of
+# the docs (such as azure-docs-pr/articles/machine-learning) can be read without going back to the per-file rows.
+#
+# The rows are read once and their counts added to the node of their folder in a tree of path prefixes (docset,
+# then each folder under it); the totals of every folder are then summed up the tree in one walk, so each node holds
+# the totals of its whole subtree. Each node has:
+#
+#    files: the number of files with at least one occurrence
+#    scored_files: the number of those files with a nonzero score (see score.py)
+#    score: the total score of the files
+#    counts: the total of each term column, term_total, and each tag column (zero counts are left out of the JSON)
+#
+# The folders above a docset's first branching folder (such as the path of the repo clone) are collapsed into the
+# docset node, so paths read as <docset>/<folder>/..., and the docset node's "folder" gives the collapsed path.
+#
+# Output:
+#    <input_csv_file>-rollup.json: the tree, with each node's children in a "children" list sorted by name
+#    <input_csv_file>-rollup.csv: one row per node, sorted by path, with the path, depth (the number of names in the
+#        path, so 0 for the total and 1 for a docset), and totals as columns
+#
+# Usage: python rollup.py [--depth <n>] <input_csv_file.csv>
+#
+# --depth <n> writes only the nodes down to n levels below the docset (0 writes only the docsets and the total);
+# deeper folders are still included in the totals of their ancestors.
+
+import csv
+import getopt
+import json
+import os
+import sys
+
+from score import calculate_score
+from utilities import make_identifier, COLUMNS, TAGS
+
+# Columns of the input that aren't counts
+INFO_COLUMNS = [ "docset", "file", "url", "msauthor", "author", "manager", "msdate", "msservice", "mstopic" ]
+
+
+def count_columns(headers):
+    """Returns the names of the count columns of a -consolidated.csv file: the term columns, term_total, and the tag
+    columns, which consolidate.py writes together after the docset, file, url, and metadata columns."""
+    index_total = headers.index(COLUMNS["term_total"])
+    start = max(headers.index(COLUMNS[name]) for name in INFO_COLUMNS if COLUMNS[name] in headers[:index_total]) + 1
+    end = headers.index(make_identifier(list(TAGS.values())[-1])) + 1
+    return headers[start:end]
+
+
+def new_node(size):
+    return { "files": 0, "scored_files": 0, "score": 0, "counts": [0] * size, "children": {} }
+
+
+def add_node(total, node):
+    total["files"] += node["files"]
+    total["scored_files"] += node["scored_files"]
+    total["score"] += node["score"]
+
+    for i, count in enumerate(node["counts"]):
+        total["counts"][i] += count
+
+
+def sum_subtree(node):
+    """Adds the totals of each node's subtree to the node, from the leaves up."""
+    for child in node["children"].values():
+        sum_subtree(child)
+        add_node(node, child)
+
+
+def build_tree(input_file):
+    """Reads a -consolidated.csv file and returns (count columns, tree), where the tree's root holds the grand total
+    and has a child for each docset."""
+    with open(input_file, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        columns = count_columns(headers)
+        indexes = [headers.index(column) for column in columns]
+        index_docset = headers.index(COLUMNS["docset"])
+        index_file = headers.index(COLUMNS["file"])
+
+        # A -scored.csv file has the score already, but only has the rows with a nonzero score
+        index_score = headers.index(COLUMNS["score"]) if COLUMNS["score"] in headers else None
+
+        root = new_node(len(columns))
+
+        for row in reader:
+            node = root["children"].setdefault(row[index_docset], new_node(len(columns)))
+
+            for folder in os.path.dirname(row[index_file].replace('\\', '/')).split('/'):
+                node = node["children"].setdefault(folder, new_node(len(columns)))
+
+            score = int(row[index_score]) if index_score is not None else calculate_score(headers, row)
+            node["files"] += 1
+            node["scored_files"] += 1 if score != 0 else 0
+            node["score"] += score
+
+            for i, index in enumerate(indexes):
+                node["counts"][i] += int(row[index]) if row[index] != "" else 0
+
+    # Collapse the folders above each docset's first branching folder (or the folder with its files)
+    for docset in root["children"].values():
+        folders = []
+
+        while len(docset["children"]) == 1 and docset["files"] == 0:
+            name, child = next(iter(docset["children"].items()))
+
+            if child["files"] > 0 or len(child["children"]) != 1:
+                break
+
+            folders.append(name)
+            docset["children"] = child["children"]
+
+        docset["folder"] = "/".join(folders)
+
+    sum_subtree(root)
+    return columns, root
+
+
+def tree_json(name, path, node, columns, depth, max_depth):
+    """Returns a node and its children, down to max_depth, as a dictionary for the JSON output."""
+    result = { "name": name, "path": path }
+
+    if "folder" in node:
+        result["folder"] = node["folder"]
+
+    result.update(files=node["files"], scored_files=node["scored_files"], score=node["score"],
+        counts={ column: count for column, count in zip(columns, node["counts"]) if count != 0 })
+
+    if max_depth is None or depth < max_depth:
+        children = [tree_json(child_name, path + "/" + child_name if path != "" else child_name, child, columns, depth + 1,
+            max_depth) for child_name, child in sorted(node["children"].items())]
+
+        if len(children) > 0:
+            result["children"] = children
+
+    return result
+
+
+def tree_rows(path, node, depth, max_depth):
+    """Generates a CSV row for a node and each node under it, down to max_depth, sorted by path."""
+    yield [path, depth] + [node["files"], node["scored_files"], node["score"]] + node["counts"]
+
+    if max_depth is None or depth < max_depth:
+        for child_name, child in sorted(node["children"].items()):
+            yield from tree_rows(path + "/" + child_name if path != "" else child_name, child, depth + 1,
+                max_depth)
+
+
+def rollup(input_file, json_file, csv_file, depth=None):
+    """Writes the folder roll-ups of a -consolidated.csv file to json_file and csv_file, with the nodes down to depth
+    levels below the docsets, or all of them if depth is None."""
+    print("rollup, INFO, Starting roll-up, , {}".format(input_file))
+    columns, root = build_tree(input_file)
+
+    # A node's depth is the number of names in its path: 0 for the total, 1 for a docset, and so on
+    max_depth = depth + 1 if depth is not None else None
+
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(tree_json("", "", root, columns, 0, max_depth), f)
+
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "depth", "files", "scored_files", COLUMNS["score"]] + columns)
+        writer.writerows(tree_rows("", root, 0, max_depth))
+
+    print("rollup, INFO, Roll-up complete, {} docsets, {}".format(len(root["children"]), json_file))
+
+
+if __name__ == "__main__":
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["depth="])
+    except getopt.GetoptError:
+        opts, args = [('-h', '')], []
+
+    options = dict(opts)
+
+    try:
+        depth = int(options['--depth']) if '--depth' in options else None
+    except ValueError:
+        options['-h'] = ''
+
+    if len(args) != 1 or '-h' in options or '-H' in options or '-?' in options:
+        print("Usage: python rollup.py [--depth <n>] <input_csv_file.csv>")
+        print("<input_csv_file.csv> is the output from consolidate.py")
+        print("--depth <n> writes only the folders down to n levels below each docset.")
+        sys.exit(2)
+
+    # Making the output filename assumes the input filename has only one .
+    input_file = args[0]
+    elements = input_file.split('.')
+    rollup(input_file, elements[0] + '-rollup.json', elements[0] + '-rollup.csv', depth)
@@ -1,11 +1,39 @@
 # Script to take the output of consolidate.py and calculate a scoring value based on the criteria
 # below. This is done as a separate script to allow for changes in the scoring algorithm without
 # messing with consolidation.
-
+#
+# With --top <K>, the script writes only the K highest-scoring articles, sorted by score (highest first), instead
+# of every nonzero row in filename order. Rows stream through a bounded heap, so memory doesn't grow with the number
+# of articles. Ties go to the article that comes first in the input (by filename). With --per-docset, it writes the
+# top K of each docset, grouped by docset.
+
+import getopt
+import heapq
 import sys
 import json
 from utilities import parse_config_arguments, TAGS, COLUMNS
 
+def calculate_score(headers, row):
+    """Calculates the score for one row of consolidated output with the given headers.
+
+    Factors:
+       text_score: link_text + text_intro + text
+       non_text_score: Sum of meta_title, meta_description, meta_keywords, h1_heading, subheading, code_fence, and in_filename
+    """
+    text_cols = ["link_text", "text_intro", "text"]
+    text_score = sum(int(row[headers.index(TAGS[column])]) for column in text_cols)
+    
+    non_text_cols = ["meta_title", "meta_description", "meta_keywords", "h1_heading", "subheading", "code_fence", "in_filename"]
+    non_text_score = sum(int(row[headers.index(TAGS[column])]) for column in non_text_cols)
+
+    # The first case here catches instances with a high text count but without the term showing up in the non_text_score areas.
+    if non_text_score == 0 and text_score >= 6:
+        return text_score
+
+    # Otherwise, score as non-zero anything with text_score >=3, multiplying by non_text_score to give a weigting of sorts.
+    return text_score * non_text_score if text_score >= 3 else 0
+
+
 def score(input_file, output_file):
     print("score, INFO, Starting scoring, {}".format(input_file))
 
@@ -23,29 +51,10 @@ def score(input_file, output_file):
             writer.writerow(headers)
             headers.remove(COLUMNS["score"])
 
-            current_row = next(reader)
+            current_row = next(reader, None)
 
             while current_row is not None:
-
-                # Calculate and insert the score.
-                #
-                # Factors:
-                #    text_score: link_text + text_intro + text
-                #    non_text_score: Sum of meta_title, meta_description, meta_keywords, h1_heading, subheading, code_fence, and in_filename
-                #
-
-                text_cols = ["link_text", "text_intro", "text"]
-                text_score = sum(int(current_row[headers.index(TAGS[column])]) for column in text_cols)
-                
-                non_text_cols = ["meta_title", "meta_description", "meta_keywords", "h1_heading", "subheading", "code_fence", "in_filename"]
-                non_text_score = sum(int(current_row[headers.index(TAGS[column])]) for column in non_text_cols)
-
-                # The first case here catches instances with a high text count but without the term showing up in the non_text_score areas.
-                if non_text_score == 0 and text_score >= 6:
-                    score = text_score
-                else:
-                    # Otherwise, score as non-zero anything with text_score >=3, multiplying by non_text_score to give a weigting of sorts.
-                    score = text_score * non_text_score if text_score >= 3 else 0                
+                score = calculate_score(headers, current_row)
 
                 # Write score only if non-zero
                 if score != 0:
@@ -56,15 +65,72 @@ def score(input_file, output_file):
 
     print("score, INFO, Scoring complete, ,")
 
+
+def top_scores(input_file, output_file, k, per_docset=False):
+    """Writes the k highest-scoring rows of input_file (the output from consolidate.py) to output_file, sorted by
+    score, or the k highest-scoring rows of each docset if per_docset is True."""
+    print("score, INFO, Starting top {} scoring, {}".format(k, input_file))
+
+    # Each heap is a min-heap of (score, -index, row) holding the best k rows so far, so the worst of them is at [0];
+    # using -index makes the later of two rows with the same score the worse one.
+    heaps = {}
+
+    with open(input_file, encoding='utf-8') as f_in:
+        import csv
+        reader = csv.reader(f_in)
+        headers = next(reader)
+        index_docset = headers.index(COLUMNS["docset"])
+
+        for index, row in enumerate(reader):
+            score = calculate_score(headers, row)
+
+            if score == 0 or k <= 0:
+                continue
+
+            heap = heaps.setdefault(row[index_docset] if per_docset else None, [])
+
+            if len(heap) < k:
+                heapq.heappush(heap, (score, -index, row))
+            elif (score, -index) > heap[0][:2]:
+                heapq.heapreplace(heap, (score, -index, row))
+
+    with open(output_file, 'w', encoding='utf-8', newline='') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow([COLUMNS["score"]] + headers)
+
+        for docset in sorted(heaps.keys(), key=lambda docset: docset or ""):
+            for score, _, row in sorted(heaps[docset], reverse=True):
+                writer.writerow([score] + row)
+
+    print("score, INFO, Scoring complete, , {}".format(output_file))
+
+
 if __name__ == "__main__":    
-    if len(sys.argv) == 1:
-        print("Usage: python score.py <input_csv_file.csv>")
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hH?', ["top=", "per-docset"])
+    except getopt.GetoptError:
+        opts, args = [('-h', '')], []
+
+    options = dict(opts)
+
+    try:
+        k = int(options['--top']) if '--top' in options else None
+    except ValueError:
+        options['-h'] = ''
+
+    if len(args) != 1 or '-h' in options or '-H' in options or '-?' in options or ('--per-docset' in options and '--top' not in options):
+        print("Usage: python score.py [--top <K> [--per-docset]] <input_csv_file.csv>")
         print("<input_csv_file.csv> is the output from consolidate.py")
+        print("--top <K> writes only the K highest-scoring articles, sorted by score, to <input_csv_file>-top<K>.csv;")
+        print("--per-docset writes the top K of each docset.")
         sys.exit(2)
 
     # Making the output filename assumes the input filename has only one .
-    input_file = sys.argv[1]
+    input_file = args[0]
     elements = input_file.split('.')
-    output_file = elements[0] + '-scored.' + elements[1]
 
-    score(input_file, output_file)
+    if '--top' in options:
+        suffix = '-top{}-per-docset.' if '--per-docset' in options else '-top{}.'
+        top_scores(input_file, elements[0] + suffix.format(k) + elements[1], k, '--per-docset' in options)
+    else:
+        score(input_file, elements[0] + '-scored.' + elements[1])
@@ -0,0 +1,270 @@
+# Sharded inventories, which split a full inventory across several take_inventory.py runs (on one machine or many)
+# and merge the partial outputs into the same files as a single run.
+#
+# 1. Optionally write a manifest of the files to scan, split into shards:
+#
+#       python shard_inventory.py manifest --config <config_file> [--config ...] --shards <n> [--by hash|size] <manifest_file>
+#
+#    --by hash (the default) assigns each file by a hash of its path relative to INVENTORY_REPO_ROOT, which needs
+#    no coordination; --by size assigns files to balance the total bytes per shard, largest files first. Either way,
+#    a file that more than one docset includes goes to one shard, because the consolidated output has one row per
+#    file. The manifest is a CSV file of docset, path (relative to the docset folder, with / separators), bytes,
+#    and shard.
+#
+# 2. Run each shard, anywhere the docsets are cloned (INVENTORY_REPO_ROOT can differ between machines):
+#
+#       python take_inventory.py --config <config_file> [--config ...] --shard <i>/<n> [--manifest <manifest_file>]
+#
+#    Without a manifest, the shard's files are chosen by hash. Each shard writes sorted partial outputs named
+#    <name>_shard-<i>-of-<n>.csv (with the usual -metadata, -consolidated, and -scored variants) and a
+#    run_shard-<i>-of-<n>-report.json run report.
+#
+# 3. Copy the partial outputs into one folder and merge them:
+#
+#       python shard_inventory.py merge [--shards <n>] [<folder>]
+#
+#    The merge is a streaming k-way merge of each set of partial outputs by filename (and line number), so the
+#    results are identical to a single run's, and it doesn't need access to the docsets. If the folder has partial
+#    outputs of runs with different shard counts, --shards selects the ones to merge.
+#
+# To try sharding locally, the following runs the shards as separate processes and then merges their outputs:
+#
+#       python shard_inventory.py local --config <config_file> [--config ...] --shards <n> [--by hash|size]
+#
+#    It merges only the partial outputs of its own run (its shard count and its config's inventories), so outputs
+#    left in the results folder by earlier runs don't get in the way.
+
+import csv
+import getopt
+import hashlib
+import heapq
+import json
+import os
+import re
+import sys
+
+from enumerate_files import content_sets, enumerate_docsets
+from utilities import get_next_filename, merge_configs, COLUMNS
+
+MANIFEST_HEADERS = [ COLUMNS["docset"], COLUMNS["file"], "bytes", "shard" ]
+OUTPUT_SUFFIXES = [ "", "-metadata", "-consolidated", "-scored" ]
+
+
+def shard_filename(inventory, shard):
+    return "{}_shard-{}-of-{}".format(inventory, shard[0], shard[1])
+
+
+def shard_key(full_path):
+    """Returns the key that assigns a file to a shard: its path relative to INVENTORY_REPO_ROOT, with / separators,
+    which is the same on any machine. The consolidated output has one row per file path, whichever docsets include
+    the file, so the key leaves out the docset."""
+    return os.path.relpath(full_path, os.getenv("INVENTORY_REPO_ROOT", os.curdir)).replace('\\', '/')
+
+
+def hash_shard(key, count):
+    """Returns the shard (numbered from 1) for a file's shard_key by hash, which is the same on any machine."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def size_shards(files, count):
+    """Assigns (key, size) files to shards with about the same total size, giving each file (largest first) to the
+    shard with the fewest bytes so far. Returns a list of shards matching files."""
+    loads = [(0, shard) for shard in range(1, count + 1)]
+    shards = [0] * len(files)
+
+    for i in sorted(range(len(files)), key=lambda i: (-files[i][1], files[i][0])):
+        load, shard = heapq.heappop(loads)
+        shards[i] = shard
+        heapq.heappush(loads, (load + files[i][1], shard))
+
+    return shards
+
+
+def manifest_files(config):
+    """Generates (docset, relative_path, size, key) for the files in the config's docsets, where key is the
+    file's shard_key."""
+    for docset, folder, _, _, _, entries in enumerate_docsets(content_sets(config, "shard_inventory")):
+        for entry in entries:
+            yield docset, os.path.relpath(entry.path, folder).replace('\\', '/'), entry.stat().st_size, shard_key(entry.path)
+
+
+def write_manifest(config, count, by, filename):
+    files = list(manifest_files(config))
+
+    if by == "size":
+        # A file in more than one docset is balanced once, and all its rows get the same shard
+        sizes = { key: size for _, _, size, key in files }
+        keys = sorted(sizes)
+        assigned = dict(zip(keys, size_shards([(key, sizes[key]) for key in keys], count)))
+        shards = [assigned[key] for _, _, _, key in files]
+    else:
+        shards = [hash_shard(key, count) for _, _, _, key in files]
+
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(MANIFEST_HEADERS)
+        writer.writerows(file[:3] + (shard,) for file, shard in zip(files, shards))
+
+    for shard in range(1, count + 1):
+        size = sum(file[2] for file, assigned in zip(files, shards) if assigned == shard)
+        print("shard_inventory, INFO, Shard {} of {}, {} files, {} bytes".format(shard, count, shards.count(shard), size))
+
+
+def read_manifest(filename, shard):
+    """Returns the set of (docset, relative_path) files that the manifest assigns to the given shard."""
+    with open(filename, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return { (row[0], row[1]) for row in reader if int(row[3]) == shard[0] }
+
+
+def shard_selector(shard, manifest=None):
+    """Returns a function that takes a docset, a file path relative to the docset folder (with / separators), and the
+    file's full path, and returns True if the file belongs to the given shard, using the manifest if one is given."""
+    if manifest is not None:
+        files = read_manifest(manifest, shard)
+        return lambda docset, relative_path, full_path: (docset, relative_path) in files
+
+    return lambda docset, relative_path, full_path: hash_shard(shard_key(full_path), shard[1]) == shard[0]
+
+
+def read_sorted_rows(filename):
+    """Generates (key, row) for each row of a partial output, where key is the sort key of a single run's output:
+    the filename, followed by the line number if the file has one."""
+    with open(filename, encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        index_file = headers.index(COLUMNS["file"])
+        index_line = headers.index(COLUMNS["line"]) if COLUMNS["line"] in headers else None
+
+        for row in reader:
+            yield ((row[index_file], int(row[index_line])) if index_line is not None else (row[index_file],)), row
+
+
+def merge_files(filenames, output_filename):
+    """Merges sorted partial outputs with the same headers into one sorted output."""
+    with open(filenames[0], encoding='utf-8') as f:
+        headers = next(csv.reader(f))
+
+    with open(output_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(row for _, row in heapq.merge(*[read_sorted_rows(filename) for filename in filenames],
+            key=lambda item: item[0]))
+
+
+def find_shard_outputs(folder, count=None, names=None):
+    """Returns a dictionary of inventory name to the list of base names of its partial outputs in folder, in shard order.
+    count and names optionally limit the outputs to those of one shard count and to the named inventories."""
+    pattern = re.compile(r"(.+)_shard-(\d+)-of-(\d+)\.csv")
+    outputs = {}
+
+    for filename in os.listdir(folder):
+        match = pattern.fullmatch(filename)
+
+        if match is not None and (count is None or int(match.group(3)) == count) and (names is None or match.group(1) in names):
+            outputs.setdefault((match.group(1), int(match.group(3))), []).append((int(match.group(2)), filename[:-4]))
+
+    inventories = {}
+
+    for (inventory, shard_count), shards in sorted(outputs.items()):
+        found = sorted(shard for shard, _ in shards)
+
+        if found != list(range(1, shard_count + 1)):
+            print("shard_inventory, ERROR, Missing shards for inventory, Found {} of {}, {}".format(found, shard_count, inventory))
+            sys.exit(1)
+
+        if inventory in inventories:
+            print("shard_inventory, ERROR, Partial outputs for more than one shard count, Use --shards to select one, {}".format(inventory))
+            sys.exit(1)
+
+        inventories[inventory] = [os.path.join(folder, name) for _, name in sorted(shards)]
+
+    return inventories
+
+
+def merge_shards(folder, count=None, names=None):
+    """Merges the partial outputs in folder into the outputs of a single run, written to the current folder. count and
+    names are as for find_shard_outputs."""
+    inventories = find_shard_outputs(folder, count, names)
+
+    if len(inventories) == 0:
+        print("shard_inventory, WARNING, No partial outputs found, , {}".format(folder))
+
+    for inventory, names in inventories.items():
+        result_filename = get_next_filename(inventory)
+        print("shard_inventory, INFO, Merging {} shards, , {}.csv".format(len(names), result_filename))
+
+        for suffix in OUTPUT_SUFFIXES:
+            merge_files([name + suffix + ".csv" for name in names], result_filename + suffix + ".csv")
+
+
+def run_local(config_files, count, by):
+    """Runs each shard as a separate take_inventory.py process and merges the outputs in the results folder."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "take_inventory.py")
+    results_folder = os.getenv("INVENTORY_RESULTS_FOLDER", "InventoryData")
+    configs = [arg for config_file in config_files for arg in ("--config", os.path.abspath(config_file))]
+    config = load_config(config_files)
+    shard_args = []
+
+    if by == "size":
+        manifest = os.path.abspath(os.path.join(results_folder, "shard-manifest.csv"))
+        write_manifest(config, count, by, manifest)
+        shard_args = ["--manifest", manifest]
+
+    import subprocess
+
+    processes = [subprocess.Popen([sys.executable, script] + configs + ["--shard", "{}/{}".format(shard, count)] + shard_args)
+        for shard in range(1, count + 1)]
+
+    if any(process.wait() != 0 for process in processes):
+        print("shard_inventory, ERROR, A shard failed, Not merging, ")
+        sys.exit(1)
+
+    os.chdir(results_folder)
+    merge_shards(".", count, { search["name"].lower() for search in config.get("inventory", []) })
+
+
+def load_config(config_files):
+    configs = []
+
+    for config_file in config_files:
+        with open(config_file, 'r') as config_load:
+            configs.append(json.load(config_load))
+
+    return configs[0] if len(configs) == 1 else merge_configs(configs)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[2:], 'hH?', ["config=", "shards=", "by="])
+    except getopt.GetoptError:
+        command, opts, args = None, [], []
+
+    if command is not None:
+        config_files = [arg for opt, arg in opts if opt == '--config'] or ["config.json"]
+        options = dict(opts)
+        by = options.get('--by', "hash")
+
+        try:
+            count = int(options.get('--shards', 0))
+        except ValueError:
+            command = None
+
+    if command not in ("manifest", "merge", "local") or any(opt in ('-h', '-H', '-?') for opt, _ in opts) \
+            or by not in ("hash", "size") or (command != "merge" and count < 1) or count < 0 or (command == "manifest" and len(args) != 1):
+        print("Usage: python shard_inventory.py manifest --config <config_file> [--config ...] --shards <n> [--by hash|size] <manifest_file>")
+        print("       python shard_inventory.py merge [--shards <n>] [<folder>]")
+        print("       python shard_inventory.py local --config <config_file> [--config ...] --shards <n> [--by hash|size]")
+        print("Run each shard with python take_inventory.py --config <config_file> --shard <i>/<n> [--manifest <manifest_file>].")
+        sys.exit(2)
+
+    if command == "manifest":
+        write_manifest(load_config(config_files), count, by, args[0])
+    elif command == "merge":
+        merge_shards(args[0] if len(args) > 0 else ".", count or None)
+    else:
+        run_local(config_files, count, by)
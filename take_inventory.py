@@ -1,145 +1,855 @@
+import codecs
 import csv
+import functools
+import hashlib
+import io
+import locale
 import os
-import subprocess
 import sys
 import pathlib
 import re
 import json
-
-from consolidate import consolidate
-from extract_metadata import extract_metadata
+import time
+from collections import namedtuple
+
+from consolidate import consolidate, get_terms
+from content_rules import check_content, write_issues
+from enumerate_files import content_sets, enumerate_docsets, exclusion_filter
+from extract_metadata import extract_metadata, MetadataCache
+from instrumentation import FileStats, RunStats
+from pipeline import read_ahead
 from score import score
+from shard_inventory import read_sorted_rows, shard_filename, shard_selector
+from term_budget import TermBudget
 
-from slugify import slugify
-from utilities import get_next_filename, parse_config_arguments, classify_occurrence, delineate_segments, COLUMNS
+from prefilter import find_literal, fold_case, literal_text, may_match, required_literals
+from utilities import get_next_filename, make_url, merge_configs, parse_inventory_arguments, classify_occurrence, delineate_segments, SPECIAL_CASE_FILENAMES, COLUMNS
 
-def take_inventory(config, results_folder):
-    print("Script,Type,Message,Detail,Item")
-    # Compile search terms
+def compile_terms(config):
+    """Compiles the search terms of each inventory, returning a dictionary of inventory name to list of
+    compiled terms, and a matching dictionary of the literals each term requires (see prefilter.py)."""
     terms = {}
+
     for search in config["inventory"]:
         terms[search["name"].lower()] = [re.compile(term, re.IGNORECASE | re.MULTILINE) for term in search["terms"]]
 
-    results = {}
+    literals = { name: [required_literals(term) for term in compiled] for name, compiled in terms.items() }
+    return terms, literals
 
-    for content_set in config["content"]:
-        docset = content_set.get("repo")
-        folder = os.path.expandvars(content_set.get("path"))  # Expands ${INVENTORY_REPO_ROOT}
-        base_url = content_set.get("url")
-        exclude_folders = content_set.get("exclude_folders")
 
-        if folder is None:
-            print("take_inventory, WARNING, No path for docset, Skipping, {}".format(docset))
-            continue
+def lint_terms(config):
+    """Warns about terms with spaces around an unescaped |, which match as part of the alternatives, so that
+    "Azure | AWS" finds "Azure " and " AWS" rather than "Azure" and "AWS"."""
+    for search in config["inventory"]:
+        for term in search["terms"]:
+            if re.search(r"(?<!\\)(\s\||\|\s)", term):
+                print("take_inventory, WARNING, Term has spaces around |, which match as part of the alternatives, {}, {}".format(
+                    term, search["name"].lower()))
 
-        if docset is None or base_url is None:
-            print("take_inventory, ERROR, Malformed config entry for docset, Check your config file, {}".format(docset))
-            continue
 
-        print('take_inventory, INFO, Processing docset, {}, {}'.format(docset, folder))
+# The codec that decodes the files, which is the one pathlib.Path.read_text uses by default: the locale's (such as
+# cp1252 on Windows), or UTF-8 in Python's UTF-8 mode. The default scan and --mmap both decode with it.
+CONTENT_ENCODING = locale.getpreferredencoding(False)
+
+
+@functools.lru_cache(maxsize=None)
+def needs_decoding(encoding):
+    """Returns a pattern for the bytes with which the byte patterns of --mmap could find something other than the
+    terms find in text decoded with encoding: the encodings of the non-ASCII characters that re.IGNORECASE matches to
+    an ASCII letter (İ, ı, ſ, and the Kelvin sign; see prefilter.py), and a carriage return without a newline, which
+    decoding turns into a line break. Returns None if ASCII bytes can be part of other characters in the encoding
+    (as in UTF-16 or Shift-JIS), in which case every file must be decoded."""
+    single_byte = len(bytes(range(256)).decode(encoding, errors="replace")) == 256
+
+    if bytes(range(128)).decode(encoding, errors="replace") != "".join(map(chr, range(128))) or not (single_byte
+            or codecs.lookup(encoding).name == "utf-8"):
+        return None
+
+    alternatives = [re.escape(c.encode(encoding)) for c in "\u0130\u0131\u017f\u212a" if c.encode(encoding, errors="ignore") != b""]
+    return re.compile(b"|".join(alternatives + [b"\r(?!\n)"]))
+
+
+def compile_byte_terms(terms):
+    """Compiles bytes versions of the search terms for the memory-mapped scanning mode. Only plain-text terms (see
+    prefilter.literal_text) get a bytes version, which finds exactly what the term finds in the decoded text in files
+    without any of the bytes that needs_decoding finds; the other terms map to None and run on the decoded text,
+    because character classes, \\b, and case folding work differently on bytes."""
+    return { name: [re.compile(re.escape(literal_text(term)).encode("ascii"), re.IGNORECASE)
+        if literal_text(term) is not None else None for term in compiled] for name, compiled in terms.items() }
+
+
+def get_segments(content, full_path, stats, issues=None):
+    """Returns the segments of content from delineate_segments. If issues is a list, the content rules (see
+    content_rules.py) also run on the content, and the issues they find are appended to it rather than printed."""
+    with stats.stage("delineate_segments"):
+        code_lines, intro_lines, metadata_lines = delineate_segments(content, full_path, issues)
+
+    if issues is not None:
+        with stats.stage("content_rules"):
+            check_content(content, full_path, (code_lines, intro_lines, metadata_lines), issues)
+
+    # Content check: if metadata_text is empty, then the article lacks metadata
+    elif len(metadata_lines) == 0:
+        print("take_inventory, WARNING, File contains no metadata, , {}".format(full_path))
+
+    return code_lines, intro_lines, metadata_lines
+
+
+# With --lazy-extracts, a row holds the offsets of its extract in the decoded content of the file instead of the
+# text, which materialize_extracts reads when the rows are written. line_start is the position of the newline
+# that precedes the line (or 0), and line_end the position of the newline that ends it (or the end of the content).
+LineExtract = namedtuple("LineExtract", ["line_start", "line_end", "match_start", "match_end"])
+
+
+def make_extract(content, line_start, line_end, match_start, match_end, window=None):
+    """Returns the extract for an occurrence: the stripped text of its line, or if window is given, only up to
+    window characters on either side of the occurrence, with ... where the line is cut."""
+    if window is None:
+        return content[line_start:line_end + 1].strip()
 
-        for root, dirs, files in os.walk(folder):
-            for exclusion in exclude_folders:
-                if exclusion in dirs:
-                    dirs.remove(exclusion)
+    start = max(line_start, match_start - window)
+    end = min(line_end + 1, match_end + window)
+    prefix = "..." if content[line_start:start].strip() != "" else ""
+    suffix = "..." if content[end:line_end + 1].strip() != "" else ""
+    return prefix + content[start:end].strip() + suffix
 
-            for file in files:
-                if pathlib.Path(file).suffix != '.md':
+
+def materialize_extracts(rows, window=None):
+    """Generates the rows of an inventory (sorted by file) with each LineExtract replaced by the text of the
+    extract, reading each file once. The files are assumed not to have changed since they were scanned."""
+    path = None
+    content = None
+
+    for row in rows:
+        if isinstance(row[6], LineExtract):
+            if row[1] != path:
+                path = row[1]
+
+                try:
+                    content, _ = read_file(path)
+                except (OSError, UnicodeDecodeError):
+                    print("take_inventory, WARNING, Could not read file for extracts, Extracts left empty, {}".format(path))
+                    content = None
+
+            row = row[:6] + [make_extract(content, *row[6], window) if content is not None else ""]
+
+        yield row
+
+
+def make_row(docset, full_path, url, term, line_num, line, term_end, file, segments, stats, extract=None):
+    """Classifies one occurrence and returns its results row. line is the text from the newline preceding
+    the occurrence through the newline that ends it; term_end is the position of the end of the term in line.
+    extract is the row's extract, which by default is the stripped line."""
+    start = time.perf_counter()
+    line_content = line.lstrip() # Keep the trailing \n in this variant
+
+    # Determine the position in line_content of the term ending
+    chars_removed = len(line) - len(line_content)
+    term_end = term_end - chars_removed
+
+    # Second argument is the end of the term's occurrence, because we need to look at 
+    # that subset of text in some classifications.
+    code_lines, intro_lines, metadata_lines = segments
+    tag = classify_occurrence(line_content, term_end, term.pattern, line_num, file,
+        code_lines, intro_lines, metadata_lines)
+
+    stats.add_time("classify_occurrence", time.perf_counter() - start)
+    return [docset, full_path, url, term.pattern, tag, line_num, line_content.strip() if extract is None else extract]
+
+
+def scan_content(content, full_path, file, docset, url, inventories, terms, literals, results, stats, segments=None,
+        budget=None, issues=None, window=None, lazy=False, quiet=False, metrics=None, folded=None):
+    """Searches the decoded content of one file for the terms of the named inventories, appending rows to results.
+    If literals is None, the pre-filter is skipped. segments can give the result of delineate_segments if the caller
+    already has it. budget is an optional term_budget.TermBudget that limits the time each term can take. If issues
+    is a list, the file is checked with the content rules whether or not any term matches, and the issues are
+    appended to it (see get_segments). window limits the extracts (see make_extract), and lazy makes the rows hold
+    LineExtract offsets instead of the text (see materialize_extracts). Every file is segmented, so the segment
+    warnings cover all files, unless quiet is True, in which case only the files with matches are segmented (and
+    warned about). If metrics is a dictionary, the page metrics of a file with matches (see page_metrics.py) are
+    added to it by path. folded can give fold_case(content) if the caller already has it. Returns the segments, which
+    are None if quiet is True, no term matched, and the caller didn't give them or issues."""
+    # The stages that run per match are recorded in file_stats, which is added to stats once, at the end of the file
+    file_stats = FileStats()
+
+    if segments is None and (issues is not None or not quiet):
+        segments = get_segments(content, full_path, file_stats, issues)
+
+    # Matches on the same line (of any term) share one copy of the line's extract. A match can run past the end of
+    # its line (for example, Java[^Ss] matches the newline), so the extract is keyed by both ends.
+    extracts = {}
+
+    # Fold the content once for the literal pre-filter and the plain-text terms; most files contain none of
+    # the terms, in which case we skip the regex scan (and with quiet, the segment analysis) entirely.
+    if literals is not None and folded is None:
+        with file_stats.stage("prefilter"):
+            folded = fold_case(content)
+
+    matches = 0
+
+    for name in inventories:
+        if name not in results:
+            results[name] = []
+
+        for i, term in enumerate(terms[name]):
+            if budget is not None and budget.is_skipped(term):
+                continue
+
+            # Plain-text terms are found with str.find in the folded content (see prefilter.literal_text),
+            # which gives the same spans as the regex; other terms go through the pre-filter and the regex.
+            text = literal_text(term) if literals is not None else None
+
+            if text is not None:
+                stage = "literal"
+                spans = find_literal(folded, text)
+            elif literals is not None and not may_match(literals[name][i], folded):
+                continue
+            elif budget is not None:
+                stage = "regex"
+                spans = budget.spans(term, content)
+            else:
+                stage = "regex"
+                spans = (match.span() for match in term.finditer(content))
+
+            start = time.perf_counter()
+            count = len(results[name])
+            timed_out = False
+
+            try:
+                for match_start, match_end in spans:
+                    if segments is None:
+                        segments = get_segments(content, full_path, file_stats)
+
+                    line_start = content.rfind("\n", 0, match_start)
+                    line_start = 0 if line_start == -1 else line_start  # Handle BOF case
+
+                    line_end = content.find("\n", match_end)
+                    line_end = len(content) if line_end == -1 else line_end # Handle EOF case
+
+                    line_num = content[0:match_start].count("\n") + 1
+                    line = content[line_start:line_end + 1]
+
+                    if lazy:
+                        extract = LineExtract(line_start, line_end, match_start, match_end)
+                    elif window is not None:
+                        extract = make_extract(content, line_start, line_end, match_start, match_end, window)
+                    else:
+                        extract = extracts.get((line_start, line_end))
+
+                        if extract is None:
+                            extract = extracts[(line_start, line_end)] = make_extract(content, line_start, line_end,
+                                match_start, match_end)
+
+                    results[name].append(make_row(docset, full_path, url, term, line_num, line,
+                        match_end - line_start, file, segments, file_stats, extract))
+            except TimeoutError:
+                del results[name][count:]  # Only the regex package raises this, when the term exceeds the budget
+                timed_out = True
+
+            # Matching time includes the segmenting and classifying done for the matches
+            seconds = time.perf_counter() - start
+            file_stats.add_time(stage, seconds)
+            file_stats.add_term(name, term.pattern, docset, seconds, len(results[name]) - count)
+            matches += len(results[name]) - count
+
+            if budget is not None and stage == "regex" and (timed_out or seconds > budget.seconds):
+                budget.overrun(term, seconds, full_path, timed_out)
+
+    if matches == 0:
+        file_stats.count("files_without_matches")
+
+    # Only the files with matches are in the consolidated output, so only they need page metrics
+    elif metrics is not None:
+        from page_metrics import compute_page_metrics
+
+        with file_stats.stage("page_metrics"):
+            metrics[full_path] = compute_page_metrics(content, full_path, segments)
+
+    file_stats.count("matches", matches)
+    stats.merge(file_stats.stages, file_stats.counters, file_stats.terms)
+    return segments
+
+
+def read_file(full_path):
+    """Reads a file, returning its content (decoded with CONTENT_ENCODING) and a BLAKE2 digest of its bytes."""
+    data = pathlib.Path(full_path).read_bytes()
+    return decode_content(data), hashlib.blake2b(data, digest_size=16).digest()
+
+
+def decode_content(data):
+    """Decodes the bytes of a file with CONTENT_ENCODING, as pathlib.Path.read_text does, translating the line endings
+    to \\n."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding=CONTENT_ENCODING, errors="replace").read()
+
+
+def content_key(digest, file, inventories):
+    """Returns the key for caching the scan results of a file: the digest of its content, the filename if
+    classify_occurrence has a special case for it, and the inventories that apply to it."""
+    return digest, file if file in SPECIAL_CASE_FILENAMES else None, tuple(inventories)
+
+
+def add_cached_results(cached, full_path, docset, url, results, stats, issues=None, metrics=None):
+    """Adds the scan results cached for a file with the same content to results, with this file's path, docset, and url,
+    the issues cached for it to issues if that's a list, and its page metrics to metrics if that's a dictionary."""
+    file_results, no_metadata, file_issues, file_metrics = cached
+    matches = 0
+
+    if metrics is not None and file_metrics is not None:
+        metrics[full_path] = file_metrics
+
+    if issues is not None:
+        issues.extend((full_path,) + issue for issue in file_issues)
+    elif no_metadata:
+        print("take_inventory, WARNING, File contains no metadata, , {}".format(full_path))
+
+    for name, rows in file_results.items():
+        results.setdefault(name, []).extend([docset, full_path, url] + row[3:] for row in rows)
+        matches += len(rows)
+
+    if matches == 0:
+        stats.count("files_without_matches")
+
+    stats.count("matches", matches)
+    stats.count("duplicate_files")
+
+
+def scan_cached(content, digest, full_path, file, docset, url, inventories, terms, literals, results, stats, cache,
+        budget=None, issues=None, window=None, lazy=False, quiet=False, metrics=None):
+    """Scans the content of a file with scan_content, unless a file with the same content (and the same special cases)
+    was already scanned, in which case its results are reused. cache is a dictionary that persists across files."""
+    key = content_key(digest, file, inventories)
+
+    if key in cache:
+        add_cached_results(cache[key], full_path, docset, url, results, stats, issues, metrics)
+        return
+
+    file_results = {}
+    file_issues = [] if issues is not None else None
+    segments = scan_content(content, full_path, file, docset, url, inventories, terms, literals, file_results, stats,
+        budget=budget, issues=file_issues, window=window, lazy=lazy, quiet=quiet, metrics=metrics)
+    cache[key] = (file_results, segments is not None and len(segments[2]) == 0,
+        [issue[1:] for issue in file_issues or []], metrics.get(full_path) if metrics is not None else None)
+
+    if issues is not None:
+        issues.extend(file_issues)
+
+    for name, rows in file_results.items():
+        results.setdefault(name, []).extend(rows)
+
+
+def scan_mapped_file(full_path, file, docset, url, inventories, terms, literals, byte_terms, results, stats, window=None):
+    """Memory-mapped variant of scan_content. For an inventory whose terms are all plain text, the byte patterns
+    (see compile_byte_terms) run directly over the mapped file, and only the lines containing matches are decoded;
+    the full text is decoded only for files that have matches, because the segment analysis needs it, so as with
+    --quiet, only those files are segmented and warned about. The other inventories, and every inventory in a file
+    with any of the bytes that needs_decoding finds, are scanned with scan_content on the decoded text, so the results are the
+    same as without --mmap."""
+
+    import mmap
+
+    with open(full_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # Empty files can't be mapped, and can't contain terms anyway
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            content = None
+            segments = None
+            matches = 0
+            # The matched lines are decoded with the same codec as the whole file, so the extracts and term_end values
+            # are the same as without --mmap
+            encoding = CONTENT_ENCODING
+            pattern = needs_decoding(encoding)
+            use_bytes = pattern is not None and pattern.search(buffer) is None
+            decoded_names = []
+            file_stats = FileStats()  # As in scan_content, merged into stats once per file
+
+            for name in inventories:
+                if name not in results:
+                    results[name] = []
+
+                if not use_bytes or any(byte_term is None for byte_term in byte_terms[name]):
+                    decoded_names.append(name)
                     continue
 
-                full_path = os.path.join(root, file)
+                for term, byte_term in zip(terms[name], byte_terms[name]):
+                    # mmap has no count method, so count lines incrementally between successive matches
+                    line_num = 1
+                    counted_to = 0
+                    start = time.perf_counter()
+                    count = len(results[name])
+
+                    for match in byte_term.finditer(buffer):
+                        if segments is None:
+                            content = decode_content(buffer[:])
+                            segments = get_segments(content, full_path, file_stats)
+
+                        line_start = buffer.rfind(b"\n", 0, match.span()[0])
+                        line_start = 0 if line_start == -1 else line_start  # Handle BOF case
+
+                        line_end = buffer.find(b"\n", match.span()[1])
+                        line_end = len(buffer) if line_end == -1 else line_end # Handle EOF case
+
+                        line_num += buffer[counted_to:match.span()[0]].count(b"\n")
+                        counted_to = match.span()[0]
+                        # Decoding turns \r\n into \n, which can only be at the end of the line
+                        line = buffer[line_start:line_end + 1].decode(encoding, errors="replace").replace("\r\n", "\n")
+
+                        # Convert the byte offsets of the term within the line to character offsets
+                        term_start = len(buffer[line_start:match.span()[0]].decode(encoding, errors="replace"))
+                        term_end = len(buffer[line_start:match.span()[1]].decode(encoding, errors="replace"))
+                        extract = make_extract(line, 0, len(line) - 1, term_start, term_end, window) if window is not None else None
+
+                        results[name].append(make_row(docset, full_path, url, term, line_num, line,
+                            term_end, file, segments, file_stats, extract))
+
+                    file_stats.add_time("regex", time.perf_counter() - start)
+                    matches += len(results[name]) - count
+
+            if len(decoded_names) > 0:
+                if content is None:
+                    content = decode_content(buffer[:])
+
+                count = sum(len(results[name]) for name in decoded_names)
+                scan_content(content, full_path, file, docset, url, decoded_names, terms, literals, results, stats,
+                    segments, window=window, quiet=True)
+
+                # scan_content counts the matches, and counts the file as one without matches if it found none
+                if matches > 0 and sum(len(results[name]) for name in decoded_names) == count:
+                    file_stats.count("files_without_matches", -1)
+            elif matches == 0:
+                file_stats.count("files_without_matches")
+
+            file_stats.count("matches", matches)
+            stats.merge(file_stats.stages, file_stats.counters, file_stats.terms)
+
+
+def inventory_files(docsets, stats, selected=None):
+    """Given tuples from enumerate_files.enumerate_docsets, generates (full_path, file, docset, url, inventories)
+    for each file to scan, where inventories lists the names of the inventories that apply to the file. selected is
+    an optional function that takes the docset, the file's path relative to the docset folder (with / separators),
+    and its full path, and returns whether to scan the file (see shard_inventory.shard_selector)."""
+    while True:
+        # Enumeration runs ahead on a background thread, so the walk stage measures only the time spent waiting for
+        # it, for the docset and for each of its files
+        with stats.stage("walk"):
+            item = next(docsets, None)
+
+        if item is None:
+            break
+
+        docset, folder, base_url, exclude_folders, inventories, entries = item
+        print('take_inventory, INFO, Processing docset, {}, {}'.format(docset, folder))
+
+        # When configs are merged, the docset is walked with only the exclusions that all the configs share,
+        # so inventories from a config with more exclusions filter the files further.
+        filters = [(name, None if excluded == exclude_folders else exclusion_filter(excluded))
+            for name, excluded in inventories.items()]
+
+        waited = 0.0
+
+        while True:
+            start = time.perf_counter()
+            entry = next(entries, None)
+            waited += time.perf_counter() - start
+
+            if entry is None:
+                break
+
+            full_path = entry.path
+            relative_path = os.path.relpath(full_path, folder).replace('\\', '/')
+
+            if selected is not None and not selected(docset, relative_path, full_path):
+                continue
+
+            names = [name for name, is_excluded in filters if is_excluded is None or not is_excluded(relative_path)]
+
+            if len(names) == 0:
+                continue
+
+            stats.count("files")
+            stats.count("bytes", entry.stat().st_size)
+            yield full_path, entry.name, docset, make_url(base_url, folder, full_path), names
+
+        stats.add_time("walk", waited)
+
+
+# Compiled terms, term budget, whether to check the content rules, the extract options (window, lazy), whether to
+# segment only the files with matches (quiet), and whether to compute page metrics in a worker process in
+# scan_in_processes
+_worker_terms = None
+_worker_budget = None
+_worker_issues = False
+_worker_extracts = (None, False)
+_worker_quiet = False
+_worker_metrics = False
+
+
+def init_scan_worker(config, budget_seconds=None, check_issues=False, window=None, lazy=False, quiet=False,
+        metrics=False):
+    global _worker_terms, _worker_budget, _worker_issues, _worker_extracts, _worker_quiet, _worker_metrics
+    _worker_terms = compile_terms(config)
+    _worker_budget = TermBudget(budget_seconds) if budget_seconds is not None else None
+    _worker_issues = check_issues
+    _worker_extracts = (window, lazy)
+    _worker_quiet = quiet
+    _worker_metrics = metrics
+
+
+def scan_in_worker(content, full_path, file, docset, url, inventories):
+    """Runs scan_content in a worker process, returning the results with the scan time and the worker's statistics."""
+    terms, literals = _worker_terms
+    results = {}
+    stats = RunStats()
+    issues = [] if _worker_issues else None
+    metrics = {} if _worker_metrics else None
+    start = time.perf_counter()
+    segments = scan_content(content, full_path, file, docset, url, inventories, terms, literals, results, stats,
+        budget=_worker_budget, issues=issues, window=_worker_extracts[0], lazy=_worker_extracts[1], quiet=_worker_quiet,
+        metrics=metrics)
+    no_metadata = segments is not None and len(segments[2]) == 0
+    file_metrics = metrics.get(full_path) if metrics is not None else None
+    return (results, no_metadata, issues, file_metrics, time.perf_counter() - start, stats.stages, stats.counters,
+        stats.terms)
+
+
+def scan_in_processes(contents, config, processes, results, stats, cache, includes=None, budget_seconds=None,
+        issues=None, window=None, lazy=False, quiet=False, metrics=None):
+    """Scans the (item, (content, digest)) tuples from pipeline.read_ahead in a pool of worker processes, which lets
+    the matching use more than one core. At most two files per process are in flight, so the pool's back-pressure
+    reaches the read-ahead queue. Files whose content is in cache (see scan_cached) aren't sent to the workers.
+    Include files (see includes.py) are scanned in this process. Each worker keeps its own term budget, so a term
+    is switched or skipped (see term_budget.py) per worker."""
+
+    # Imported here because multiprocessing is slow to import and most runs don't need it
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    def collect(futures):
+        for future in futures:
+            (worker_results, no_metadata, worker_issues, file_metrics, seconds, worker_stages, worker_counters,
+                worker_terms) = future.result()
+            cache.setdefault(future.key, (worker_results, no_metadata, [issue[1:] for issue in worker_issues or []],
+                file_metrics))
+
+            if issues is not None:
+                issues.extend(worker_issues)
+
+            if metrics is not None and file_metrics is not None:
+                metrics[future.path] = file_metrics
+
+            for name, rows in worker_results.items():
+                results.setdefault(name, []).extend(rows)
+
+            stats.merge(worker_stages, worker_counters, worker_terms)
+            stats.add_file(future.path, seconds)
+
+    max_in_flight = 0
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_scan_worker,
+            initargs=(config, budget_seconds, issues is not None, window, lazy, quiet, metrics is not None)) as executor:
+        pending = set()
+
+        for (full_path, file, docset, url, names), value in contents:
+            if value is None:
+                print("take_inventory, WARNING, Skipping file that contains non-UTF-8 characters and should be converted, , {}".format(full_path))
+                continue
+
+            content, digest = value
+            key = content_key(digest, file, names)
+
+            if includes is not None:
+                with stats.stage("includes"):
+                    includes.add_results(content, full_path, docset, url, names, results)
+
+            if key in cache:
+                add_cached_results(cache[key], full_path, docset, url, results, stats, issues, metrics)
+                continue
+
+            future = executor.submit(scan_in_worker, content, full_path, file, docset, url, names)
+            future.path = full_path
+            future.key = key
+            pending.add(future)
+            max_in_flight = max(max_in_flight, len(pending))
+
+            if len(pending) >= processes * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        collect(wait(pending).done)
+
+    stats.details["pipeline"]["processes"] = processes
+    stats.details["pipeline"]["max_in_flight"] = max_in_flight
+
+
+def take_inventory(config, results_folder, options=None, run_name=None):
+    """Runs the inventories in config, writing the output files to the current folder. options is a dictionary as
+    returned by utilities.parse_inventory_arguments, without the options that can't be used with mmap (see __main__);
+    run_name is the base name for the run report."""
+    print("Script,Type,Message,Detail,Item")
+    options = options or {}
+    use_mmap = options.get("mmap", False)
+    stats = RunStats()
+
+    if run_name is None:
+        run_name = get_next_filename("run", "-report.json")
+
+    # Compile search terms
+    lint_terms(config)
+    terms, literals = compile_terms(config)
+    budget_seconds = options.get("term_budget")
+    budget = TermBudget(budget_seconds) if budget_seconds is not None else None
+    byte_terms = compile_byte_terms(terms) if use_mmap else None
+
+    results = {}
+    shard = options.get("shard")
+
+    # Every shard writes partial outputs for every inventory, even if none of its files apply, so the merge finds them all
+    if shard is not None:
+        results = { name: [] for name in terms.keys() }
+
+    selected = shard_selector(shard, options.get("manifest")) if shard is not None else None
+    files = inventory_files(enumerate_docsets(content_sets(config, "take_inventory")), stats, selected)
+
+    # Scan results by content (see scan_cached), so files duplicated across docsets and folders are scanned only once
+    cache = {}
+    includes = None
+    window = options.get("extract_window")
+
+    if options.get("includes", False):
+        from includes import IncludeScanner
+        includes = IncludeScanner(terms, literals, window, [os.path.expandvars(content_set["path"])
+            for content_set in config["content"] if content_set.get("path")])
+
+    # With --issues, every file is checked with the content rules, and the issues go to the -issues.csv file
+    issues = [] if options.get("issues", False) else None
+    lazy = options.get("lazy_extracts", False)
+    readers = options.get("readers", 0)
+    processes = options.get("processes", 0)
+
+    # With --quiet, files without matches aren't segmented, so the segment warnings cover only the files with matches
+    quiet = options.get("quiet", False)
+
+    # With --page-metrics, the metrics of each file with matches are computed during the scan, once for all inventories
+    metrics = {} if options.get("page_metrics", False) else None
+
+    with stats.stage("scan"):
+        if use_mmap:
+            for full_path, file, docset, url, names in files:
+                start = time.perf_counter()
+                scan_mapped_file(full_path, file, docset, url, names, terms, literals, byte_terms, results, stats, window)
+                stats.add_file(full_path, time.perf_counter() - start)
+        elif readers > 0 or processes > 0:
+            contents = read_ahead(files, stats, readers or 4, options.get("queue_size", 64), read_file)
+
+            if processes > 0:
+                scan_in_processes(contents, config, processes, results, stats, cache, includes, budget_seconds,
+                    issues, window, lazy, quiet, metrics)
+            else:
+                for (full_path, file, docset, url, names), value in contents:
+                    if value is None:
+                        print("take_inventory, WARNING, Skipping file that contains non-UTF-8 characters and should be converted, , {}".format(full_path))
+                        continue
+
+                    start = time.perf_counter()
+                    scan_cached(*value, full_path, file, docset, url, names, terms, literals, results, stats, cache, budget,
+                        issues, window, lazy, quiet, metrics)
+
+                    if includes is not None:
+                        with stats.stage("includes"):
+                            includes.add_results(value[0], full_path, docset, url, names, results)
+
+                    stats.add_file(full_path, time.perf_counter() - start)
+        else:
+            for full_path, file, docset, url, names in files:
+                start = time.perf_counter()
 
                 try:
-                    content = pathlib.Path(full_path).read_text(errors="replace")
+                    with stats.stage("read"):
+                        content, digest = read_file(full_path)
                 except UnicodeDecodeError:
                     print("take_inventory, WARNING, Skipping file that contains non-UTF-8 characters and should be converted, , {}".format(full_path))
                     continue
 
-                code_lines, intro_lines, metadata_lines = delineate_segments(content, full_path)
+                scan_cached(content, digest, full_path, file, docset, url, names, terms, literals, results, stats, cache,
+                    budget, issues, window, lazy, quiet, metrics)
 
-                # Content check: if metadata_text is empty, then the article lacks metadata
-                if len(metadata_lines) == 0:
-                    print("take_inventory, WARNING, File contains no metadata, , {}".format(full_path))
+                if includes is not None:
+                    with stats.stage("includes"):
+                        includes.add_results(content, full_path, docset, url, names, results)
 
-                for search in config["inventory"]:
-                    name = search["name"].lower()
+                stats.add_file(full_path, time.perf_counter() - start)
 
-                    if name not in results:
-                        results[name] = []
+    if includes is not None:
+        stats.details["includes"] = includes.report()
 
-                    for term in terms[name]:                        
-                        for match in term.finditer(content):
-                            line_start = content.rfind("\n", 0, match.span()[0])
-                            line_start = 0 if line_start == -1 else line_start  # Handle BOF case
+    if budget is not None:
+        stats.details["term_budget"] = budget.report()
 
-                            line_end = content.find("\n", match.span()[1])
-                            line_end = len(content) if line_end == -1 else line_end # Handle EOF case
+    if issues is not None:
+        print("take_inventory, INFO, Writing content issues, , {}-issues.csv".format(run_name))
 
-                            line_num = content[0:match.span()[0]].count("\n") + 1
-                            line = content[line_start:line_end + 1]
-                            line_content = line.lstrip() # Keep the trailing \n in this variant
+        with stats.stage("write_issues"):
+            write_issues(run_name + "-issues.csv", issues)
 
-                            # Determine the position in line_content of the term ending
-                            chars_removed = len(line) - len(line_content)
-                            term_end = match.span()[1] - line_start - chars_removed
+        stats.details["issues"] = {}
 
-                            # Second argument is the end of the term's occurrence, because we need to look at 
-                            # that subset of text in some classifications.
-                            tag = classify_occurrence(line_content, term_end, term.pattern, line_num, file,
-                                code_lines, intro_lines, metadata_lines)
-
-                            url = base_url + full_path[full_path.find('\\', len(folder) + 1) : -3].replace('\\','/')
-                            results[name].append([docset, full_path, url, term.pattern, tag, line_num, line_content.strip()])
+        for issue in issues:
+            stats.details["issues"][issue[2]] = stats.details["issues"].get(issue[2], 0) + 1
 
     # Sort the results (by filename, then line number), and save to a .csv file.
     # A sorted list is needed for consolidate.py and removes the need to open
     # the .csv file in Excel for a manual sort.
     print("take_inventory, INFO, Sorting results by filename, , ")
-    
+
+    store = None
+
+    # The inventories share one metadata cache, so each file's metadata is read only once (see extract_metadata.py)
+    metadata_cache = MetadataCache(options.get("metadata_cache"))
+
+    # The optional outputs import their modules only when they're used, which keeps the startup of a plain run short
+    if options.get("store") is not None:
+        from results_store import open_store, start_run, finish_run, store_matches, store_consolidated
+        store = open_store(options["store"])
+        run_id = start_run(store, run_name, options.get("config_files", []))
+
     for inventory, rows in results.items():
-        rows.sort(key=lambda row: (row[1], int(row[5])))  # Use int on [4] to sort the line numbers numerically
+        with stats.stage("sort"):
+            rows.sort(key=lambda row: (row[1], int(row[5])))  # Use int on [4] to sort the line numbers numerically
+
+        # A shard writes partial outputs with fixed names, which shard_inventory.py merges. With --lazy-extracts,
+        # the extracts are read from the files as the rows are written.
+        result_filename = write_results(config, inventory, materialize_extracts(rows, window) if lazy else rows, stats,
+            shard_filename(inventory, shard) if shard is not None else None, metrics, metadata_cache, options.get("rollup", False) and shard is None)
+
+        if store is not None:
+            print("take_inventory, INFO, Saving results to the results store, , {}".format(options["store"]))
+
+            with stats.stage("store"):
+                store_matches(store, run_id, inventory,
+                    [row for _, row in read_sorted_rows(result_filename + ".csv")] if lazy else rows)
+                store_consolidated(store, run_id, inventory, get_terms(config, inventory), result_filename + "-consolidated.csv",
+                    result_filename + "-scored.csv")
+
+    metadata_cache.save()
+    stats.details["metadata_cache"] = metadata_cache.report()
+
+    # Write the run report next to the CSV files
+    print("take_inventory, INFO, Writing run report, , {}-report.json".format(run_name))
+    stats.write_report(run_name + "-report.json")
+
+    if store is not None:
+        finish_run(store, run_id, stats.report())
+        store.close()
+
 
-        # Open CSV output file, which we do before running the searches because
-        # we consolidate everything into a single file
+def write_results(config, inventory, rows, stats, result_filename=None, metrics=None, metadata_cache=None,
+        rollups=False):
+    """Writes the sorted rows of an inventory to a .csv file and runs the secondary processing on it, returning the
+    base name of the output files, which is the next numbered name for the inventory unless result_filename is given.
+    If metrics is a dictionary of file path to page metrics, as scan_content fills it, the secondary processing also
+    writes the page metrics of each file in the consolidated output (see page_metrics.py). metadata_cache is
+    an optional extract_metadata.MetadataCache shared by the inventories of the run. If rollups is True, it also
+    includes the folder roll-ups of the consolidated output (see rollup.py)."""
 
+    # Open CSV output file, which we do before running the searches because
+    # we consolidate everything into a single file
+
+    if result_filename is None:
         result_filename = get_next_filename(inventory)
-        print('take_inventory, INFO, Writing CSV results file, , {}.csv'.format(result_filename))
+    print('take_inventory, INFO, Writing CSV results file, , {}.csv'.format(result_filename))
 
-        with open(result_filename + '.csv', 'w', newline='', encoding='utf-8') as csv_file:    
-            writer = csv.writer(csv_file)
-            writer.writerow([ COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"], COLUMNS["term"],
-                COLUMNS["tag"], COLUMNS["line"], COLUMNS["extract"] ])
-            writer.writerows(rows)
+    with stats.stage("write_csv"), open(result_filename + '.csv', 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow([ COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"], COLUMNS["term"],
+            COLUMNS["tag"], COLUMNS["line"], COLUMNS["extract"] ])
+        writer.writerows(rows)
 
-        print("take_inventory, INFO, Completed first CSV results file, , {}.csv".format(result_filename))
+    print("take_inventory, INFO, Completed first CSV results file, , {}.csv".format(result_filename))
 
-        print("take_inventory, INFO, Invoking secondary processing to extract metadata, , ")
-        meta_output = "{}-metadata.csv".format(result_filename)
-        extract_metadata(result_filename+".csv", meta_output)
+    print("take_inventory, INFO, Invoking secondary processing to extract metadata, , ")
+    meta_output = "{}-metadata.csv".format(result_filename)
+    with stats.stage("extract_metadata"):
+        extract_metadata(result_filename+".csv", meta_output, metadata_cache)
 
-        print("take_inventory, INFO, Invoking secondary processing to consolidate output, , ")
-        consolidate_output = "{}-consolidated.csv".format(result_filename)
+    print("take_inventory, INFO, Invoking secondary processing to consolidate output, , ")
+    consolidate_output = "{}-consolidated.csv".format(result_filename)
+    with stats.stage("consolidate"):
         consolidate(config, meta_output, consolidate_output)
 
-        print("take_inventory, INFO, Invoking secondary processing to apply scoring, , ")        
-        score_output = "{}-scored.csv".format(result_filename)
+    if metrics is not None:
+        from page_metrics import page_metrics
+        print("take_inventory, INFO, Invoking secondary processing to write page metrics, , ")
+        with stats.stage("write_page_metrics"):
+            page_metrics(consolidate_output, "{}-consolidated-scrapings.csv".format(result_filename), metrics)
+
+    if rollups:
+        from rollup import rollup
+        print("take_inventory, INFO, Invoking secondary processing to roll up the counts by folder, , ")
+        with stats.stage("rollup"):
+            rollup(consolidate_output, "{}-rollup.json".format(result_filename), "{}-rollup.csv".format(result_filename))
+
+    print("take_inventory, INFO, Invoking secondary processing to apply scoring, , ")        
+    score_output = "{}-scored.csv".format(result_filename)
+    with stats.stage("score"):
         score(consolidate_output, score_output)
 
+    return result_filename
+
 if __name__ == "__main__":
     # Get input file arguments, defaulting to folders.txt and terms.txt
-    config_file, _ = parse_config_arguments(sys.argv[1:])
-
-    if config_file is None:
-        print("Usage: python take_inventory.py --config <config_file>")
+    config_files, options, _ = parse_inventory_arguments(sys.argv[1:])
+
+    if config_files is None:
+        print("Usage: python take_inventory.py --config <config_file> [--config <config_file> ...] [--mmap] [--profile] [--store <database_file>] [--includes] [--page-metrics] [--issues] [--rollup] [--quiet]")
+        print("       python take_inventory.py --config <config_file> [...] [--term-budget <seconds>] [--metadata-cache <cache_file>]")
+        print("       python take_inventory.py --config <config_file> [...] [--extract-window <chars>] [--lazy-extracts]")
+        print("       python take_inventory.py --config <config_file> [...] [--readers <n>] [--queue-size <files>] [--processes <n>]")
+        print("       python take_inventory.py --config <config_file> [...] --shard <i>/<n> [--manifest <manifest_file>]")
+        print("       python take_inventory.py --config <config_file> [--config <config_file> ...] --watch [--interval <seconds>]")
+        print("           [--includes] [--extract-window <chars>]")
+        print("Giving more than one config runs all of their inventories in a single pass over the docsets.")
+        print("--mmap scans memory-mapped files with byte patterns, decoding only files and lines that have matches. It can't")
+        print("    be used with --includes, --issues, --lazy-extracts, --term-budget, --readers, --processes, or --page-metrics,")
+        print("    and files with the same content are each scanned rather than scanned once.")
+        print("--readers <n> reads files ahead on n threads while the terms are matched (see pipeline.py); --queue-size")
+        print("    <files> bounds the number of files read ahead (default 64), and --processes <n> matches the terms in n")
+        print("    worker processes.")
+        print("--profile runs the inventory under cProfile and saves the statistics next to the run report.")
+        print("--store also saves the results of the run to a SQLite database (see results_store.py).")
+        print("--shard <i>/<n> scans only the i-th of n shards of the files, by hash or as assigned in --manifest <manifest_file>,")
+        print("    and writes partial outputs for shard_inventory.py to merge.")
+        print("--page-metrics also writes <name>_<date>-<n>-consolidated-scrapings.csv with the page metrics of each file,")
+        print("    computed from the source during the scan (see page_metrics.py).")
+        print("--rollup also writes <name>_<date>-<n>-rollup.json and -rollup.csv with the counts and scores of each folder")
+        print("    and its subfolders (see rollup.py); it doesn't apply with --shard.")
+        print("--includes also reports the terms in the files that articles include with [!INCLUDE], at the line of the")
+        print("    include directive (see includes.py).")
+        print("--issues checks every file with the content rules and writes the issues to run_<date>-<n>-issues.csv")
+        print("    instead of printing them (see content_rules.py).")
+        print("--quiet segments only the files that match a term, which is faster, so the warnings about missing metadata")
+        print("    and headings are printed only for those files (--mmap does the same); --issues reports them for every file.")
+        print("--extract-window <chars> cuts each extract to at most <chars> characters on either side of the term;")
+        print("    --lazy-extracts reads the extracts from the files when the results are written instead of keeping them in memory.")
+        print("--term-budget <seconds> warns about terms that take longer than the budget on a file, and switches a term")
+        print("    that does so repeatedly to RE2 or skips it (see term_budget.py).")
+        print("--metadata-cache <cache_file> keeps the metadata of each file between runs and reads it again only from files")
+        print("    that changed (see extract_metadata.py).")
+        print("--watch keeps running after the first scan and updates the outputs as files change (see watch_inventory.py);")
+        print("    --interval sets the polling interval in seconds when the watchdog package isn't installed.")
         sys.exit(2)
 
-    config = None
-    with open(config_file, 'r') as config_load:
-        config = json.load(config_load)
+    configs = []
 
-    if config is None:
-        print("take_inventory: Could not deserialize config file")
-        sys.exit(1)
+    for config_file in config_files:
+        with open(config_file, 'r') as config_load:
+            config = json.load(config_load)
+
+        if config is None:
+            print("take_inventory: Could not deserialize config file {}".format(config_file))
+            sys.exit(1)
+
+        configs.append(config)
+
+    config = configs[0] if len(configs) == 1 else merge_configs(configs)
 
     repo_folder = os.getenv("INVENTORY_REPO_ROOT")
     
@@ -147,8 +857,72 @@ if __name__ == "__main__":
         print("take_inventory: Set environment variable INVENTORY_REPO_ROOT to your repo root before running the script.")
         sys.exit(1)
 
+    if options["store"] is not None:
+        options["store"] = os.path.abspath(options["store"])
+
+    if options["manifest"] is not None:
+        options["manifest"] = os.path.abspath(options["manifest"])
+
+    if options["metadata_cache"] is not None:
+        options["metadata_cache"] = os.path.abspath(options["metadata_cache"])
+
     # Run the script in the 'InventoryData' folder (using the environment variable if it exists)
     results_folder = os.getenv("INVENTORY_RESULTS_FOLDER", "InventoryData")
     os.chdir(results_folder)
 
-    take_inventory(config, results_folder)
+    if options["watch"]:
+        # Watch mode keeps its results in memory and updates the four output files of each inventory
+        conflicts = [option for option, key in [("--mmap", "mmap"), ("--profile", "profile"), ("--store", "store"),
+            ("--shard", "shard"), ("--readers", "readers"), ("--processes", "processes"), ("--page-metrics", "page_metrics"),
+            ("--term-budget", "term_budget"), ("--metadata-cache", "metadata_cache"), ("--issues", "issues"),
+            ("--lazy-extracts", "lazy_extracts"), ("--rollup", "rollup"), ("--quiet", "quiet")] if options[key]]
+
+        if len(conflicts) > 0:
+            print("take_inventory: {} can't be used with --watch.".format(", ".join(conflicts)))
+            sys.exit(2)
+
+        from watch_inventory import make_docsets, overlapping_docsets, watch_inventory
+
+        # Watch mode keeps one record per path, so a file can't be in more than one docset
+        overlap = overlapping_docsets(make_docsets(config))
+
+        if overlap is not None:
+            print("take_inventory: --watch can't be used with docsets that overlap, {} ({}) and {} ({}).".format(
+                overlap[0]["docset"], overlap[0]["folder"], overlap[1]["docset"], overlap[1]["folder"]))
+            sys.exit(2)
+
+        watch_inventory(config, options["interval"], options["includes"], options["extract_window"])
+        sys.exit(0)
+
+    # The memory-mapped scan decodes only the lines with matches (or the files of inventories that need the decoded
+    # text), so it has no whole content to check, cache, or scan in parallel
+    if options["mmap"]:
+        conflicts = [option for option, key in [("--includes", "includes"), ("--issues", "issues"),
+            ("--lazy-extracts", "lazy_extracts"), ("--term-budget", "term_budget"), ("--readers", "readers"),
+            ("--processes", "processes"), ("--page-metrics", "page_metrics")] if options[key]]
+
+        if len(conflicts) > 0:
+            print("take_inventory: {} can't be used with --mmap.".format(", ".join(conflicts)))
+            sys.exit(2)
+
+    if options["shard"] is not None:
+        if options["store"] is not None:
+            print("take_inventory: --store can't be used with --shard; store the merged results instead.")
+            sys.exit(2)
+
+        if options["metadata_cache"] is not None:
+            print("take_inventory: --metadata-cache can't be used with --shard, because the shards would overwrite each other's cache.")
+            sys.exit(2)
+
+        run_name = shard_filename("run", options["shard"])
+    else:
+        run_name = get_next_filename("run", "-report.json")
+
+    if options["profile"]:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(take_inventory, config, results_folder, options, run_name)
+        profiler.dump_stats(run_name + "-profile.pstats")
+        print("take_inventory, INFO, Saved profile statistics, , {}-profile.pstats".format(run_name))
+    else:
+        take_inventory(config, results_folder, options, run_name)
@@ -4,15 +4,9 @@ import pathlib
 import re
 import json
 import datetime
-import re
 import statistics
 
-from consolidate import consolidate
-from extract_metadata import extract_metadata
-from score import score
-
-from slugify import slugify
-from utilities import get_next_filename, parse_config_arguments, classify_occurrence, delineate_segments, COLUMNS
+from enumerate_files import walk_docset
 
 def file_age(file, today, age_list):
     if pathlib.Path(file).suffix != '.md':
@@ -82,13 +76,8 @@ def tally_age(root_path, save_file):
 
             # Iterate the entire subfolder, adding all article
             # ages to the ages list.
-            for root, dirs, files in os.walk(full_path):
-                for exclusion in exclude_folders:
-                    if exclusion in dirs:
-                        dirs.remove(exclusion)
-
-                for file in files:
-                    file_age(os.path.join(root, file), today, ages)
+            for entry in walk_docset(full_path, exclude_folders):
+                file_age(entry.path, today, ages)
 
             collect_stats(folder_result, ages)
             results[item] = folder_result
@@ -99,11 +88,11 @@ def tally_age(root_path, save_file):
         json.dump(results, fp)
 
 if __name__ == "__main__":
-    root_path = sys.argv[1]
-    json_path = sys.argv[2]
-
-    if root_path is None or json_path is None:
+    if len(sys.argv) != 3:
         print("Usage: python tally_age.py <root-path> <json-file-path>")
         sys.exit(2)
 
+    root_path = sys.argv[1]
+    json_path = sys.argv[2]
+
     tally_age(root_path, json_path)
@@ -0,0 +1,84 @@
+# Runaway-term protection for take_inventory.py (--term-budget <seconds>). A badly written term (for example,
+# one with nested repetition that backtracks heavily) can take minutes on a single large file and stall a run.
+# With a budget, the time each term takes on each file is checked against it:
+#
+#    - If the regex package is installed (pip install regex), terms that need a regular expression run through it
+#      with the budget as a timeout, so a pathological match is interrupted and the term's matches in that file are
+#      dropped. Otherwise the match can't be interrupted, and the overrun is noted once the match finishes.
+#    - A term that exceeds the budget in MAX_OVERRUNS files runs with RE2 for the rest of the run if the re2
+#      package is installed (RE2 never backtracks, so its time is linear in the file size; note that its \b is
+#      ASCII-only), or is otherwise skipped for the rest of the run.
+#
+# Each overrun prints a warning with the term and the file, and the run report lists the overruns and the terms
+# that were switched or skipped under "term_budget". Plain-text terms are found with str.find (see prefilter.py),
+# which can't run away, so they're never checked.
+
+MAX_OVERRUNS = 3
+
+
+class TermBudget:
+    def __init__(self, seconds, max_overruns=MAX_OVERRUNS):
+        self.seconds = seconds
+        self.max_overruns = max_overruns
+        self.overruns = {}       # Term pattern: number of files in which it exceeded the budget
+        self.skipped = set()
+        self.safe_terms = {}     # Term pattern: the term compiled with RE2
+        self.timeout_terms = {}  # Term pattern: the term compiled with the regex package
+
+        try:
+            import regex
+            self.regex = regex
+        except ImportError:
+            self.regex = None
+
+        try:
+            import re2
+            self.re2 = re2
+        except ImportError:
+            self.re2 = None
+
+    def is_skipped(self, term):
+        return term.pattern in self.skipped
+
+    def spans(self, term, content):
+        """Generates the (start, end) spans of the matches of a term in content. Raises TimeoutError if the regex
+        package is installed and the matching takes longer than the budget."""
+        if term.pattern in self.safe_terms:
+            return (match.span() for match in self.safe_terms[term.pattern].finditer(content))
+
+        if self.regex is None:
+            return (match.span() for match in term.finditer(content))
+
+        compiled = self.timeout_terms.get(term.pattern)
+
+        if compiled is None:
+            compiled = self.timeout_terms[term.pattern] = self.regex.compile(term.pattern, term.flags)
+
+        return (match.span() for match in compiled.finditer(content, timeout=self.seconds))
+
+    def overrun(self, term, seconds, full_path, timed_out):
+        """Records that a term took longer than the budget on a file, switching the term to RE2 or skipping it once
+        it has done so in max_overruns files."""
+        count = self.overruns[term.pattern] = self.overruns.get(term.pattern, 0) + 1
+        detail = "Interrupted after {:.2f} seconds; matches dropped" if timed_out else "Took {:.2f} seconds"
+        print("take_inventory, WARNING, Term exceeded the time budget, {} ({}), {}".format(detail.format(seconds),
+            term.pattern, full_path))
+
+        if count < self.max_overruns or term.pattern in self.safe_terms:
+            return
+
+        if self.re2 is not None:
+            try:
+                self.safe_terms[term.pattern] = self.re2.compile("(?im)" + term.pattern)
+                print("take_inventory, WARNING, Running term with RE2 for the rest of the run, , {}".format(term.pattern))
+                return
+            except Exception:
+                pass  # RE2 doesn't support every construct, such as backreferences
+
+        self.skipped.add(term.pattern)
+        print("take_inventory, WARNING, Skipping term for the rest of the run, Exceeded the time budget in {} files, {}".format(
+            count, term.pattern))
+
+    def report(self):
+        return { "seconds": self.seconds, "timeouts": "regex" if self.regex is not None else None,
+            "overruns": dict(self.overruns), "re2_terms": sorted(self.safe_terms.keys()), "skipped_terms": sorted(self.skipped) }
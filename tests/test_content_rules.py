@@ -0,0 +1,76 @@
+# Tests for the rule registry of content_rules.py.
+
+import csv
+import os
+import tempfile
+import unittest
+
+from content_rules import check_content, find_issues, rule, write_issues, ISSUE_HEADERS, RULES, SEGMENT_RULES
+
+METADATA = "---\ntitle: Title\n---\n"
+
+
+class RuleRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.registered = list(RULES)
+
+    def tearDown(self):
+        # Remove the rules a test registered, so the registry is the same for every test
+        RULES[:] = self.registered
+
+    def test_builtin_rules_are_registered_in_order(self):
+        self.assertEqual([name for name, _ in RULES], ["not_utf8", "no_metadata"])
+
+    def test_decorator_registers_and_returns_the_function(self):
+        def check_todo(content, lines, segments):
+            for i, line in enumerate(lines, 1):
+                if "TODO" in line:
+                    yield i, "Found TODO"
+
+        self.assertIs(rule("todo")(check_todo), check_todo)
+        self.assertEqual(RULES[-1], ("todo", check_todo))
+
+        issues = []
+        content = METADATA + "# Title\n\nTODO: write this\n"
+        check_content(content, "a.md", find_issues(content, "a.md")[0], issues)
+        self.assertEqual(issues, [("a.md", 6, "todo", "Found TODO")])
+
+    def test_rules_get_the_content_lines_and_segments(self):
+        calls = []
+
+        @rule("record")
+        def check_record(content, lines, segments):
+            calls.append((content, lines, segments))
+            return []
+
+        content = METADATA + "# Title\r\nText\n"
+        segments, _ = find_issues(content, "a.md")
+        self.assertEqual(calls, [(content, ["---", "title: Title", "---", "# Title", "Text"], segments)])
+
+    def test_find_issues_combines_segment_and_rule_issues(self):
+        _, issues = find_issues("Intro\n## Sub\n", "a.md")
+
+        self.assertEqual([(line, name) for _, line, name, _ in issues], [(2, "subheading_before_h1"), (1, "no_metadata")])
+        self.assertTrue(all(name in SEGMENT_RULES or name in dict(RULES) for _, _, name, _ in issues))
+
+    def test_clean_file_has_no_issues(self):
+        self.assertEqual(find_issues(METADATA + "# Title\n\nText\n", "a.md")[1], [])
+
+
+class WriteIssuesTests(unittest.TestCase):
+    def test_sorts_by_file_and_line(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        filename = os.path.join(folder.name, "issues.csv")
+
+        write_issues(filename, [("b.md", 1, "no_metadata", "x"), ("a.md", 10, "second_h1", "y"), ("a.md", 2, "not_utf8", "z")])
+
+        with open(filename, encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+
+        self.assertEqual(rows, [ISSUE_HEADERS, ["a.md", "2", "not_utf8", "z"], ["a.md", "10", "second_h1", "y"],
+            ["b.md", "1", "no_metadata", "x"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# Tests for the streaming merge of diff_runs.py.
+
+import unittest
+
+from diff_runs import diff_rows
+
+COLUMNS = ["score", "python"]
+
+
+def rows(*files):
+    """Returns an iterator of (file, docset, url, counts) rows for (file, score, python) tuples."""
+    return iter((path, "docs", "/" + path, { "score": score, "python": python }) for path, score, python in files)
+
+
+class DiffRowsTests(unittest.TestCase):
+    def diff(self, old, new):
+        return list(diff_rows(rows(*old), rows(*new), COLUMNS))
+
+    def test_reports_added_removed_and_changed_files(self):
+        old = [("a.md", 2, 1), ("b.md", 5, 3), ("d.md", 1, 1)]
+        new = [("b.md", 7, 4), ("c.md", 3, 2), ("d.md", 1, 1)]
+
+        self.assertEqual(self.diff(old, new), [
+            ["removed", "docs", "a.md", "/a.md", -2, -1],
+            ["changed", "docs", "b.md", "/b.md", 2, 1],
+            ["added", "docs", "c.md", "/c.md", 3, 2]])
+
+    def test_missing_counts_are_zero(self):
+        old = iter([("a.md", "docs", "/a.md", { "score": 2 })])
+        new = iter([("a.md", "docs", "/a.md", { "python": 1 })])
+
+        self.assertEqual(list(diff_rows(old, new, COLUMNS)), [["changed", "docs", "a.md", "/a.md", -2, 1]])
+
+    def test_old_input_runs_out_first(self):
+        self.assertEqual(self.diff([("a.md", 1, 1)], [("a.md", 1, 1), ("b.md", 2, 1), ("c.md", 3, 1)]), [
+            ["added", "docs", "b.md", "/b.md", 2, 1],
+            ["added", "docs", "c.md", "/c.md", 3, 1]])
+
+    def test_new_input_runs_out_first(self):
+        self.assertEqual(self.diff([("a.md", 1, 1), ("b.md", 2, 1), ("c.md", 3, 1)], [("a.md", 1, 2)]), [
+            ["changed", "docs", "a.md", "/a.md", 0, 1],
+            ["removed", "docs", "b.md", "/b.md", -2, -1],
+            ["removed", "docs", "c.md", "/c.md", -3, -1]])
+
+    def test_empty_inputs(self):
+        self.assertEqual(self.diff([], []), [])
+        self.assertEqual(self.diff([], [("a.md", 1, 1)]), [["added", "docs", "a.md", "/a.md", 1, 1]])
+        self.assertEqual(self.diff([("a.md", 1, 1)], []), [["removed", "docs", "a.md", "/a.md", -1, -1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# Tests for the include expansion of includes.py, on a small docset written to a temporary folder.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from includes import IncludeScanner
+from take_inventory import compile_terms
+
+
+class IncludeScannerTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.root = folder.name
+        self.terms, self.literals = compile_terms({ "inventory": [ { "name": "Python", "terms": [ "Python" ] } ] })
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        return path
+
+    def scan_article(self, scanner, path):
+        results = {}
+
+        with open(path, encoding="utf-8") as f:
+            scanner.add_results(f.read(), path, "docs", "https://docs", ["python"], results)
+
+        return [row[6] for row in results.get("python", [])]
+
+    def test_include_in_a_cycle_is_complete_when_included_directly(self):
+        self.write("includes/first.md", "Python in first\n[!INCLUDE [second](second.md)]\n")
+        self.write("includes/second.md", "Python in second\n[!INCLUDE [first](first.md)]\n")
+        first = self.write("articles/first.md", "[!INCLUDE [first](../includes/first.md)]\n")
+        second = self.write("articles/second.md", "[!INCLUDE [second](../includes/second.md)]\n")
+        scanner = IncludeScanner(self.terms, self.literals, roots=[self.root])
+
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(self.scan_article(scanner, first),
+                ["[first.md:1] Python in first", "[first.md:2 > second.md:1] Python in second"])
+            self.assertEqual(self.scan_article(scanner, second),
+                ["[second.md:1] Python in second", "[second.md:2 > first.md:1] Python in first"])
+
+        self.assertEqual(output.getvalue().count("Include files include each other"), 2)
+
+    def test_site_absolute_reference_resolves_from_docset_folder(self):
+        self.write("includes/prereqs.md", "Install Python\n")
+        nested = self.write("includes/nested/outer.md", "[!INCLUDE [prereqs](/includes/prereqs.md)]\n")
+        article = self.write("articles/a/page.md", "[!INCLUDE [prereqs](/includes/prereqs.md)]\n"
+            "[!INCLUDE [outer](/includes/nested/outer.md)]\n")
+        scanner = IncludeScanner(self.terms, self.literals, roots=[self.root])
+
+        self.assertEqual(self.scan_article(scanner, article),
+            ["[prereqs.md:1] Install Python", "[outer.md:1 > prereqs.md:1] Install Python"])
+        self.assertIn(os.path.join(self.root, "includes", "prereqs.md"), scanner.dependents)
+        self.assertIn(nested, scanner.dependents[os.path.join(self.root, "includes", "prereqs.md")])
+
+
+if __name__ == "__main__":
+    unittest.main()
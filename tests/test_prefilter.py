@@ -0,0 +1,104 @@
+# Checks prefilter.py against the case-insensitive regex matches it stands in for, on seeded random text.
+
+import random
+import re
+import unittest
+
+from prefilter import find_literal, fold_case, literal_text, may_match, required_literals
+
+# ASCII letters that have non-ASCII case-insensitive equivalents, those equivalents (İ, ı, ſ, and the Kelvin sign),
+# and some other characters, including ones whose lowercase form is longer than one character
+ALPHABET = "iIsSkKpythonPYTHON \n-.\u0130\u0131\u017f\u212aßΣσéÉ"
+
+LITERAL_TERMS = [ "Python", "data science", "kiss", "I", "sis", "ok", "Kit", "is is" ]
+
+PATTERN_TERMS = [ r"\bPython\b", r"Java[^Ss]", r"(?:he|she)\b", r"[Pp]ython(?:ic)?", r"k+i", r"(s|t)ink", r"py\w+" ]
+
+# Characters that match each ASCII letter under re.IGNORECASE
+EQUIVALENTS = { "i": "iI\u0130\u0131", "s": "sS\u017f", "k": "kK\u212a" }
+
+ROUNDS = 2000
+
+
+def variant(rng, term):
+    """Returns the term with each letter in a random case or replaced by a random case-insensitive equivalent."""
+    return "".join(rng.choice(EQUIVALENTS.get(c.lower(), c.lower() + c.upper())) for c in term)
+
+
+def random_text(rng):
+    """Returns random text, with variants of some of the terms spliced in so that the longer ones match too."""
+    parts = ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 20))) for _ in range(3)]
+
+    for _ in range(rng.randint(0, 2)):
+        parts.insert(rng.randint(0, len(parts)), variant(rng, rng.choice(LITERAL_TERMS + [ "she", "Javas", "pythonic" ])))
+
+    return "".join(parts)
+
+
+def compile_term(term):
+    # The flags take_inventory.compile_terms uses
+    return re.compile(term, re.IGNORECASE | re.MULTILINE)
+
+
+class FoldCaseTests(unittest.TestCase):
+    def test_keeps_length(self):
+        rng = random.Random(26)
+
+        for _ in range(ROUNDS):
+            text = random_text(rng)
+            self.assertEqual(len(fold_case(text)), len(text), repr(text))
+
+    def test_folds_ignorecase_equivalents(self):
+        self.assertEqual(fold_case("\u0130\u0131\u017f\u212a"), "iisk")
+        self.assertEqual(fold_case("PyThOn"), "python")
+
+
+class LiteralTextTests(unittest.TestCase):
+    def test_plain_terms(self):
+        self.assertEqual(literal_text(compile_term("Data Science")), "data science")
+
+    def test_patterns_need_regex(self):
+        for term in PATTERN_TERMS:
+            self.assertIsNone(literal_text(compile_term(term)), term)
+
+    def test_case_sensitive_terms_need_regex(self):
+        self.assertIsNone(literal_text(re.compile("Python")))
+
+    def test_find_literal_matches_finditer(self):
+        rng = random.Random(41)
+        terms = [compile_term(term) for term in LITERAL_TERMS]
+
+        for _ in range(ROUNDS):
+            text = random_text(rng)
+            folded = fold_case(text)
+
+            for term in terms:
+                self.assertEqual(list(find_literal(folded, literal_text(term))),
+                    [match.span() for match in term.finditer(text)], "{!r} in {!r}".format(term.pattern, text))
+
+
+class RequiredLiteralsTests(unittest.TestCase):
+    def test_literals(self):
+        self.assertEqual(required_literals(compile_term(r"\bPython\b")), ["python"])
+        self.assertEqual(required_literals(compile_term(r"(?:he|she)\b")), ["he", "she"])
+
+    def test_unreducible_terms(self):
+        self.assertIsNone(required_literals(compile_term(r"\w+")))
+        self.assertIsNone(required_literals(compile_term(r"a?b*")))
+
+    def test_never_rejects_a_match(self):
+        rng = random.Random(26)
+        terms = [compile_term(term) for term in LITERAL_TERMS + PATTERN_TERMS]
+        literals = [required_literals(term) for term in terms]
+
+        for _ in range(ROUNDS):
+            text = random_text(rng)
+            folded = fold_case(text)
+
+            for term, term_literals in zip(terms, literals):
+                if term.search(text) is not None:
+                    self.assertTrue(may_match(term_literals, folded), "{!r} in {!r}".format(term.pattern, text))
+
+
+if __name__ == "__main__":
+    unittest.main()
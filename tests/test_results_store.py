@@ -0,0 +1,54 @@
+# Tests for the run history of results_store.py, on an in-memory database.
+
+import csv
+import os
+import tempfile
+import unittest
+
+from results_store import open_store, start_run, store_consolidated, trend
+
+
+class ResultsStoreTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.store = open_store(":memory:")
+        self.addCleanup(self.store.close)
+
+    def store_run(self, inventory, rows):
+        """Stores a run of one inventory, with (docset, file, url, python) consolidated rows."""
+        consolidated = os.path.join(self.folder, "consolidated.csv")
+        scored = os.path.join(self.folder, "scored.csv")
+
+        with open(consolidated, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["docset", "file", "url", "python", "term_total"])
+            writer.writerows(row + (row[3],) for row in rows)
+
+        with open(scored, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["score", "docset", "file", "url"])
+            writer.writerows((0,) + row[:3] for row in rows)
+
+        run_id = start_run(self.store, "run", [])
+        store_consolidated(self.store, run_id, inventory, ["Python"], consolidated, scored)
+        return run_id
+
+    def test_trend_counts_only_runs_of_the_inventory(self):
+        first = self.store_run("python", [("docs", "a.md", "/a", 1)])
+        second = self.store_run("python", [("docs", "a.md", "/a", 2)])
+        self.store_run("java", [("docs", "a.md", "/a", 5)])
+        self.store_run("java", [("docs", "a.md", "/a", 6)])
+
+        self.assertEqual(trend(self.store, "python", max_runs=2), [(first, "run", "docs", 1), (second, "run", "docs", 2)])
+
+    def test_later_runs_update_the_docset_and_url_of_a_file(self):
+        self.store_run("python", [("docs", "a.md", "/a", 1)])
+        self.store_run("python", [("moved", "a.md", "/moved/a", 1)])
+
+        self.assertEqual(self.store.execute("SELECT path, docset, url FROM files").fetchall(), [("a.md", "moved", "/moved/a")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# Tests for the folder roll-ups of rollup.py, on a consolidated file written to a temporary folder.
+
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from rollup import build_tree, rollup
+from utilities import TAGS
+
+HEADERS = ["docset", "file", "url", "python", "term_total"] + list(TAGS.values())
+
+# (docset, file, python count, text count); a text count of at least 3 with one h1 heading scores the text count
+FILES = [
+    ("azure", "/repos/azure/articles/ml/a.md", 2, 4),
+    ("azure", "/repos/azure/articles/ml/deep/b.md", 1, 0),
+    ("azure", "/repos/azure/articles/web/c.md", 5, 3),
+    ("azure", "/repos/azure/articles/index.md", 1, 0),
+    ("vscode", "/repos/vscode/docs/python/d.md", 3, 6),
+]
+
+
+class RollupTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.input_file = os.path.join(self.folder, "python-consolidated.csv")
+
+        with open(self.input_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+
+            for docset, path, python, text in FILES:
+                counts = { TAGS["text"]: text, TAGS["h1_heading"]: 1 }
+                writer.writerow([docset, path, "/" + path, python, python] + [counts.get(tag, 0) for tag in TAGS.values()])
+
+    def run_rollup(self, depth=None):
+        json_file = os.path.join(self.folder, "rollup.json")
+        csv_file = os.path.join(self.folder, "rollup.csv")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            rollup(self.input_file, json_file, csv_file, depth)
+
+        with open(json_file, encoding="utf-8") as f:
+            tree = json.load(f)
+
+        with open(csv_file, encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+        return tree, { row["path"]: row for row in rows }
+
+    def test_folders_total_their_subfolders(self):
+        _, rows = self.run_rollup()
+
+        self.assertEqual([(row["files"], row["scored_files"], row["score"], row["python"]) for row in
+            (rows["azure/articles/ml/deep"], rows["azure/articles/ml"], rows["azure/articles"], rows["azure"], rows[""])],
+            [("1", "0", "0", "1"), ("2", "1", "4", "3"), ("4", "2", "7", "9"), ("4", "2", "7", "9"), ("5", "3", "13", "12")])
+
+    def test_paths_start_at_the_first_branching_folder(self):
+        tree, rows = self.run_rollup()
+
+        self.assertEqual(sorted(rows), ["", "azure", "azure/articles", "azure/articles/ml", "azure/articles/ml/deep",
+            "azure/articles/web", "vscode", "vscode/python"])
+        self.assertEqual([(docset["name"], docset["folder"]) for docset in tree["children"]],
+            [("azure", "/repos/azure"), ("vscode", "/repos/vscode/docs")])
+        self.assertEqual([rows[path]["depth"] for path in ["", "azure", "azure/articles/ml/deep"]], ["0", "1", "4"])
+
+    def test_depth_limits_the_output_but_not_the_totals(self):
+        tree, rows = self.run_rollup(depth=1)
+
+        self.assertEqual(sorted(rows), ["", "azure", "azure/articles", "vscode", "vscode/python"])
+        self.assertEqual(rows["azure/articles"]["files"], "4")
+        self.assertNotIn("children", tree["children"][0]["children"][0])
+
+    def test_json_leaves_out_zero_counts(self):
+        _, root = build_tree(self.input_file)
+        tree, _ = self.run_rollup()
+
+        self.assertEqual(root["counts"][HEADERS[3:].index(TAGS["code_fence"])], 0)
+        self.assertEqual(tree["counts"], { "python": 12, "term_total": 12, TAGS["h1_heading"]: 5, TAGS["text"]: 13 })
+
+
+if __name__ == "__main__":
+    unittest.main()
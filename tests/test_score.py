@@ -0,0 +1,65 @@
+# Tests for the top-K scoring of score.py, on consolidated files written to a temporary folder.
+
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from score import top_scores
+from utilities import TAGS
+
+HEADERS = ["docset", "file", "url"] + list(TAGS.values())
+
+
+class TopScoresTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def top(self, files, k, per_docset=False):
+        """Writes a consolidated file of (docset, file, score) rows and returns the (score, docset, file) rows of its top k."""
+        input_file = os.path.join(self.folder, "consolidated.csv")
+        output_file = os.path.join(self.folder, "top.csv")
+
+        # A text count of at least 3 with one h1 heading scores the text count, and no text count scores 0
+        with open(input_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+
+            for docset, path, score in files:
+                counts = { TAGS["text"]: score, TAGS["h1_heading"]: 1 if score > 0 else 0 }
+                writer.writerow([docset, path, "/" + path] + [counts.get(tag, 0) for tag in TAGS.values()])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            top_scores(input_file, output_file, k, per_docset)
+
+        with open(output_file, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            self.assertEqual(next(reader), ["score"] + HEADERS)
+            return [(int(row[0]), row[1], row[2]) for row in reader]
+
+    def test_keeps_the_highest_scores_in_order(self):
+        files = [("docs", "a.md", 4), ("docs", "b.md", 9), ("docs", "c.md", 0), ("docs", "d.md", 6), ("docs", "e.md", 3)]
+        self.assertEqual(self.top(files, 2), [(9, "docs", "b.md"), (6, "docs", "d.md")])
+
+    def test_ties_go_to_the_earlier_file(self):
+        files = [("docs", "a.md", 5), ("docs", "b.md", 7), ("docs", "c.md", 5), ("docs", "d.md", 5)]
+        self.assertEqual(self.top(files, 3), [(7, "docs", "b.md"), (5, "docs", "a.md"), (5, "docs", "c.md")])
+
+    def test_k_larger_than_the_number_of_rows(self):
+        files = [("docs", "a.md", 3), ("docs", "b.md", 0), ("docs", "c.md", 8)]
+        self.assertEqual(self.top(files, 10), [(8, "docs", "c.md"), (3, "docs", "a.md")])
+
+    def test_zero_k_writes_only_the_headers(self):
+        self.assertEqual(self.top([("docs", "a.md", 3)], 0), [])
+
+    def test_per_docset(self):
+        files = [("web", "a.md", 3), ("api", "b.md", 4), ("web", "c.md", 8), ("api", "d.md", 4), ("web", "e.md", 5)]
+        self.assertEqual(self.top(files, 1, per_docset=True), [(4, "api", "b.md"), (8, "web", "c.md")])
+
+
+if __name__ == "__main__":
+    unittest.main()
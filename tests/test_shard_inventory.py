@@ -0,0 +1,90 @@
+# Tests for the shard assignment and the k-way merge of shard_inventory.py, on partial outputs written to a
+# temporary folder.
+
+import csv
+import os
+import tempfile
+import unittest
+
+from shard_inventory import hash_shard, merge_files, size_shards
+
+HEADERS = ["docset", "file", "url", "term", "tag", "line", "extract"]
+
+
+class MergeFilesTests(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def write(self, name, rows):
+        path = os.path.join(self.folder, name)
+
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            writer.writerows(rows)
+
+        return path
+
+    def read(self, path):
+        with open(path, encoding="utf-8", newline="") as f:
+            return list(csv.reader(f))
+
+    def row(self, path, term, line):
+        return ["docs", path, "/" + path, term, "Prose", str(line), "{} on line {}".format(term, line)]
+
+    def test_merge_equals_a_single_run(self):
+        # A single run's output: sorted by filename and then numerically by line, with the rows of one line (one
+        # per term) in the order they were found
+        rows = [self.row(path, term, line) for path in ["a/x.md", "b/x.md", "b/y.md", "c.md", "d.md"]
+            for line in [2, 9, 10] for term in ["Python", "Django"]]
+        single = self.write("single.csv", rows)
+
+        # As in a sharded run, each file goes to one shard, which writes its rows in the same order
+        shards = [[row for row in rows if hash_shard(row[1], 3) == shard] for shard in range(1, 4)]
+        self.assertTrue(all(len(shard) > 0 for shard in shards))
+        partials = [self.write("shard-{}.csv".format(i), shard) for i, shard in enumerate(shards, 1)]
+
+        merged = os.path.join(self.folder, "merged.csv")
+        merge_files(partials, merged)
+        self.assertEqual(self.read(merged), self.read(single))
+
+    def test_rows_with_the_same_file_and_line_keep_shard_order(self):
+        first = self.write("shard-1.csv", [self.row("a.md", "Python", 3), self.row("b.md", "Python", 1)])
+        second = self.write("shard-2.csv", [self.row("a.md", "Django", 3), self.row("a.md", "Flask", 12)])
+
+        merged = os.path.join(self.folder, "merged.csv")
+        merge_files([first, second], merged)
+        self.assertEqual([(row[1], row[3], row[5]) for row in self.read(merged)[1:]],
+            [("a.md", "Python", "3"), ("a.md", "Django", "3"), ("a.md", "Flask", "12"), ("b.md", "Python", "1")])
+
+    def test_empty_partial_outputs(self):
+        empty = self.write("shard-1.csv", [])
+        full = self.write("shard-2.csv", [self.row("a.md", "Python", 1)])
+
+        merged = os.path.join(self.folder, "merged.csv")
+        merge_files([empty, full], merged)
+        self.assertEqual(self.read(merged), [HEADERS, self.row("a.md", "Python", 1)])
+
+
+class SizeShardsTests(unittest.TestCase):
+    def test_balances_the_bytes_per_shard(self):
+        files = [("a.md", 70), ("b.md", 50), ("c.md", 40), ("d.md", 30), ("e.md", 10)]
+        shards = size_shards(files, 2)
+        loads = [sum(size for (_, size), shard in zip(files, shards) if shard == i) for i in (1, 2)]
+
+        # Largest first, each to the lighter shard: 70 | 50, then 70 | 90, 100 | 90, and 100 | 100
+        self.assertEqual(shards, [1, 2, 2, 1, 2])
+        self.assertEqual(loads, [100, 100])
+
+    def test_ties_are_broken_by_key(self):
+        self.assertEqual(size_shards([("b.md", 5), ("a.md", 5)], 2), [2, 1])
+
+    def test_more_shards_than_files(self):
+        self.assertEqual(size_shards([("a.md", 5), ("b.md", 3)], 4), [1, 2])
+        self.assertEqual(size_shards([], 3), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
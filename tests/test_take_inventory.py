@@ -0,0 +1,184 @@
+# Tests for the scan cache of take_inventory.py: a duplicate file must get the rows a scan of its own would give.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from instrumentation import RunStats
+from page_metrics import compute_page_metrics
+import take_inventory
+from take_inventory import compile_byte_terms, compile_terms, content_key, read_file, scan_cached, scan_content, scan_mapped_file
+
+DIGEST = b"0123456789abcdef"
+
+# classify_occurrence tags the lines of this file that start with "file.write" as html_misc
+SPECIAL = "service-fabric-service-model-schema.md"
+
+
+class ContentKeyTests(unittest.TestCase):
+    def test_ignores_ordinary_filenames(self):
+        self.assertEqual(content_key(DIGEST, "a.md", ["python"]), content_key(DIGEST, "b.md", ["python"]))
+
+    def test_keeps_special_case_filenames(self):
+        self.assertNotEqual(content_key(DIGEST, "a.md", ["python"]), content_key(DIGEST, SPECIAL, ["python"]))
+
+    def test_keeps_inventories(self):
+        self.assertNotEqual(content_key(DIGEST, "a.md", ["python"]), content_key(DIGEST, "a.md", ["python", "java"]))
+
+
+class ScanCachedTests(unittest.TestCase):
+    content = "\n".join([
+        "---",
+        "title: Sample",
+        "ms.author: someone",
+        "---",
+        "",
+        "# Use Python with Java",
+        "",
+        "Install Python with pip, then write the output from Java.",
+        "",
+        '    file.write("Python")',
+        ""])
+
+    @classmethod
+    def setUpClass(cls):
+        cls.terms, cls.literals = compile_terms({ "inventory": [
+            { "name": "Python", "terms": [ "Python", r"\bpip\b" ] },
+            { "name": "Java", "terms": [ r"Java[^Ss]" ] } ] })
+
+    def setUp(self):
+        self.cache = {}
+        self.stats = RunStats()
+
+    def cached(self, path, docset="docs", names=("python", "java"), content=None):
+        results = {}
+        scan_cached(content or self.content, DIGEST, path, path.split("/")[-1], docset, "https://" + path, list(names),
+            self.terms, self.literals, results, self.stats, self.cache)
+        return results
+
+    def scanned(self, path, docset="docs", names=("python", "java")):
+        results = {}
+        scan_content(self.content, path, path.split("/")[-1], docset, "https://" + path, list(names), self.terms,
+            self.literals, results, RunStats())
+        return results
+
+    def test_duplicate_gets_its_own_rows(self):
+        self.cached("a/one.md", "docs-a")
+        results = self.cached("b/two.md", "docs-b")
+
+        self.assertEqual(results, self.scanned("b/two.md", "docs-b"))
+        self.assertGreater(len(results["python"]), 0)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.stats.counters["duplicate_files"], 1)
+        self.assertEqual(self.stats.counters["matches"], 2 * sum(len(rows) for rows in results.values()))
+
+    def test_special_case_filename_is_scanned(self):
+        ordinary = self.cached("one.md")
+        special = self.cached(SPECIAL)
+
+        self.assertEqual(special, self.scanned(SPECIAL))
+        self.assertNotEqual([row[4] for row in special["python"]], [row[4] for row in ordinary["python"]])
+        self.assertEqual(len(self.cache), 2)
+
+    def test_duplicate_gets_page_metrics(self):
+        metrics = {}
+        results = {}
+        scan_cached(self.content, DIGEST, "one.md", "one.md", "docs", "https://one", ["python"], self.terms,
+            self.literals, results, self.stats, self.cache, metrics=metrics)
+        scan_cached(self.content, DIGEST, "two.md", "two.md", "docs", "https://two", ["python"], self.terms,
+            self.literals, results, self.stats, self.cache, metrics=metrics)
+
+        self.assertEqual(metrics["two.md"], compute_page_metrics(self.content, "two.md"))
+        self.assertEqual(metrics["one.md"], metrics["two.md"])
+
+    def test_duplicate_repeats_no_metadata_warning(self):
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            self.cached("one.md", content="Python without a metadata header\n")
+            self.cached("two.md", content="Python without a metadata header\n")
+
+        warnings = [line for line in output.getvalue().splitlines() if "File contains no metadata" in line]
+        self.assertEqual(len(warnings), 2)
+        self.assertTrue(warnings[1].endswith("two.md"))
+
+
+class SegmentWarningTests(unittest.TestCase):
+    def warnings(self, quiet):
+        terms, literals = compile_terms({ "inventory": [ { "name": "Python", "terms": [ "Python" ] } ] })
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            scan_content("No metadata and no terms\n", "plain.md", "plain.md", "docs", "https://plain", ["python"],
+                terms, literals, {}, RunStats(), quiet=quiet)
+
+        return [line for line in output.getvalue().splitlines() if "WARNING" in line]
+
+    def test_files_without_matches_are_checked(self):
+        self.assertEqual(len(self.warnings(False)), 1)
+
+    def test_quiet_skips_files_without_matches(self):
+        self.assertEqual(self.warnings(True), [])
+
+
+class ScanMappedFileTests(unittest.TestCase):
+    """--mmap must give the same rows as the default scan, whatever codec decodes the files."""
+    lines = [
+        "---",
+        "title: Caf\u00e9 \u00fcber Python",
+        "---",
+        "",
+        "# Python f\u00fcr Entwickler",
+        "",
+        "Ein \u00dcberblick: caf\u00e9 \u00e0 la Python, and Java \u00e9t\u00e9 with data science.",
+        "\u00a9 Python \u2013 Python\u00ae",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        # Python and data science get byte patterns; Java[^Ss] makes its inventory run on the decoded text
+        cls.terms, cls.literals = compile_terms({ "inventory": [
+            { "name": "Python", "terms": [ "Python", "data science" ] },
+            { "name": "Java", "terms": [ r"Java[^Ss]" ] } ] })
+        cls.byte_terms = compile_byte_terms(cls.terms)
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def compare(self, encoding, text):
+        path = os.path.join(self.folder, "page.md")
+
+        with open(path, "wb") as f:
+            f.write(text.encode(encoding, errors="replace"))
+
+        with mock.patch.object(take_inventory, "CONTENT_ENCODING", encoding):
+            default = {}
+            scan_content(read_file(path)[0], path, "page.md", "docs", "https://page", ["python", "java"], self.terms,
+                self.literals, default, RunStats())
+            mapped = {}
+            scan_mapped_file(path, "page.md", "docs", "https://page", ["python", "java"], self.terms, self.literals,
+                self.byte_terms, mapped, RunStats())
+
+        self.assertGreater(len(mapped["python"]), 0)
+        self.assertEqual(mapped, default)
+
+    def test_utf8(self):
+        self.compare("utf-8", "\n".join(self.lines) + "\n")
+
+    def test_cp1252(self):
+        self.compare("cp1252", "\n".join(self.lines) + "\n")
+
+    def test_crlf(self):
+        self.compare("cp1252", "\r\n".join(self.lines) + "\r\n")
+
+    def test_ignorecase_equivalents(self):
+        self.compare("utf-8", "\n".join(self.lines + ["Pyth\u00f6n and \u0130nstall python"]) + "\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
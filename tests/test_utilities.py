@@ -0,0 +1,78 @@
+# Tests for merge_configs and parse_inventory_arguments in utilities.py.
+
+import contextlib
+import io
+import unittest
+
+from utilities import merge_configs, parse_inventory_arguments
+
+PYTHON_CONFIG = {
+    "content": [
+        { "path": "/repos/azure-docs", "url": "https://a", "exclude_folders": ["includes", "saas-apps"] },
+        { "path": "/repos/vscode-docs", "url": "https://v", "exclude_folders": ["includes"] }
+    ],
+    "inventory": [ { "name": "Python", "terms": [ "Python" ] } ]
+}
+
+JAVA_CONFIG = {
+    "content": [
+        { "path": "/repos/azure-docs/", "url": "https://a", "exclude_folders": ["includes", "portal-articles"] },
+        { "path": "/repos/java-docs", "url": "https://j", "exclude_folders": [] }
+    ],
+    "inventory": [ { "name": "Java", "terms": [ "Java" ] } ]
+}
+
+
+class MergeConfigsTests(unittest.TestCase):
+    def test_merges_content_sets_by_path(self):
+        merged = merge_configs([PYTHON_CONFIG, JAVA_CONFIG])
+        paths = [content_set["path"] for content_set in merged["content"]]
+
+        self.assertEqual(paths, ["/repos/azure-docs", "/repos/vscode-docs", "/repos/java-docs"])
+        self.assertEqual([search["name"] for search in merged["inventory"]], ["Python", "Java"])
+
+    def test_walks_with_common_exclusions(self):
+        azure = merge_configs([PYTHON_CONFIG, JAVA_CONFIG])["content"][0]
+
+        self.assertEqual(azure["exclude_folders"], ["includes"])
+        self.assertEqual(azure["inventories"], {
+            "python": ["includes", "saas-apps"],
+            "java": ["includes", "portal-articles"]
+        })
+
+    def test_inventories_keep_their_own_docsets(self):
+        content = merge_configs([PYTHON_CONFIG, JAVA_CONFIG])["content"]
+
+        self.assertEqual(list(content[1]["inventories"]), ["python"])
+        self.assertEqual(list(content[2]["inventories"]), ["java"])
+
+    def test_does_not_change_configs(self):
+        merge_configs([PYTHON_CONFIG, JAVA_CONFIG])
+
+        self.assertEqual(PYTHON_CONFIG["content"][0]["exclude_folders"], ["includes", "saas-apps"])
+        self.assertNotIn("inventories", PYTHON_CONFIG["content"][0])
+
+    def test_first_definition_of_inventory_wins(self):
+        other = { "content": [], "inventory": [ { "name": "python", "terms": [ "Django" ] } ] }
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            merged = merge_configs([PYTHON_CONFIG, other])
+
+        self.assertEqual(merged["inventory"], PYTHON_CONFIG["inventory"])
+        self.assertIn("WARNING, Inventory defined with different terms", output.getvalue())
+
+
+class ParseInventoryArgumentsTests(unittest.TestCase):
+    def test_parses_numeric_options(self):
+        config_files, options, args = parse_inventory_arguments(["--config", "a.json", "--readers", "4", "--interval", "0.5"])
+        self.assertEqual(config_files, ["a.json"])
+        self.assertEqual((options["readers"], options["interval"]), (4, 0.5))
+
+    def test_malformed_numbers_show_the_usage(self):
+        for argv in (["--readers", "four"], ["--interval", "x"], ["--extract-window", "1.5"], ["--term-budget", ""]):
+            self.assertEqual(parse_inventory_arguments(["--config", "a.json"] + argv), (None, None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
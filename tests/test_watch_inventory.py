@@ -0,0 +1,31 @@
+# Tests for the overlap check that keeps watch mode to one docset per file.
+
+import unittest
+
+from watch_inventory import make_docsets, overlapping_docsets
+
+
+def docsets(*content):
+    """Returns the docsets of a config with a content set for each (repo, path, exclude_folders)."""
+    return make_docsets({ "content": [{ "repo": repo, "path": path, "url": "https://" + repo,
+        "exclude_folders": exclude_folders } for repo, path, exclude_folders in content], "inventory": [] })
+
+
+class OverlappingDocsetsTests(unittest.TestCase):
+    def test_nested_folder(self):
+        overlap = overlapping_docsets(docsets(("docs", "/repos/docs", []), ("articles", "/repos/docs/articles", [])))
+        self.assertEqual([docset["docset"] for docset in overlap], ["docs", "articles"])
+
+    def test_same_folder(self):
+        self.assertIsNotNone(overlapping_docsets(docsets(("a", "/repos/docs", []), ("b", "/repos/docs/", []))))
+
+    def test_excluded_folder(self):
+        self.assertIsNone(overlapping_docsets(docsets(("docs", "/repos/docs", ["includes"]),
+            ("includes", "/repos/docs/articles/includes", []))))
+
+    def test_sibling_folders(self):
+        self.assertIsNone(overlapping_docsets(docsets(("a", "/repos/docs/a", []), ("b", "/repos/docs/b", []))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -53,13 +53,13 @@ COLUMNS = {
 }
 
 
-def get_next_filename(prefix=None):    
-    """ Determine the next filename by incrementing 1 above the largest existing file number in the current folder for today's date."""
+def get_next_filename(prefix=None, extension='.csv'):    
+    """ Determine the next filename by incrementing 1 above the largest existing file number in the current folder for today's date. The returned name has no extension; extension identifies the existing files to consider."""
 
     today = datetime.date.today()
 
     date_pattern = prefix + '_' + str(today)
-    files = [f for f in os.listdir('.') if re.match(date_pattern + '-[0-9]+.csv', f)]
+    files = [f for f in os.listdir('.') if re.match(date_pattern + '-[0-9]+' + re.escape(extension), f)]
 
     if (len(files) == 0):
         next_num = 1
@@ -71,6 +71,65 @@ def get_next_filename(prefix=None):
     return "%s-%04d" % (date_pattern, next_num) 
 
 
+def make_url(base_url, folder, full_path):
+    """Builds the published URL for a source file from the docset's base URL, dropping the first folder below the
+    docset root (such as "articles") and the .md extension."""
+    return base_url + full_path[full_path.find('\\', len(folder) + 1) : -3].replace('\\','/')
+
+
+def merge_configs(configs):
+    """Merges several inventory configs into one, so a single run can serve all of them. Content sets that refer to
+    the same path are merged into one, which is walked with only the exclusions common to all the configs; each
+    merged content set has an "inventories" dictionary that maps the names of the inventories that apply to it to
+    the exclusions of the config they came from. An inventory name that appears in more than one config with
+    different terms keeps the terms from the first config."""
+    merged = { "content": [], "inventory": [] }
+    inventories = {}
+    content_by_path = {}
+
+    for config in configs:
+        names = []
+
+        for search in config.get("inventory", []):
+            name = search["name"].lower()
+
+            if name in inventories:
+                if inventories[name]["terms"] != search["terms"]:
+                    print("take_inventory, WARNING, Inventory defined with different terms in more than one config, Using the first, {}".format(search["name"]))
+                    continue
+            else:
+                inventories[name] = search
+                merged["inventory"].append(search)
+
+            names.append(name)
+
+        for content_set in config.get("content", []):
+            path = content_set.get("path")
+            exclude_folders = content_set.get("exclude_folders", [])
+            key = os.path.normcase(os.path.normpath(os.path.expandvars(path))) if path else None
+
+            if key is None or key not in content_by_path:
+                entry = dict(content_set)
+                entry["exclude_folders"] = list(exclude_folders)
+                entry["inventories"] = {}
+                merged["content"].append(entry)
+
+                if key is not None:
+                    content_by_path[key] = entry
+            else:
+                entry = content_by_path[key]
+
+                if entry.get("url") != content_set.get("url"):
+                    print("take_inventory, WARNING, Docset listed with different URLs in more than one config, Using the first, {}".format(path))
+
+                entry["exclude_folders"] = [folder for folder in entry["exclude_folders"] if folder in exclude_folders]
+
+            for name in names:
+                entry["inventories"][name] = exclude_folders
+
+    return merged
+
+
 def parse_config_arguments(argv):
     """ Parses an arguments list for take_inventory.py, returning config file name. Any additional arguments after the options are included in the tuple."""
     config_file = "config.json"
@@ -90,6 +149,104 @@ def parse_config_arguments(argv):
     return (config_file, args)
 
 
+def parse_inventory_arguments(argv):
+    """ Parses an arguments list for take_inventory.py, returning a list of config file names (--config can be given more than once) and a dictionary of options. Any additional arguments after the options are included in the tuple."""
+    config_files = []
+    options = { "mmap": False, "profile": False, "store": None, "watch": False, "interval": 2.0,
+        "readers": 0, "queue_size": 64, "processes": 0, "shard": None, "manifest": None,
+        "includes": False, "page_metrics": False, "term_budget": None,
+        "metadata_cache": None, "issues": False, "extract_window": None, "lazy_extracts": False,
+        "rollup": False, "quiet": False }
+
+    try:
+        opts, args = getopt.getopt(argv, 'hH?', ["config=", "mmap", "profile", "store=", "watch", "interval=",
+            "readers=", "queue-size=", "processes=", "shard=", "manifest=", "includes", "page-metrics",
+            "term-budget=", "metadata-cache=", "issues",
+            "extract-window=", "lazy-extracts", "rollup", "quiet"])
+    except getopt.GetoptError:
+        return (None, None, None)
+
+    # The numeric options are converted as they're parsed, so a malformed value shows the usage
+    try:
+        for opt, arg in opts:
+            if opt in ('-h', '-H', '-?'):
+                return (None, None, None)
+
+            if opt == '--config':
+                config_files.append(arg)
+
+            if opt == '--mmap':
+                options["mmap"] = True
+
+            if opt == '--profile':
+                options["profile"] = True
+
+            if opt == '--store':
+                options["store"] = arg
+
+            if opt == '--watch':
+                options["watch"] = True
+
+            if opt == '--interval':
+                options["interval"] = float(arg)
+
+            if opt == '--readers':
+                options["readers"] = int(arg)
+
+            if opt == '--queue-size':
+                options["queue_size"] = int(arg)
+
+            if opt == '--processes':
+                options["processes"] = int(arg)
+
+            if opt == '--shard':
+                match = re.fullmatch(r"(\d+)/(\d+)", arg)
+
+                if match is None or not 1 <= int(match.group(1)) <= int(match.group(2)):
+                    return (None, None, None)
+
+                options["shard"] = (int(match.group(1)), int(match.group(2)))
+
+            if opt == '--manifest':
+                options["manifest"] = arg
+
+            if opt == '--includes':
+                options["includes"] = True
+
+            if opt == '--page-metrics':
+                options["page_metrics"] = True
+
+            if opt == '--term-budget':
+                options["term_budget"] = float(arg)
+
+            if opt == '--metadata-cache':
+                options["metadata_cache"] = arg
+
+            if opt == '--issues':
+                options["issues"] = True
+
+            if opt == '--extract-window':
+                options["extract_window"] = int(arg)
+
+            if opt == '--lazy-extracts':
+                options["lazy_extracts"] = True
+
+            if opt == '--rollup':
+                options["rollup"] = True
+
+            if opt == '--quiet':
+                options["quiet"] = True
+    except ValueError:
+        return (None, None, None)
+
+    if len(config_files) == 0:
+        config_files.append("config.json")
+
+    options["config_files"] = config_files
+
+    return (config_files, options, args)
+
+
 def parse_endpoint_key_arguments(argv):
     """ Parses an arguments list for extract_key_phrases.py, returning an endpoint and API key (tuple), with no defaults. Any additional arguments after the options are included in the tuple."""
 
@@ -146,18 +303,30 @@ def make_identifier(name):
 
     return name
 
-def line_starts_with_metadata(line, path):
-    # Output warnings for these (needs to be fixed in the source)
-    if line.startswith("ï»¿---"):
+def line_starts_with_metadata(line, path, warn=True):
+    # A UTF-8 byte order mark shows up as "ï»¿" when the file is read with a legacy code page, or as U+FEFF
+    # when it's decoded as UTF-8 (as in the memory-mapped scanning mode).
+    # Output warnings for these (needs to be fixed in the source), unless content_rules.py reports them
+    if warn and (line.startswith("ï»¿---") or line.startswith("\ufeff---")):
         print("take_inventory, WARNING, File is not utf-8 encoded, , {}".format(path))
 
-    return line.startswith("---") or line.startswith("ï»¿---")
+    return line.startswith("---") or line.startswith("ï»¿---") or line.startswith("\ufeff---")
+
+def report_segment_issue(issues, path, line_num, rule, message, line):
+    """Prints a warning about the headings found by delineate_segments, or appends it to issues if that's a list
+    (see content_rules.py)."""
+    if issues is None:
+        print("take_inventory, WARNING, {}, '{}', {}".format(message, line.strip(), path))
+    else:
+        issues.append((path, line_num, rule, "{}: {}".format(message, line.strip())))
 
-def delineate_segments(content, path):
+def delineate_segments(content, path, issues=None):
     """Scans through content, building a list of pairs of line numbers that contain (a) code blocks, (b) introductory text (between H1 and the first subheading), and (c) the metadata header (one pair, lines delineated by ---).
 
     Returns a tuple of lists, code_blocks, intro_text, and metadata, where each list contains tuples with start and end line numbers. The code_blocks items include the language tag. The delineators of the segments are not included in the ranges.
 
+    If issues is a list, the heading warnings are appended to it as (path, line_num, rule, detail) tuples instead of printed, and the byte order mark warning is left to content_rules.py.
+
     BUG BUG For code blocks, this code looks for code blocks marked with ```<language_tag>. It doesn't find code blocks with only indentation. That should be a content bug that's best to fix in the sources.
     """
     
@@ -181,12 +350,12 @@ def delineate_segments(content, path):
         line_num += 1
 
         # If the first line is NOT a metadata delineator, assume there is no metadata        
-        if line_num == 1 and not line_starts_with_metadata(line, path):
+        if line_num == 1 and not line_starts_with_metadata(line, path, issues is None):
             metadata_only = False
 
         # If we're scanning only metadata, ignore everything else until the ending ---
         if metadata_only:
-            if line_starts_with_metadata(line, path):
+            if line_starts_with_metadata(line, path, issues is None):
                 if not in_metadata:
                     start_line = line_num
                     in_metadata = True
@@ -211,11 +380,12 @@ def delineate_segments(content, path):
         if match_code_fence:
             if not in_code_block:
                 start_code = line_num
+                language = match_code_fence.group(1)  # The language tag is on the opening fence
                 in_code_block = True
                 continue
             else:
                 in_code_block = False                
-                item = start_code + 1, line_num - 1, match_code_fence.group(1)  # Last item is the language tag
+                item = start_code + 1, line_num - 1, language  # Last item is the language tag
                 code_blocks.append(item)                
                 continue
         
@@ -233,11 +403,11 @@ def delineate_segments(content, path):
         if line_is_h1 or line_is_subheading:
             # Warn on missing h1, but treat this first subheading as the h1 anyway
             if not in_intro and line_is_subheading:
-                print("take_inventory, WARNING, Found subheading before finding an h1, '{}', {}".format(line.strip(), path))
+                report_segment_issue(issues, path, line_num, "subheading_before_h1", "Found subheading before finding an h1", line)
                 line_is_h1 = True
 
             if in_intro and line_is_h1:
-                print("take_inventory, WARNING, Found second h1, '{}', {}".format(line.strip(), path))
+                report_segment_issue(issues, path, line_num, "second_h1", "Found second h1", line)
 
             if not in_intro:
                 # Start tracking the intro text
@@ -247,7 +417,7 @@ def delineate_segments(content, path):
                 if line_is_subheading:                   
                     # Diagnostic check: output warning if subhead isn't an h2
                     if any(line.startswith(tag) for tag in ["### ", "<h3", "#### ", "<h4"]):
-                        print("take_inventory, WARNING, Found h3/h4 following h1, '{}', {}".format(line.strip(), path))
+                        report_segment_issue(issues, path, line_num, "h3_after_h1", "Found h3/h4 following h1", line)
                 
                 item = start_line + 1, line_num - 1
                 intro.append(item)
@@ -283,6 +453,33 @@ def is_codefence(line, term):
     return False
 
 
+# SPECIAL HACK SECTION :) All of these are here to get the .csv to come out right without
+# added manual classification. In some of these cases, we can certainly go fix the files in question,
+# but to keep them consistent within their docset would require changing a number of other files.
+# Thus adding special cases to this inventory tool is simpler.
+#
+# Each special case maps a filename to the line prefixes and the tag that classify_occurrence gives the lines of
+# that file with those prefixes (after other classifications such as code fences and metadata).
+SPECIAL_CASES = {
+    # azure-docs-pr\articles\service-fabric\service-fabric-service-model-schema.md contains a length Python script
+    # inside an HTML comment. A number of lines in this article show up for "Python" but are false positives, to
+    # we classify lines starting with "file.write" as html_misc
+    "service-fabric-service-model-schema.md": (("file.write",), "html_misc"),
+
+    # azure-docs-pr\articles\key-vault\key-vault-hsm-protected-keys.md contains a bunch of Python CLI commands
+    # that have nothing to do with Python; those commands aren't in code fences at all, and should be classified
+    # as code_block.
+    "key-vault-hsm-protected-keys.md": (('"%nfast_home',), "html_misc"),
+
+    # azure-docs-pr\articles\hdinsight\spark\apache-spark-deep-learning-caffe.md has a lot of indented code blocks
+    # without fences, containing a bunch of CLI stuff.
+    "apache-spark-deep-learning-caffe.md": (("sudo apt-get install", "<value>"), "code_block"),
+}
+
+# Filenames for which the classifications depend on the filename as well as the content
+SPECIAL_CASE_FILENAMES = frozenset(SPECIAL_CASES.keys())
+
+
 def classify_occurrence(line, pos_end, term, line_num, filename, code_lines, intro_lines, metadata_lines):
     """Classifies the occurrences of term within lines, returning a classification tag. Return value is a list
     of keys in the TAGS list. Here, line contains the full line of text; pos_end indicates the ending
@@ -370,34 +567,11 @@ def classify_occurrence(line, pos_end, term, line_num, filename, code_lines, int
             return TAGS["meta_other"]
 
 
-    # SPECIAL HACK SECTION :) All of these are here to get the .csv to come out right without
-    # added manual classification. In some of these cases, we can certainly go fix the files in question,
-    # but to keep them consistent within their docset would require changing a number of other files.
-    # Thus adding special cases to this inventory tool is simpler.
-
-    # Special case #1:
-    #   azure-docs-pr\articles\service-fabric\service-fabric-service-model-schema.md contains a length Python script
-    #   inside an HTML comment. A number of lines in this article show up for "Python" but are false positives, to
-    #   we classify lines starting with "file.write" as html_misc
-    if filename == "service-fabric-service-model-schema.md":
-        if line_trunc.startswith("file.write"):
-            return TAGS["html_misc"]
-
-    # Special case #2:
-    #   azure-docs-pr\articles\key-vault\key-vault-hsm-protected-keys.md contains a bunch of Python CLI commands
-    #   that have nothing to do with Python; those commands aren't in code fences at all, and should be classified
-    #   as code_block.
-    if filename == "key-vault-hsm-protected-keys.md":
-        if line_trunc.startswith('"%nfast_home'):
-            return TAGS["html_misc"]
-
-    # Special case #3:
-    #   azure-docs-pr\articles\hdinsight\spark\apache-spark-deep-learning-caffe.md has a lot of indented code blocks
-    #   without fences, containing a bunch of CLI stuff. 
-    if filename == "apache-spark-deep-learning-caffe.md":
-        if line_trunc.startswith('sudo apt-get install') or line_trunc.startswith("<value>"):
-            return TAGS["code_block"]
+    # Special cases for particular files (see SPECIAL_CASES)
+    special_case = SPECIAL_CASES.get(filename)
 
+    if special_case is not None and line_trunc.startswith(special_case[0]):
+        return TAGS[special_case[1]]
 
     # Term is otherwise just in text, which we distinguish between intro text and other text
     if any(lower <= line_num <= upper for (lower, upper) in intro_lines):
@@ -0,0 +1,371 @@
+# Watch mode for take_inventory.py (take_inventory.py --watch). After an initial full scan, the script keeps the
+# scan results for every file in memory and watches the docset folders for changes to .md files. When files
+# change, it re-scans only those files, recomputes their metadata, consolidated counts, and scores, and
+# rewrites the output files of the affected inventories from memory, so edits show up in the outputs within
+# about a second instead of after a full rerun.
+#
+# Change detection uses the watchdog package (which uses inotify on Linux and ReadDirectoryChangesW on Windows)
+# if it's installed; otherwise the script polls the docsets every --interval seconds, comparing the modification
+# time and size of each file. Press Ctrl+C to stop watching.
+#
+# The output files have the same names and formats as a regular run, and are replaced as a whole on each update
+# so that a reader never sees a partially written file. Only the outputs whose rows changed are rewritten (an edit
+# that moves lines but doesn't change the counts rewrites only the first CSV file and the metadata file), from the
+# paths of each inventory's files, which are kept in sorted order. Rewriting an output still takes time in
+# proportion to its size, so on very large docsets an update takes longer than the rescan itself.
+#
+# With --includes, the occurrences in included files are added to the articles as in a regular run (see
+# includes.py). When an include file changes, the articles that include it, directly or through other include
+# files, are rescanned.
+#
+# The records are kept by path, so a file must belong to only one docset: take_inventory.py rejects --watch for
+# configs whose docsets overlap (see overlapping_docsets).
+
+import bisect
+import csv
+import os
+import pathlib
+import queue
+import time
+
+from consolidate import consolidate_file_rows, consolidated_headers, get_terms
+from enumerate_files import content_sets, exclusion_filter, walk_docset
+from extract_metadata import METADATA_HEADERS, metadata_row, read_file_metadata
+from instrumentation import RunStats
+from score import calculate_score
+from take_inventory import compile_terms, scan_content
+from utilities import get_next_filename, make_url, COLUMNS
+
+RAW_HEADERS = [ COLUMNS["docset"], COLUMNS["file"], COLUMNS["url"], COLUMNS["term"], COLUMNS["tag"], COLUMNS["line"],
+    COLUMNS["extract"] ]
+
+# Output file suffixes
+OUTPUTS = [ ".csv", "-metadata.csv", "-consolidated.csv", "-scored.csv" ]
+
+# How long to wait for more events after a change before updating, so a save that touches several files
+# (or writes one file in several steps) results in a single update
+DEBOUNCE_SECONDS = 0.2
+
+
+def make_docsets(config):
+    docsets = []
+
+    for docset, folder, base_url, exclude_folders, inventories in content_sets(config, "watch_inventory"):
+        docsets.append({ "docset": docset, "folder": folder, "root": os.path.abspath(folder), "base_url": base_url,
+            "exclude_folders": exclude_folders, "is_excluded": exclusion_filter(exclude_folders),
+            "filters": [(name, None if excluded == exclude_folders else exclusion_filter(excluded))
+                for name, excluded in inventories.items()] })
+
+    return docsets
+
+
+def overlapping_docsets(docsets):
+    """Returns the first pair of docsets (from make_docsets) in which the second docset's folder is, or is inside, the
+    first's and isn't excluded from it, or None if no docsets overlap."""
+    for outer in docsets:
+        for inner in docsets:
+            if inner is outer:
+                continue
+
+            try:
+                relative = os.path.relpath(inner["root"], outer["root"]).replace('\\', '/')
+            except ValueError:
+                continue  # On different drives
+
+            if relative == "." or (relative != ".." and not relative.startswith("../")
+                    and not outer["is_excluded"](relative + "/")):
+                return outer, inner
+
+    return None
+
+
+def find_docset(docsets, path):
+    """Returns the docset that contains path and the path as it appears in the outputs (relative to the docset's
+    configured folder), or (None, None) if the file isn't part of any docset."""
+    if not path.endswith(".md"):
+        return None, None
+
+    full_path = os.path.abspath(path)
+
+    for docset in docsets:
+        relative = os.path.relpath(full_path, docset["root"])
+
+        if relative.replace('\\', '/').startswith("../") or docset["is_excluded"](relative.replace('\\', '/')):
+            continue
+
+        return docset, os.path.join(docset["folder"], relative)
+
+    return None, None
+
+
+def changed_outputs(previous, record, inventory):
+    """Returns the set of the outputs (from OUTPUTS) of an inventory that differ between two records of a file, either
+    of which can be None."""
+    entries = []
+
+    for item in [previous, record]:
+        if item is None or inventory not in item["rows"]:
+            entries.append(None)
+        else:
+            entries.append((item["rows"][inventory], item["metadata"], item["consolidated"][inventory],
+                item["scores"][inventory]))
+
+    old, new = entries
+
+    if old is None or new is None:
+        scored = [entry[3] != 0 for entry in entries if entry is not None]
+        return set(OUTPUTS) if any(scored) else set(OUTPUTS[:3])
+
+    changed = set()
+
+    if old[0] != new[0]:
+        changed.update(OUTPUTS[:2])
+    elif old[1] != new[1]:
+        changed.add(OUTPUTS[1])
+
+    if old[2] != new[2]:
+        changed.add(OUTPUTS[2])
+
+    if (old[2], old[3]) != (new[2], new[3]) and (old[3] != 0 or new[3] != 0):
+        changed.add(OUTPUTS[3])
+
+    return changed
+
+
+def scan_file(state, docset, path):
+    """Scans one file, replacing its record in state. Returns a dictionary of the inventories whose outputs changed
+    to the set of the outputs that changed (see changed_outputs)."""
+    previous = state["files"].pop(path, None)
+    record = read_and_scan(state, docset, path)
+
+    if record is not None:
+        state["files"][path] = record
+
+    affected = {}
+    inventories = set(previous["rows"].keys() if previous is not None else ()) | set(record["rows"].keys()
+        if record is not None else ())
+
+    for inventory in inventories:
+        changed = changed_outputs(previous, record, inventory)
+
+        if len(changed) > 0:
+            affected[inventory] = changed
+
+        # Keep the sorted list of the inventory's files up to date
+        paths = state["paths"][inventory]
+        had_rows = previous is not None and inventory in previous["rows"]
+        has_rows = record is not None and inventory in record["rows"]
+
+        if has_rows and not had_rows:
+            bisect.insort(paths, path)
+        elif had_rows and not has_rows:
+            del paths[bisect.bisect_left(paths, path)]
+
+    return affected
+
+
+def read_and_scan(state, docset, path):
+    """Scans one file, returning its record, or None if the file was deleted or can't be read."""
+    try:
+        stat = os.stat(path)
+        content = pathlib.Path(path).read_text(errors="replace")
+    except (OSError, UnicodeDecodeError):
+        return None  # The file no longer contributes to the outputs
+
+    relative = os.path.relpath(path, docset["folder"]).replace('\\', '/')
+    names = [name for name, is_excluded in docset["filters"] if is_excluded is None or not is_excluded(relative)]
+    url = make_url(docset["base_url"], docset["folder"], path)
+
+    results = {}
+    scan_content(content, path, os.path.basename(path), docset["docset"], url, names, state["terms"], state["literals"],
+        results, state["stats"], window=state["window"])
+
+    if state["includes"] is not None:
+        state["includes"].add_results(content, path, docset["docset"], url, names, results)
+
+    record = { "stamp": (stat.st_mtime_ns, stat.st_size), "rows": {}, "consolidated": {}, "scores": {} }
+    metadata = None
+
+    for inventory, rows in results.items():
+        if len(rows) == 0:
+            continue
+
+        if metadata is None:
+            metadata = read_file_metadata(path)
+
+        rows.sort(key=lambda row: int(row[5]))
+        meta_rows = [metadata_row(*row, *metadata) for row in rows]
+        consolidated = consolidate_file_rows(meta_rows, METADATA_HEADERS, state["inventory_terms"][inventory])
+
+        record["rows"][inventory] = rows
+        record["consolidated"][inventory] = consolidated
+        record["scores"][inventory] = calculate_score(state["headers"][inventory], consolidated)
+
+    record["metadata"] = metadata
+    return record
+
+
+def replace_file(filename, headers, rows):
+    """Writes a CSV file under a temporary name and then replaces the existing file with it."""
+    temp_filename = filename + ".tmp"
+
+    with open(temp_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+    os.replace(temp_filename, filename)
+
+
+def write_outputs(state, inventory, outputs=OUTPUTS):
+    """Rewrites the given outputs (from OUTPUTS) of an inventory."""
+    result_filename = state["result_filenames"][inventory]
+    records = [state["files"][path] for path in state["paths"][inventory]]
+
+    if OUTPUTS[0] in outputs:
+        replace_file(result_filename + OUTPUTS[0], RAW_HEADERS,
+            (row for record in records for row in record["rows"][inventory]))
+
+    if OUTPUTS[1] in outputs:
+        replace_file(result_filename + OUTPUTS[1], METADATA_HEADERS,
+            (metadata_row(*row, *record["metadata"]) for record in records for row in record["rows"][inventory]))
+
+    if OUTPUTS[2] in outputs:
+        replace_file(result_filename + OUTPUTS[2], state["headers"][inventory],
+            (record["consolidated"][inventory] for record in records))
+
+    if OUTPUTS[3] in outputs:
+        replace_file(result_filename + OUTPUTS[3], [COLUMNS["score"]] + state["headers"][inventory],
+            ([record["scores"][inventory]] + record["consolidated"][inventory] for record in records
+                if record["scores"][inventory] != 0))
+
+
+def poll_changes(state, interval):
+    """Generates sets of changed paths by polling the docsets for changes in modification time and size."""
+    while True:
+        time.sleep(interval)
+        seen = set()
+        changed = set()
+
+        for docset in state["docsets"]:
+            for entry in walk_docset(docset["folder"], docset["exclude_folders"]):
+                seen.add(entry.path)
+                stat = entry.stat()
+                record = state["files"].get(entry.path)
+
+                if record is None or record["stamp"] != (stat.st_mtime_ns, stat.st_size):
+                    changed.add(entry.path)
+
+        changed.update(path for path in state["files"].keys() if path not in seen)
+
+        # Include files are usually in excluded folders, so they're checked separately
+        if state["includes"] is not None:
+            changed.update(state["includes"].changed())
+
+        if len(changed) > 0:
+            yield changed
+
+
+def watchdog_changes(state, observer_class, handler_class):
+    """Generates sets of changed paths from file system events."""
+    events = queue.Queue()
+
+    class Handler(handler_class):
+        def on_any_event(self, event):
+            if not event.is_directory:
+                events.put(event.src_path)
+
+                if hasattr(event, "dest_path"):
+                    events.put(event.dest_path)
+
+    observer = observer_class()
+
+    for docset in state["docsets"]:
+        observer.schedule(Handler(), docset["folder"], recursive=True)
+
+    observer.start()
+
+    try:
+        while True:
+            changed = { events.get() }
+
+            # Collect any further events that arrive in quick succession
+            while True:
+                try:
+                    changed.add(events.get(timeout=DEBOUNCE_SECONDS))
+                except queue.Empty:
+                    break
+
+            yield changed
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def watch_inventory(config, interval=2.0, includes=False, window=None):
+    """Runs the inventories in config and keeps their output files up to date until stopped. If includes is True,
+    the occurrences in included files are added to the articles (see includes.py); window limits the extracts
+    (see take_inventory.make_extract)."""
+    print("Script,Type,Message,Detail,Item")
+
+    terms, literals = compile_terms(config)
+    state = { "terms": terms, "literals": literals, "stats": RunStats(), "files": {}, "docsets": make_docsets(config),
+        "inventory_terms": {}, "headers": {}, "result_filenames": {}, "paths": {}, "includes": None, "window": window }
+
+    if includes:
+        from includes import IncludeScanner
+        state["includes"] = IncludeScanner(terms, literals, window, [docset["folder"] for docset in state["docsets"]])
+
+    for inventory in terms.keys():
+        state["inventory_terms"][inventory] = get_terms(config, inventory)
+        state["headers"][inventory] = consolidated_headers(METADATA_HEADERS, state["inventory_terms"][inventory])
+        state["result_filenames"][inventory] = get_next_filename(inventory)
+        state["paths"][inventory] = []
+
+    # Initial full scan
+    for docset in state["docsets"]:
+        print('watch_inventory, INFO, Processing docset, {}, {}'.format(docset["docset"], docset["folder"]))
+
+        for entry in walk_docset(docset["folder"], docset["exclude_folders"]):
+            scan_file(state, docset, entry.path)
+
+    for inventory in terms.keys():
+        write_outputs(state, inventory)
+        print("watch_inventory, INFO, Wrote output files, , {}".format(state["result_filenames"][inventory]))
+
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+        changes = watchdog_changes(state, Observer, FileSystemEventHandler)
+        print("watch_inventory, INFO, Watching for changes, Using file system events, ")
+    except ImportError:
+        changes = poll_changes(state, interval)
+        print("watch_inventory, INFO, Watching for changes, Polling every {} seconds (install watchdog to use file system events), ".format(interval))
+
+    try:
+        for changed in changes:
+            start = time.perf_counter()
+            affected = {}
+            count = 0
+
+            # Articles that include a changed include file are rescanned along with the changed files
+            if state["includes"] is not None:
+                changed = set(changed) | { path for path in state["includes"].refresh() if path in state["files"] }
+
+            for path in changed:
+                docset, path = find_docset(state["docsets"], path)
+
+                if docset is not None:
+                    for inventory, outputs in scan_file(state, docset, path).items():
+                        affected.setdefault(inventory, set()).update(outputs)
+
+                    count += 1
+
+            for inventory in sorted(affected):
+                write_outputs(state, inventory, affected[inventory])
+
+            if count > 0:
+                print("watch_inventory, INFO, Updated outputs, {} files rescanned in {:.3f} seconds, {}".format(count,
+                    time.perf_counter() - start, ";".join(sorted(affected))))
+    except KeyboardInterrupt:
+        print("watch_inventory, INFO, Stopped watching, , ")